@@ -0,0 +1,411 @@
+"""Pool risk alerts delivered to webhook subscribers.
+
+`alert_engine.observe(...)` runs inline at the end of
+`calculate_and_store_pool_metrics`. It compares the new risk_score with the
+pool's previous score and matches the change against the active
+subscriptions' rules:
+
+* threshold     - the score crossed `min_score` (either direction)
+* delta         - |score - previous| >= `min_delta`
+* level_change  - `map_risk_score_to_level` changed
+
+Both inputs are in memory. The previous score comes from a per-pool index
+the engine updates on every observation, seeded from the previous PoolMetric
+the caller already loaded. Subscriptions are a snapshot reloaded every
+ALERT_SUBSCRIPTION_REFRESH_SECONDS and right after API changes. Matching
+alerts go to a bounded asyncio.Queue with `put_nowait`; a full queue drops
+and counts, so the sync path never waits on delivery.
+
+A dispatcher task drains the queue and groups alerts per subscription for
+ALERT_BATCH_WINDOW_SECONDS, up to ALERT_BATCH_MAX per request. It POSTs
+`{"alerts": [...]}` and retries failed deliveries with exponential backoff
+up to ALERT_MAX_ATTEMPTS. At most ALERT_DELIVERY_CONCURRENCY POSTs are in
+flight at once; the slot is held only for the request itself, never across
+a backoff sleep, so dead endpoints do not stall healthy ones. Pending
+deliveries are capped at ALERT_MAX_PENDING_DELIVERIES, after which the
+dispatcher stops draining and the queue's drop policy applies. With a
+secret set, the body is signed: `X-Risk-Alert-Signature: sha256=<hmac>`.
+
+Webhook URLs must resolve to public addresses: loopback, private,
+link-local (cloud metadata), shared and reserved ranges are rejected when a
+subscription is created and re-checked before every POST (redirects are not
+followed). ALERT_ALLOW_PRIVATE_TARGETS=true lifts this for local setups.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import socket
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .http_responses import dumps
+from .risk_logic import map_risk_score_to_level
+
+logger = logging.getLogger(__name__)
+
+ALERTS_ENABLED = os.getenv("ALERTS_ENABLED", "true").lower() in ("1", "true", "yes")
+ALERT_QUEUE_MAX = int(os.getenv("ALERT_QUEUE_MAX", "10000"))
+ALERT_BATCH_MAX = int(os.getenv("ALERT_BATCH_MAX", "50"))
+ALERT_BATCH_WINDOW_SECONDS = float(os.getenv("ALERT_BATCH_WINDOW_SECONDS", "0.5"))
+ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "5"))
+ALERT_RETRY_BACKOFF_SECONDS = float(os.getenv("ALERT_RETRY_BACKOFF_SECONDS", "1"))
+ALERT_DELIVERY_TIMEOUT_SECONDS = float(os.getenv("ALERT_DELIVERY_TIMEOUT_SECONDS", "10"))
+ALERT_DELIVERY_CONCURRENCY = int(os.getenv("ALERT_DELIVERY_CONCURRENCY", "10"))
+ALERT_MAX_PENDING_DELIVERIES = int(os.getenv("ALERT_MAX_PENDING_DELIVERIES", "1000"))
+ALERT_ALLOW_PRIVATE_TARGETS = os.getenv("ALERT_ALLOW_PRIVATE_TARGETS", "false").lower() in ("1", "true", "yes")
+ALERT_SUBSCRIPTION_REFRESH_SECONDS = float(os.getenv("ALERT_SUBSCRIPTION_REFRESH_SECONDS", "30"))
+
+SIGNATURE_HEADER = "X-Risk-Alert-Signature"
+
+
+class WebhookTargetError(ValueError):
+    """The webhook URL is malformed or points at a non-public address."""
+
+
+def _is_public(ip: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+    mapped = getattr(ip, "ipv4_mapped", None)
+    if mapped is not None:
+        ip = mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_webhook_url(url: str) -> None:
+    """
+    Raise WebhookTargetError unless `url` is http(s) and every address its
+    host resolves to is public. DNS failures propagate as OSError.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise WebhookTargetError("url must be an http(s) URL with a host")
+    if ALERT_ALLOW_PRIVATE_TARGETS:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise WebhookTargetError("url has an invalid port")
+
+    try:
+        addresses = [ipaddress.ip_address(parts.hostname)]
+    except ValueError:
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        addresses = [ipaddress.ip_address(info[4][0].split("%", 1)[0]) for info in infos]
+    for address in addresses:
+        if not _is_public(address):
+            raise WebhookTargetError(f"{parts.hostname} resolves to non-public address {address}")
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    subscription_id: int
+    url: str
+    secret: Optional[str]
+    pool_id: Optional[int]
+    min_score: Optional[int]
+    min_delta: Optional[int]
+    on_level_change: bool
+
+    @classmethod
+    def of(cls, sub: models.AlertSubscription) -> "AlertRule":
+        return cls(
+            subscription_id=sub.id,
+            url=sub.url,
+            secret=sub.secret,
+            pool_id=sub.pool_id,
+            min_score=sub.min_score,
+            min_delta=sub.min_delta,
+            on_level_change=bool(sub.on_level_change),
+        )
+
+    def match(self, previous: Optional[int], current: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Rules this change fires, as (rule name, rule-specific fields)."""
+        fired: List[Tuple[str, Dict[str, Any]]] = []
+        if self.min_score is not None:
+            if previous is None:
+                if current >= self.min_score:
+                    fired.append(("threshold", {"threshold": self.min_score, "direction": "up"}))
+            elif previous < self.min_score <= current:
+                fired.append(("threshold", {"threshold": self.min_score, "direction": "up"}))
+            elif current < self.min_score <= previous:
+                fired.append(("threshold", {"threshold": self.min_score, "direction": "down"}))
+        if previous is None:
+            return fired
+        if self.min_delta is not None and abs(current - previous) >= self.min_delta:
+            fired.append(("delta", {"min_delta": self.min_delta}))
+        if self.on_level_change and map_risk_score_to_level(current) != map_risk_score_to_level(previous):
+            fired.append(("level_change", {}))
+        return fired
+
+
+@dataclass
+class Alert:
+    subscription_id: int
+    rule: str
+    pool_id: int
+    pool_name: Optional[str]
+    dex_name: Optional[str]
+    metric_id: int
+    risk_score: int
+    previous_score: Optional[int]
+    delta: Optional[int]
+    level: int
+    previous_level: Optional[int]
+    captured_at: Optional[datetime]
+    details: Dict[str, Any]
+
+    def payload(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("subscription_id")
+        data.update(data.pop("details"))
+        return data
+
+
+class AlertEngine:
+    def __init__(self):
+        # pool_id -> (metric id, risk_score) son gözlem
+        self._previous: Dict[int, Tuple[int, int]] = {}
+        # pool_id -> o havuza özel kurallar; None anahtarı tüm havuzlara uygulanan kurallar
+        self._rules: Dict[Optional[int], Tuple[AlertRule, ...]] = {}
+        self._by_id: Dict[int, AlertRule] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._deliveries: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {"queued": 0, "dropped": 0, "delivered": 0, "failed": 0, "retries": 0}
+
+    # ---------------- kurallar ----------------
+
+    def reload(self, db: Session) -> None:
+        rules: Dict[Optional[int], List[AlertRule]] = {}
+        for sub in db.query(models.AlertSubscription).filter(models.AlertSubscription.active.is_(True)).all():
+            rules.setdefault(sub.pool_id, []).append(AlertRule.of(sub))
+        self._rules = {pool_id: tuple(items) for pool_id, items in rules.items()}
+        self._by_id = {rule.subscription_id: rule for items in rules.values() for rule in items}
+
+    def rule_count(self) -> int:
+        return len(self._by_id)
+
+    # ---------------- sync path ----------------
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def observe(
+        self,
+        pool: models.Pool,
+        previous_metric: Optional[models.PoolMetric],
+        metric: models.PoolMetric,
+    ) -> int:
+        """Evaluate rules for a freshly stored metric and queue alerts; returns how many were queued."""
+        current = metric.risk_score
+        if current is None:
+            return 0
+
+        # Başka bir replica havuzu arada sync etmiş olabilir: hangisi daha yeniyse o
+        previous = None
+        indexed = self._previous.get(pool.id)
+        if indexed is not None:
+            previous = indexed[1]
+        if previous_metric is not None and (indexed is None or previous_metric.id > indexed[0]):
+            previous = previous_metric.risk_score
+        self._previous[pool.id] = (metric.id, current)
+
+        if self._queue is None or not self._rules:
+            return 0
+
+        queued = 0
+        for rule in self._rules.get(pool.id, ()) + self._rules.get(None, ()):
+            for name, details in rule.match(previous, current):
+                alert = Alert(
+                    subscription_id=rule.subscription_id,
+                    rule=name,
+                    pool_id=pool.id,
+                    pool_name=pool.pool_name,
+                    dex_name=pool.dex_name,
+                    metric_id=metric.id,
+                    risk_score=current,
+                    previous_score=previous,
+                    delta=current - previous if previous is not None else None,
+                    level=map_risk_score_to_level(current),
+                    previous_level=map_risk_score_to_level(previous) if previous is not None else None,
+                    captured_at=metric.captured_at,
+                    details=details,
+                )
+                try:
+                    self._queue.put_nowait(alert)
+                except asyncio.QueueFull:
+                    self.stats["dropped"] += 1
+                    logger.warning(f"Alert queue full; dropped {name} alert for pool_id={pool.id}")
+                    continue
+                self.stats["queued"] += 1
+                queued += 1
+        return queued
+
+    # ---------------- dispatcher ----------------
+
+    async def _next_batch(self) -> List[Alert]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ALERT_BATCH_WINDOW_SECONDS
+        while True:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            by_subscription: Dict[int, List[Alert]] = {}
+            for alert in batch:
+                by_subscription.setdefault(alert.subscription_id, []).append(alert)
+
+            for subscription_id, alerts in by_subscription.items():
+                rule = self._by_id.get(subscription_id)
+                if rule is None:
+                    continue  # abonelik bu arada silinmiş
+                for i in range(0, len(alerts), ALERT_BATCH_MAX):
+                    # Bekleyen teslimat sınırı dolduysa kuyruğu boşaltmayı bırak (backpressure)
+                    await self._pending.acquire()
+                    task = asyncio.create_task(self._deliver(rule, alerts[i:i + ALERT_BATCH_MAX]))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._delivery_done)
+
+    def _delivery_done(self, task: asyncio.Task) -> None:
+        self._deliveries.discard(task)
+        if self._pending is not None:
+            self._pending.release()
+
+    async def _post_once(self, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[Optional[str], bool]:
+        """One delivery attempt; returns (error or None, whether a retry may help)."""
+        try:
+            await asyncio.to_thread(check_webhook_url, url)
+        except WebhookTargetError as e:
+            return f"blocked target: {e}", False
+        except OSError as e:
+            return f"resolve failed: {e}", True
+
+        # Eşzamanlılık slotu sadece istek boyunca tutulur; backoff beklemesi slot dışında
+        async with self._semaphore:
+            try:
+                resp = await self._client.post(url, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                return f"{type(e).__name__}: {e}", True
+
+        if resp.status_code < 300:
+            return None, False
+        # İstemci hatası tekrar denemekle düzelmez (408/429 hariç)
+        retryable = not (400 <= resp.status_code < 500 and resp.status_code not in (408, 429))
+        return f"HTTP {resp.status_code}", retryable
+
+    async def _deliver(self, rule: AlertRule, alerts: List[Alert]) -> None:
+        body = dumps({"subscription_id": rule.subscription_id, "alerts": [a.payload() for a in alerts]})
+        headers = {"Content-Type": "application/json"}
+        if rule.secret:
+            signature = hmac.new(rule.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers[SIGNATURE_HEADER] = f"sha256={signature}"
+
+        error: Optional[str] = None
+        for attempt in range(1, ALERT_MAX_ATTEMPTS + 1):
+            error, retryable = await self._post_once(rule.url, body, headers)
+            if error is None or not retryable:
+                break
+            if attempt < ALERT_MAX_ATTEMPTS:
+                self.stats["retries"] += 1
+                await asyncio.sleep(ALERT_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        if error is None:
+            self.stats["delivered"] += len(alerts)
+        else:
+            self.stats["failed"] += len(alerts)
+            logger.warning(f"Alert delivery to subscription {rule.subscription_id} failed: {error}")
+        try:
+            await asyncio.to_thread(_record_delivery, rule.subscription_id, error)
+        except Exception:
+            logger.exception("Alert delivery status could not be recorded")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(ALERT_SUBSCRIPTION_REFRESH_SECONDS)
+            try:
+                await asyncio.to_thread(self._reload_fresh)
+            except Exception:
+                logger.exception("Alert subscription refresh failed")
+
+    def _reload_fresh(self) -> None:
+        with SessionLocal() as db:
+            self.reload(db)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        await asyncio.to_thread(self._reload_fresh)
+        self._queue = asyncio.Queue(maxsize=ALERT_QUEUE_MAX)
+        self._semaphore = asyncio.Semaphore(ALERT_DELIVERY_CONCURRENCY)
+        self._pending = asyncio.Semaphore(ALERT_MAX_PENDING_DELIVERIES)
+        self._client = httpx.AsyncClient(timeout=ALERT_DELIVERY_TIMEOUT_SECONDS)
+        self._tasks = [
+            asyncio.create_task(self._dispatch_loop()),
+            asyncio.create_task(self._refresh_loop()),
+        ]
+        logger.info(f"Alert dispatcher started ({self.rule_count()} subscriptions)")
+
+    async def stop(self) -> None:
+        tasks = self._tasks + list(self._deliveries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._deliveries.clear()
+        self._queue = None
+        self._pending = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": ALERTS_ENABLED,
+            "running": self.running,
+            "subscriptions": self.rule_count(),
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight_deliveries": len(self._deliveries),
+            "pools_tracked": len(self._previous),
+            **self.stats,
+        }
+
+
+def _record_delivery(subscription_id: int, error: Optional[str]) -> None:
+    with SessionLocal() as db:
+        sub = db.get(models.AlertSubscription, subscription_id)
+        if sub is None:
+            return
+        if error is None:
+            sub.last_delivery_at = datetime.utcnow()
+            sub.consecutive_failures = 0
+            sub.last_error = None
+        else:
+            sub.consecutive_failures = (sub.consecutive_failures or 0) + 1
+            sub.last_error = error[:2000]
+        db.commit()
+
+
+alert_engine = AlertEngine()
@@ -0,0 +1,146 @@
+"""Cross-replica coordination for sync work.
+
+Several uvicorn workers or containers may serve the API at once. Two
+mechanisms keep them from duplicating Surflux calls and PoolMetric rows:
+
+- Per-pool leases (`pool_sync_leases`): a replica claims a pool with a
+  conditional UPDATE before syncing it. A successful sync releases the lease
+  into a SYNC_MIN_INTERVAL_SECONDS cooldown. Sync job workers claim with
+  `respect_cooldown=True` and mark a cooling-down pool's item as skipped;
+  the manual single-pool endpoint passes False and only waits out a
+  concurrent holder.
+- Named leader locks (`leader_lock`): MySQL GET_LOCK for singleton jobs such
+  as the pool list sync or a scheduler loop.
+
+Work is not statically partitioned: every job worker on every replica claims
+from the whole queue, and the per-pool lease is what keeps two of them off
+the same pool. Replicas joining or dying therefore needs no rebalancing.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+from sqlalchemy import or_, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+SYNC_WORKER_ID = os.getenv("SYNC_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+SYNC_LEASE_SECONDS = float(os.getenv("SYNC_LEASE_SECONDS", "120"))
+SYNC_MIN_INTERVAL_SECONDS = float(os.getenv("SYNC_MIN_INTERVAL_SECONDS", "60"))
+
+# GET_LOCK olmayan dialect'ler (SQLite vb.) için process içi yedek
+_local_locks: Dict[str, threading.Lock] = {}
+
+
+def claim_pool_lease(
+    db: Session,
+    pool_id: int,
+    lease_seconds: float = SYNC_LEASE_SECONDS,
+    respect_cooldown: bool = True,
+) -> bool:
+    """
+    Try to take the sync lease for a pool. Returns False when another worker
+    holds it or, with `respect_cooldown`, the pool is still cooling down after
+    its last sync.
+    """
+    now = datetime.utcnow()
+
+    if db.get(models.PoolSyncLease, pool_id) is None:
+        try:
+            with db.begin_nested():
+                db.add(models.PoolSyncLease(pool_id=pool_id, owner=None, expires_at=now))
+        except IntegrityError:
+            # Başka bir replica aynı anda satırı oluşturdu; aşağıdaki UPDATE yarışı çözer
+            pass
+
+    claimable = [
+        models.PoolSyncLease.expires_at <= now,
+        models.PoolSyncLease.owner == SYNC_WORKER_ID,
+    ]
+    if not respect_cooldown:
+        # Cooldown'daki (sahipsiz) lease'ler de alınabilir
+        claimable.append(models.PoolSyncLease.owner.is_(None))
+
+    result = db.execute(
+        update(models.PoolSyncLease)
+        .where(models.PoolSyncLease.pool_id == pool_id)
+        .where(or_(*claimable))
+        .values(owner=SYNC_WORKER_ID, expires_at=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def pool_cooling_down(db: Session, pool_id: int) -> bool:
+    """True when nobody holds the pool's lease but its post-sync cooldown has not run out."""
+    lease = db.get(models.PoolSyncLease, pool_id)
+    db.commit()
+    return lease is not None and lease.owner is None and lease.expires_at > datetime.utcnow()
+
+
+def renew_pool_lease(db: Session, pool_id: int, lease_seconds: float = SYNC_LEASE_SECONDS) -> bool:
+    """Extend a lease this worker holds; False if it has been lost."""
+    result = db.execute(
+        update(models.PoolSyncLease)
+        .where(models.PoolSyncLease.pool_id == pool_id)
+        .where(models.PoolSyncLease.owner == SYNC_WORKER_ID)
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def release_pool_lease(
+    db: Session,
+    pool_id: int,
+    cooldown_seconds: float = SYNC_MIN_INTERVAL_SECONDS,
+) -> None:
+    """Give the lease back, keeping the pool blocked for `cooldown_seconds`."""
+    db.rollback()  # yarım kalmış bir sync transaction'ı lease update'ini kirletmesin
+    db.execute(
+        update(models.PoolSyncLease)
+        .where(models.PoolSyncLease.pool_id == pool_id)
+        .where(models.PoolSyncLease.owner == SYNC_WORKER_ID)
+        .values(owner=None, expires_at=datetime.utcnow() + timedelta(seconds=cooldown_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+@contextmanager
+def leader_lock(name: str) -> Iterator[bool]:
+    """
+    Non-blocking named lock held for the duration of the block.
+    Yields True if this worker is the leader for `name`, False otherwise.
+    """
+    if engine.dialect.name != "mysql":
+        lock = _local_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    # GET_LOCK bağlantıya bağlı; blok boyunca aynı connection'ı tutuyoruz
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
@@ -1,30 +1,142 @@
 import os
+import logging
+import threading
+import time
+from typing import Optional
+
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+logger = logging.getLogger(__name__)
+
 DB_HOST = os.getenv("DB_HOST", "db")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_USER = os.getenv("DB_USER", "sui")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "suipass")
 DB_NAME = os.getenv("DB_NAME", "sui_db")
 
-SQLALCHEMY_DATABASE_URL = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+# DATABASE_URL verilirse DB_* değişkenlerini ezer (ör. benchmark için sqlite:///bench.db)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4",
 )
 
+# Okuma replica'sı: DATABASE_READ_URL ya da DB_READ_HOST (boş bırakılan DB_READ_* primary'ninkini kullanır).
+# İkisi de yoksa okumalar da primary'ye gider.
+DB_READ_HOST = os.getenv("DB_READ_HOST")
+DB_READ_PORT = os.getenv("DB_READ_PORT", DB_PORT)
+DB_READ_USER = os.getenv("DB_READ_USER", DB_USER)
+DB_READ_PASSWORD = os.getenv("DB_READ_PASSWORD", DB_PASSWORD)
+DB_READ_NAME = os.getenv("DB_READ_NAME", DB_NAME)
+
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL") or (
+    f"mysql+pymysql://{DB_READ_USER}:{DB_READ_PASSWORD}@{DB_READ_HOST}:{DB_READ_PORT}/{DB_READ_NAME}?charset=utf8mb4"
+    if DB_READ_HOST
+    else None
+)
+
+# Replica bu kadar saniyeden fazla gerideyse (veya replikasyon durmuşsa) okumalar primary'ye düşer
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS", "5"))
+
+DB_ECHO = os.getenv("DB_ECHO", "true").lower() in ("1", "true", "yes")
+
 
 class Base(DeclarativeBase):
     """Tüm modellerin miras alacağı Base class."""
     pass
 
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    echo=True,      # SQL loglarını görmek istemezsen False yap
-    future=True,
-)
+def _create_engine(url: str):
+    return create_engine(
+        url,
+        echo=DB_ECHO,   # SQL loglarını görmek istemezsen DB_ECHO=false
+        future=True,
+        # SQLite sadece lokal fixture'lar için; thread'ler arası paylaşım izni gerekiyor
+        connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+    )
+
+
+# Yazma (primary) engine'i; tüm yazmalar, migration'lar ve job'lar bunu kullanır
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+writer_engine = engine
+# Okuma replica'sı; tanımlı değilse None ve okumalar primary'den
+reader_engine = _create_engine(SQLALCHEMY_READ_DATABASE_URL) if SQLALCHEMY_READ_DATABASE_URL else None
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=reader_engine) if reader_engine is not None else None
+)
+
+
+class ReplicaMonitor:
+    """
+    Replica gecikmesini en fazla DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS'ta bir ölçer
+    ve okuma isteklerinin replica'ya gidip gidemeyeceğine karar verir.
+    MySQL'de SHOW REPLICA STATUS (eski sürümlerde SHOW SLAVE STATUS) kullanılır;
+    ölçülemeyen gecikme (hata, replikasyon durmuş) replica'yı devre dışı bırakır.
+    """
+
+    def __init__(self, max_lag: float = DB_REPLICA_MAX_LAG_SECONDS, interval: float = DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _measure(self) -> Optional[float]:
+        with reader_engine.connect() as conn:
+            if conn.dialect.name != "mysql":
+                conn.execute(text("SELECT 1"))
+                return 0.0
+            for statement, column in (
+                ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+            ):
+                try:
+                    row = conn.execute(text(statement)).mappings().first()
+                except Exception:
+                    continue
+                if row is None:
+                    return 0.0  # replica olarak yapılandırılmamış (ör. aynı sunucu); gecikme yok
+                value = row.get(column)
+                return float(value) if value is not None else None
+            raise RuntimeError("Replica status is not readable (REPLICATION CLIENT privilege?)")
+
+    def refresh(self) -> None:
+        try:
+            lag = self._measure()
+            error = None if lag is not None else "replication is not running"
+        except Exception as e:
+            lag, error = None, str(e)
+        if error and error != self.error:
+            logger.warning(f"Read replica unavailable, reads go to primary: {error}")
+        self.lag_seconds, self.error, self.checked_at = lag, error, time.time()
+
+    def usable(self) -> bool:
+        if reader_engine is None:
+            return False
+        if time.time() - self.checked_at > self.interval:
+            # Tek thread ölçsün; diğerleri son bilinen durumla devam eder
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+        return self.lag_seconds is not None and self.lag_seconds <= self.max_lag
+
+    def status(self) -> dict:
+        return {
+            "configured": reader_engine is not None,
+            "usable": self.usable(),
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag,
+            "error": self.error,
+        }
+
+
+replica_monitor = ReplicaMonitor()
 
 
 def get_db():
@@ -35,6 +147,18 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    """
+    Sadece okuyan endpoint'ler için session: replica tanımlı ve gecikmesi
+    DB_REPLICA_MAX_LAG_SECONDS içindeyse replica'dan, değilse primary'den.
+    """
+    db = ReadSessionLocal() if replica_monitor.usable() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def ping_db():
     """Basit bir SELECT 1 ile bağlantıyı test etmek için."""
     with engine.connect() as conn:
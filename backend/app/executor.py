@@ -0,0 +1,62 @@
+"""Off-loop execution of CPU-bound scoring and graph work.
+
+Handlers fetch data asynchronously and hand the pure computation to
+`run_cpu_bound`, which runs it on a process pool (default), a thread pool or
+inline depending on SCORING_EXECUTOR. Callers should pass compact payloads
+(arrays, index lists) rather than lists of dicts, since process pools pickle
+every argument.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "process").lower()   # process | thread | inline
+SCORING_EXECUTOR_WORKERS = int(os.getenv("SCORING_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+T = TypeVar("T")
+
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Optional[Executor]:
+    """Create the shared pool on first use (after uvicorn has forked its workers)."""
+    global _executor
+    if SCORING_EXECUTOR == "inline":
+        return None
+    if _executor is None:
+        if SCORING_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(
+                max_workers=SCORING_EXECUTOR_WORKERS,
+                thread_name_prefix="scoring",
+            )
+        else:
+            _executor = ProcessPoolExecutor(max_workers=SCORING_EXECUTOR_WORKERS)
+        logger.info(f"Scoring executor started: {SCORING_EXECUTOR} x{SCORING_EXECUTOR_WORKERS}")
+    return _executor
+
+
+async def run_cpu_bound(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run `fn(*args, **kwargs)` without blocking the event loop."""
+    executor = get_executor()
+    with span("scoring", getattr(fn, "__name__", None)):
+        if executor is None:
+            return fn(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,145 @@
+"""JSON encoding, compression and conditional-GET helpers for large responses.
+
+`FastJSONResponse` renders with orjson when it is installed (stdlib json
+otherwise) and is the app's default response class. Hot endpoints go one
+step further: they shape rows directly into JSON-native values, encode once
+with `dumps` and return `CachedPayload.response(...)`, which skips
+FastAPI's `jsonable_encoder` walk, negotiates brotli / gzip above
+RESPONSE_COMPRESS_MIN_BYTES and keeps the encoded variants, so an unchanged
+payload is never re-serialized or re-compressed. With an ETag, a matching
+`If-None-Match` gets a bodiless 304.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # opsiyonel bağımlılık; yoksa stdlib json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Zayıf karşılaştırma: W/ önekini yok say
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(request: Request) -> Optional[str]:
+    accepted = _accepted_encodings(request)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+
+
+@dataclass
+class CachedPayload:
+    """An encoded JSON body plus its lazily built compressed variants."""
+    body: bytes
+    etag: Optional[str] = None
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        if self.etag and etag_matches(request, self.etag):
+            return not_modified(self.etag)
+
+        headers = {"Vary": "Accept-Encoding"}
+        if self.etag:
+            headers["ETag"] = self.etag
+
+        content = self.body
+        encoding = choose_encoding(request) if len(self.body) >= RESPONSE_COMPRESS_MIN_BYTES else None
+        if encoding:
+            if encoding not in self.encoded:
+                self.encoded[encoding] = _compress(self.body, encoding)
+            content = self.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+
+        return Response(content=content, status_code=status_code, media_type="application/json", headers=headers)
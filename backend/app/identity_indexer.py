@@ -0,0 +1,340 @@
+"""On-chain indexer for RiskIdentity mints.
+
+`risk_identity::mint_identity` emits no events, so the indexer pages through
+`suix_queryTransactionBlocks` filtered on that Move function in ascending
+(checkpoint) order, reads the created RiskIdentity objects with
+`sui_multiGetObjects` and bulk-upserts them into `risk_identities`. The page
+cursor is stored in `indexer_cursors` in the same transaction as the rows,
+so a restart resumes exactly after the last committed page and re-indexing a
+page is harmless (upsert on (tx_digest, address)).
+
+While behind, the next page is requested while the current one is being
+processed, and object reads for a page run concurrently, so catch-up after
+downtime is bounded by RPC page throughput rather than poll intervals.
+
+Usage (from backend/):
+    python -m app.identity_indexer [--max-pages N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .coordination import leader_lock
+from .database import SessionLocal, engine
+from .sui_client import (
+    SUI_RISK_FUNCTION_MINT,
+    SUI_RISK_MODULE,
+    SUI_RISK_PACKAGE_ID,
+    SuiRpcClient,
+)
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_INDEXER_ENABLED = os.getenv("IDENTITY_INDEXER_ENABLED", "false").lower() in ("1", "true", "yes")
+# Sui RPC sayfa ve multiGetObjects limiti 50
+IDENTITY_INDEXER_PAGE_SIZE = int(os.getenv("IDENTITY_INDEXER_PAGE_SIZE", "50"))
+IDENTITY_INDEXER_OBJECT_BATCH = int(os.getenv("IDENTITY_INDEXER_OBJECT_BATCH", "50"))
+IDENTITY_INDEXER_POLL_SECONDS = float(os.getenv("IDENTITY_INDEXER_POLL_SECONDS", "10"))
+
+CURSOR_NAME = "risk_identity_mints"
+_IDENTITY_TYPE_SUFFIX = f"::{SUI_RISK_MODULE}::RiskIdentity"
+
+_indexer_task: Optional[asyncio.Task] = None
+_stop_event: Optional[asyncio.Event] = None
+
+
+def _mint_filter() -> Dict[str, Any]:
+    return {
+        "MoveFunction": {
+            "package": SUI_RISK_PACKAGE_ID,
+            "module": SUI_RISK_MODULE,
+            "function": SUI_RISK_FUNCTION_MINT,
+        }
+    }
+
+
+def _created_identities(tx: Dict[str, Any]) -> List[str]:
+    return [
+        change["objectId"]
+        for change in tx.get("objectChanges") or []
+        if change.get("type") == "created" and str(change.get("objectType", "")).endswith(_IDENTITY_TYPE_SUFFIX)
+    ]
+
+
+def parse_identity_object(obj: Dict[str, Any], tx_digest: str) -> Optional[Dict[str, Any]]:
+    """risk_identities row for a `sui_multiGetObjects` entry, or None if unreadable."""
+    data = obj.get("data")
+    if not data:
+        return None
+
+    fields = (data.get("content") or {}).get("fields") or {}
+    try:
+        return {
+            "address": fields["owner"],
+            "score": int(fields["score"]),
+            "level": str(int(fields["level"])),
+            "timestamp_ms": int(fields["created_at"]),
+            "tx_digest": tx_digest,
+            "object_id": data["objectId"],
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def upsert_identities(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert rows, or refresh score/level/timestamp/object_id when the
+    (tx_digest, address) pair is already there (e.g. stored by the frontend).
+    Zincirdeki değer esas alınır.
+    """
+    if not rows:
+        return
+
+    table = models.RiskIdentity.__table__
+    dialect = engine.dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            score=stmt.inserted.score,
+            level=stmt.inserted.level,
+            timestamp_ms=stmt.inserted.timestamp_ms,
+            object_id=stmt.inserted.object_id,
+        )
+        db.execute(stmt)
+        return
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tx_digest", "address"],
+            set_={
+                "score": stmt.excluded.score,
+                "level": stmt.excluded.level,
+                "timestamp_ms": stmt.excluded.timestamp_ms,
+                "object_id": stmt.excluded.object_id,
+            },
+        )
+        db.execute(stmt)
+        return
+
+    # Diğer dialect'ler: mevcut çiftleri tek sorguda bul, kalanları bulk insert
+    existing = {
+        (r.tx_digest, r.address): r
+        for r in db.query(models.RiskIdentity)
+        .filter(models.RiskIdentity.tx_digest.in_({row["tx_digest"] for row in rows}))
+        .all()
+    }
+    new_rows = []
+    for row in rows:
+        current = existing.get((row["tx_digest"], row["address"]))
+        if current is None:
+            new_rows.append(row)
+            continue
+        current.score = row["score"]
+        current.level = row["level"]
+        current.timestamp_ms = row["timestamp_ms"]
+        current.object_id = row["object_id"]
+    if new_rows:
+        db.execute(insert(models.RiskIdentity), new_rows)
+
+
+def _load_cursor(db: Session) -> models.IndexerCursor:
+    cursor = db.get(models.IndexerCursor, CURSOR_NAME)
+    if cursor is None:
+        cursor = models.IndexerCursor(name=CURSOR_NAME, cursor=None, indexed_total=0)
+        db.add(cursor)
+        db.commit()
+    return cursor
+
+
+async def _fetch_identity_rows(rpc: SuiRpcClient, txs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    wanted: List[Tuple[str, str]] = [
+        (object_id, tx["digest"])
+        for tx in txs
+        for object_id in _created_identities(tx)
+    ]
+    if not wanted:
+        return []
+
+    chunks = [
+        wanted[i:i + IDENTITY_INDEXER_OBJECT_BATCH]
+        for i in range(0, len(wanted), IDENTITY_INDEXER_OBJECT_BATCH)
+    ]
+    responses = await asyncio.gather(
+        *(rpc.multi_get_objects([object_id for object_id, _ in chunk]) for chunk in chunks)
+    )
+
+    rows = []
+    for chunk, objects in zip(chunks, responses):
+        for (object_id, digest), obj in zip(chunk, objects or []):
+            row = parse_identity_object(obj, digest)
+            if row is None:
+                logger.warning(f"RiskIdentity {object_id} (tx {digest}) could not be read; skipped")
+                continue
+            rows.append(row)
+    return rows
+
+
+async def run_catch_up(
+    db: Session,
+    rpc: Optional[SuiRpcClient] = None,
+    max_pages: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Index every mint transaction after the stored cursor (or `max_pages`
+    pages). Each page and its cursor are committed together.
+    """
+    summary: Dict[str, Any] = {"pages": 0, "transactions": 0, "identities": 0}
+    state = _load_cursor(db)
+
+    owns_rpc = rpc is None
+    rpc = rpc or SuiRpcClient()
+
+    async def fetch(cursor: Optional[str]) -> Dict[str, Any]:
+        return await rpc.query_transaction_blocks(
+            _mint_filter(),
+            cursor=cursor,
+            limit=IDENTITY_INDEXER_PAGE_SIZE,
+            options={"showObjectChanges": True},
+        )
+
+    next_task: Optional[asyncio.Task] = None
+    try:
+        page = await fetch(state.cursor)
+        while True:
+            txs = page.get("data") or []
+            next_cursor = page.get("nextCursor")
+            more = bool(page.get("hasNextPage")) and next_cursor is not None
+            more = more and (max_pages is None or summary["pages"] + 1 < max_pages)
+
+            # Geride kaldıysak sonraki sayfayı bu sayfa işlenirken iste
+            if more:
+                next_task = asyncio.create_task(fetch(next_cursor))
+
+            if txs:
+                rows = await _fetch_identity_rows(rpc, txs)
+                upsert_identities(db, rows)
+
+                state.cursor = next_cursor or txs[-1]["digest"]
+                checkpoint = txs[-1].get("checkpoint")
+                if checkpoint is not None:
+                    state.last_checkpoint = int(checkpoint)
+                state.indexed_total = (state.indexed_total or 0) + len(rows)
+                db.commit()
+
+                summary["pages"] += 1
+                summary["transactions"] += len(txs)
+                summary["identities"] += len(rows)
+
+            if not more:
+                break
+            page = await next_task
+            next_task = None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if next_task is not None:
+            next_task.cancel()
+            await asyncio.gather(next_task, return_exceptions=True)
+        if owns_rpc:
+            await rpc.close()
+
+    summary["cursor"] = state.cursor
+    summary["last_checkpoint"] = state.last_checkpoint
+    return summary
+
+
+def get_indexer_status(db: Session) -> Dict[str, Any]:
+    state = db.get(models.IndexerCursor, CURSOR_NAME)
+    return {
+        "name": CURSOR_NAME,
+        "enabled": IDENTITY_INDEXER_ENABLED,
+        "cursor": state.cursor if state else None,
+        "last_checkpoint": state.last_checkpoint if state else None,
+        "indexed_total": state.indexed_total if state else 0,
+        "updated_at": state.updated_at if state else None,
+    }
+
+
+async def _indexer_loop(stop: asyncio.Event) -> None:
+    rpc = SuiRpcClient()
+    try:
+        while not stop.is_set():
+            # Tek bir replica indexler; diğerleri sadece bekler
+            with leader_lock("risk_identity_indexer") as leader:
+                if leader:
+                    db = SessionLocal()
+                    try:
+                        summary = await run_catch_up(db, rpc)
+                        if summary["identities"]:
+                            logger.info(f"RiskIdentity indexer: {summary}")
+                    except Exception:
+                        logger.exception("RiskIdentity indexer iteration failed")
+                    finally:
+                        db.close()
+
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=IDENTITY_INDEXER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await rpc.close()
+
+
+def start_identity_indexer() -> None:
+    global _indexer_task, _stop_event
+    if _indexer_task is not None:
+        return
+    _stop_event = asyncio.Event()
+    _indexer_task = asyncio.create_task(_indexer_loop(_stop_event))
+    logger.info("RiskIdentity indexer started")
+
+
+async def stop_identity_indexer() -> None:
+    global _indexer_task
+    if _indexer_task is None:
+        return
+    if _stop_event is not None:
+        _stop_event.set()
+    _indexer_task.cancel()
+    await asyncio.gather(_indexer_task, return_exceptions=True)
+    _indexer_task = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Catch up the RiskIdentity indexer once")
+    parser.add_argument("--max-pages", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def _run() -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return await run_catch_up(db, max_pages=args.max_pages)
+        finally:
+            db.close()
+
+    print(json.dumps(asyncio.run(_run())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""DB-backed sync job queue.
+
+`POST /sync/deepbook/metrics` enqueues a SyncJob with one SyncJobItem per
+pool and returns immediately. While such a job is queued or running,
+further triggers (from any replica) get that job back instead of a new one.
+
+Background workers (one or more asyncio tasks per process, across all
+replicas) claim any ready item with a conditional UPDATE and take the pool's
+sync lease. A pool still inside its SYNC_MIN_INTERVAL_SECONDS cooldown (synced
+by another job or a manual sync) is marked "skipped" instead of being synced
+again. Otherwise the worker syncs the pool and checkpoints the per-pool result
+on the item row, so a restart only loses the item that was in flight.
+
+While an item runs its heartbeat is refreshed every
+SYNC_JOB_HEARTBEAT_SECONDS; an item whose heartbeat is older than
+SYNC_JOB_STALE_SECONDS is taken over by another worker and that counts as a
+failed attempt. Failed items are retried with a backoff up to
+SYNC_JOB_MAX_ATTEMPTS times.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .coordination import (
+    SYNC_WORKER_ID,
+    claim_pool_lease,
+    leader_lock,
+    pool_cooling_down,
+    release_pool_lease,
+    renew_pool_lease,
+)
+from .database import SessionLocal
+from .rankings import ranking_store
+from .risk_scoring import calculate_and_store_pool_metrics
+
+logger = logging.getLogger(__name__)
+
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", "1"))              # process başına worker task sayısı
+SYNC_JOB_POLL_SECONDS = float(os.getenv("SYNC_JOB_POLL_SECONDS", "2"))
+SYNC_JOB_MAX_ATTEMPTS = int(os.getenv("SYNC_JOB_MAX_ATTEMPTS", "3"))
+SYNC_JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("SYNC_JOB_RETRY_BACKOFF_SECONDS", "10"))
+SYNC_JOB_STALE_SECONDS = float(os.getenv("SYNC_JOB_STALE_SECONDS", "300"))
+# Çalışan item'ın heartbeat'i bu aralıkla tazelenir; stale eşiğinin altında kalmalı
+SYNC_JOB_HEARTBEAT_SECONDS = float(os.getenv("SYNC_JOB_HEARTBEAT_SECONDS", str(SYNC_JOB_STALE_SECONDS / 3)))
+
+SYNC_JOB_ENQUEUE_LOCK_ATTEMPTS = 20
+SYNC_JOB_ENQUEUE_LOCK_WAIT_SECONDS = 0.1
+
+JOB_KIND_DEEPBOOK_METRICS = "deepbook_metrics"
+
+_ACTIVE_JOB_STATUSES = ("queued", "running")
+
+_worker_tasks: List[asyncio.Task] = []
+_stop_event: Optional[asyncio.Event] = None
+
+
+def _active_job(db: Session, kind: str) -> Optional[models.SyncJob]:
+    return (
+        db.query(models.SyncJob)
+        .filter(models.SyncJob.kind == kind)
+        .filter(models.SyncJob.status.in_(_ACTIVE_JOB_STATUSES))
+        .order_by(models.SyncJob.id)
+        .first()
+    )
+
+
+def enqueue_metrics_sync_job(db: Session, pool_ids: List[int]) -> Tuple[models.SyncJob, bool]:
+    """
+    Queue an all-pools metrics job, or return the one that is already queued
+    or running. Returns (job, created). The check and the insert run under a
+    leader lock so two replicas triggered together cannot both enqueue.
+    """
+    kind = JOB_KIND_DEEPBOOK_METRICS
+    for _ in range(SYNC_JOB_ENQUEUE_LOCK_ATTEMPTS):
+        with leader_lock(f"sync_job_enqueue:{kind}") as is_leader:
+            if is_leader:
+                # MySQL REPEATABLE READ: kilitten önce açılmış snapshot diğer replica'nın job'unu görmesin diye
+                db.commit()
+                existing = _active_job(db, kind)
+                if existing is not None:
+                    return existing, False
+
+                job = models.SyncJob(kind=kind, status="queued", total_items=len(pool_ids))
+                job.items = [models.SyncJobItem(pool_id=pool_id, status="pending") for pool_id in pool_ids]
+                db.add(job)
+                db.commit()
+                db.refresh(job)
+                return job, True
+        time.sleep(SYNC_JOB_ENQUEUE_LOCK_WAIT_SECONDS)
+
+    # Kilit hep başkasındaydı: o replica job'u az önce oluşturmuş olmalı
+    db.commit()
+    existing = _active_job(db, kind)
+    if existing is None:
+        raise RuntimeError("Could not acquire the sync job enqueue lock")
+    return existing, False
+
+
+def _claimable_condition(now: datetime):
+    stale_before = now - timedelta(seconds=SYNC_JOB_STALE_SECONDS)
+    return or_(
+        and_(
+            models.SyncJobItem.status == "pending",
+            models.SyncJobItem.available_at <= now,
+        ),
+        # Worker'ı ölmüş (heartbeat'i eskimiş) item'ları geri al
+        and_(
+            models.SyncJobItem.status == "running",
+            models.SyncJobItem.heartbeat_at < stale_before,
+        ),
+    )
+
+
+def _claim_next_item(db: Session) -> Optional[models.SyncJobItem]:
+    now = datetime.utcnow()
+    candidates = (
+        db.query(models.SyncJobItem.id, models.SyncJobItem.job_id)
+        .join(models.SyncJob, models.SyncJob.id == models.SyncJobItem.job_id)
+        .filter(models.SyncJob.status.in_(_ACTIVE_JOB_STATUSES))
+        .filter(_claimable_condition(now))
+        .order_by(models.SyncJobItem.job_id, models.SyncJobItem.id)
+        .limit(10)
+        .all()
+    )
+
+    for item_id, job_id in candidates:
+        result = db.execute(
+            update(models.SyncJobItem)
+            .where(models.SyncJobItem.id == item_id)
+            .where(_claimable_condition(now))
+            .values(
+                status="running",
+                worker_id=SYNC_WORKER_ID,
+                heartbeat_at=now,
+                # Stale bir item'ı geri almak, önceki worker'ın denemesinin başarısız olduğu anlamına gelir
+                attempts=case(
+                    (models.SyncJobItem.status == "running", models.SyncJobItem.attempts + 1),
+                    else_=models.SyncJobItem.attempts,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            continue
+
+        db.execute(
+            update(models.SyncJob)
+            .where(models.SyncJob.id == job_id)
+            .where(models.SyncJob.status == "queued")
+            .values(status="running", started_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.get(models.SyncJobItem, item_id)
+
+    return None
+
+
+def _checkpoint(
+    db: Session,
+    item: models.SyncJobItem,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    retry_in: Optional[float] = None,
+) -> None:
+    item.status = status
+    item.worker_id = None if status == "pending" else item.worker_id
+    item.error = error
+    if result is not None:
+        item.result_json = json.dumps(result)
+    if retry_in is not None:
+        item.available_at = datetime.utcnow() + timedelta(seconds=retry_in)
+    db.commit()
+
+
+def _finalize_job(db: Session, job_id: int) -> None:
+    counts = dict(
+        db.query(models.SyncJobItem.status, func.count(models.SyncJobItem.id))
+        .filter(models.SyncJobItem.job_id == job_id)
+        .group_by(models.SyncJobItem.status)
+        .all()
+    )
+    job = db.get(models.SyncJob, job_id)
+    if job is None:
+        return
+
+    job.done_items = counts.get("done", 0)
+    job.failed_items = counts.get("failed", 0)
+    finished = not counts.get("pending") and not counts.get("running")
+    if finished:
+        job.status = "failed" if job.done_items == 0 and job.failed_items > 0 else "completed"
+        job.finished_at = datetime.utcnow()
+    db.commit()
+
+    if finished and job.done_items:
+        # Sync turu bitti: sıralama index'ini yeni metriklerle kur
+        ranking_store.rebuild(db)
+
+
+def _touch_heartbeat(item_id: int, pool_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        # Uzun sync'te havuz lease'i de dolmasın
+        renew_pool_lease(db, pool_id)
+        result = db.execute(
+            update(models.SyncJobItem)
+            .where(models.SyncJobItem.id == item_id)
+            .where(models.SyncJobItem.status == "running")
+            .where(models.SyncJobItem.worker_id == SYNC_WORKER_ID)
+            .values(heartbeat_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+    finally:
+        db.close()
+
+
+async def _heartbeat_loop(item_id: int, pool_id: int) -> None:
+    """Keep a running item's heartbeat and pool lease fresh so long syncs are not reclaimed."""
+    while True:
+        await asyncio.sleep(SYNC_JOB_HEARTBEAT_SECONDS)
+        try:
+            if not _touch_heartbeat(item_id, pool_id):
+                logger.warning(f"Sync job item {item_id} is no longer owned by {SYNC_WORKER_ID}")
+                return
+        except Exception:
+            logger.exception(f"Heartbeat update failed for sync job item {item_id}")
+
+
+async def _process_item(db: Session, item: models.SyncJobItem) -> None:
+    if item.attempts >= SYNC_JOB_MAX_ATTEMPTS:
+        # Önceki worker'lar bu item'da ölmüş (stale reclaim); tekrar denemeyi bırak
+        error = f"Worker lost while syncing (attempts={item.attempts})"
+        _checkpoint(db, item, "failed", result={"pool_id": item.pool_id, "error": error}, error=error)
+        _finalize_job(db, item.job_id)
+        return
+
+    pool = db.get(models.Pool, item.pool_id)
+
+    if pool is None or not pool.pool_name:
+        error = "Pool not found" if pool is None else "Pool has no pool_name set"
+        _checkpoint(db, item, "failed", result={"pool_id": item.pool_id, "error": error}, error=error)
+        _finalize_job(db, item.job_id)
+        return
+
+    pool_id = pool.id
+    if not claim_pool_lease(db, pool_id, respect_cooldown=True):
+        if pool_cooling_down(db, pool_id):
+            # SYNC_MIN_INTERVAL_SECONDS içinde zaten sync edilmiş (başka job ya da manuel sync)
+            _checkpoint(db, item, "skipped", result={"pool_id": pool_id, "skipped": "synced recently"})
+            _finalize_job(db, item.job_id)
+            return
+        # Havuz şu an başka bir worker'da; deneme sayılmadan sonra tekrar bak
+        _checkpoint(db, item, "pending", retry_in=SYNC_JOB_POLL_SECONDS)
+        return
+
+    result: Dict[str, Any]
+    error: Optional[str] = None
+    heartbeat = asyncio.create_task(_heartbeat_loop(item.id, pool_id))
+    try:
+        metric = await calculate_and_store_pool_metrics(
+            db=db,
+            pool=pool,
+            pool_name=pool.pool_name,
+        )
+        result = {
+            "pool_id": pool_id,
+            "risk_score": metric.risk_score,
+            "tvl_usd": str(metric.tvl_usd) if metric.tvl_usd is not None else None,
+            "volume_24h": str(metric.volume_24h) if metric.volume_24h is not None else None,
+        }
+    except Exception as e:
+        logger.exception(f"Metric calculation failed for pool_id={pool_id} (job={item.job_id})")
+        error = str(e)
+        result = {"pool_id": pool_id, "error": error}
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        if error is None:
+            release_pool_lease(db, pool_id)
+        else:
+            # Başarısız sync cooldown bırakmaz; retry "synced recently" diye atlanmasın
+            release_pool_lease(db, pool_id, cooldown_seconds=0)
+
+    if error is None:
+        _checkpoint(db, item, "done", result=result)
+    else:
+        item.attempts += 1
+        if item.attempts < SYNC_JOB_MAX_ATTEMPTS:
+            _checkpoint(db, item, "pending", error=error, retry_in=SYNC_JOB_RETRY_BACKOFF_SECONDS * item.attempts)
+        else:
+            _checkpoint(db, item, "failed", result=result, error=error)
+
+    _finalize_job(db, item.job_id)
+
+
+async def process_available_items(max_items: Optional[int] = None) -> int:
+    """Claim and process items until none are ready (or `max_items` is reached)."""
+    processed = 0
+    while max_items is None or processed < max_items:
+        db = SessionLocal()
+        try:
+            item = _claim_next_item(db)
+            if item is None:
+                break
+            await _process_item(db, item)
+            processed += 1
+        finally:
+            db.close()
+    return processed
+
+
+async def _worker_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await process_available_items()
+        except Exception:
+            logger.exception("Sync job worker iteration failed")
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=SYNC_JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_job_workers() -> None:
+    global _stop_event
+    if _worker_tasks:
+        return
+    _stop_event = asyncio.Event()
+    for _ in range(SYNC_JOB_WORKERS):
+        _worker_tasks.append(asyncio.create_task(_worker_loop(_stop_event)))
+    logger.info(f"Sync job workers started: {SYNC_JOB_WORKERS} ({SYNC_WORKER_ID})")
+
+
+async def stop_job_workers() -> None:
+    if _stop_event is not None:
+        _stop_event.set()
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+
+
+def get_job_status(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = db.get(models.SyncJob, job_id)
+    if job is None:
+        return None
+
+    results = []
+    skipped = 0
+    for item in job.items:
+        if item.status == "skipped":
+            skipped += 1
+        if item.result_json is not None:
+            results.append(json.loads(item.result_json))
+        else:
+            results.append({"pool_id": item.pool_id, "status": item.status, "attempts": item.attempts})
+
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total_items,
+        "done": job.done_items,
+        "failed": job.failed_items,
+        "skipped": skipped,
+        "pending": job.total_items - job.done_items - job.failed_items - skipped,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "results": results,
+    }
@@ -1,66 +1,236 @@
 import os
 import time
+import asyncio
 import logging
+import hmac
 
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import Session
+_IMPORT_STARTED = time.perf_counter()
 
-from .database import get_db, ping_db, engine, Base
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, func, insert, or_
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, aliased
+
+from .database import get_db, get_read_db, ping_db, engine, reader_engine, replica_monitor
 from . import models
-from .surflux_client import fetch_deepbook_pools, SurfluxError
+from .market_adapters import (
+    DEFAULT_DEX,
+    MARKET_DATA_ERRORS,
+    PoolListing,
+    get_adapter,
+    ingest_pool_listings,
+)
 from .risk_scoring import calculate_and_store_pool_metrics
 from .risk_logic import map_risk_score_to_level, clamp_score
 from .wallet_risk import compute_wallet_risk_score
 from .wallet_graph import build_trade_graph_for_pool
-from .schemas import MintRiskIdentityRequest, MintRiskIdentityPayload
+from .executor import shutdown_executor
+from .coordination import claim_pool_lease, release_pool_lease, leader_lock
+from .alerts import ALERTS_ENABLED, WebhookTargetError, alert_engine, check_webhook_url
+from .jobs import enqueue_metrics_sync_job, get_job_status, start_job_workers, stop_job_workers
+from .rankings import RANKING_METRICS, ranking_store
+from .token_risk import compute_token_rollup, serialize_rollup
+from .orderbook_cache import order_book_cache
+from .slippage import SLIPPAGE_SIDES, SLIPPAGE_UNITS, book_context, quote_slippage, quote_slippage_many
+from .migrations import pending_migrations, run_migrations
+from .http_responses import (
+    RESPONSE_COMPRESS_MIN_BYTES,
+    CachedPayload,
+    FastJSONResponse,
+    body_etag,
+    dumps,
+    etag_matches,
+    make_etag,
+    not_modified,
+)
+from .profiling import (
+    PROFILE_TOKEN_HEADER,
+    PROFILING_TOKEN,
+    ProfiledRoute,
+    authorized,
+    install_db_hooks,
+    profile_store,
+    profiling_middleware,
+    span,
+)
+from .schemas import (
+    MintRiskIdentityRequest,
+    MintRiskIdentityPayload,
+    MintRiskIdentityBatchRequest,
+    MintRiskIdentityBatchPayload,
+    MintRiskIdentityPayloadGroup,
+    StoreRiskIdentityRequest,
+    StoreRiskIdentityBatchRequest,
+    SlippageBatchRequest,
+    AlertSubscriptionRequest,
+    PoolRiskRegistrationRequest,
+)
+from .sui_client import (
+    SUI_RISK_PACKAGE_ID,
+    SUI_RISK_MODULE,
+    SUI_RISK_FUNCTION_MINT,
+    SuiRpcError,
+)
 
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Sui Liquidity Risk Index Backend",
     version="0.1.0",
+    default_response_class=FastJSONResponse,
 )
 
-# Sui Risk Identity konfigürasyonu (env'den okunur)
-SUI_RPC_URL = os.getenv("SUI_RPC_URL", "https://fullnode.testnet.sui.io:443")
+# Opt-in profiling (X-Profile header veya PROFILING_SAMPLE_RATE); bkz. profiling.py
+app.router.route_class = ProfiledRoute
+app.middleware("http")(profiling_middleware)
+install_db_hooks(engine)
+if reader_engine is not None:
+    install_db_hooks(reader_engine)
 
-# Default olarak en son deploy ettiğin package ID'yi bırakıyorum;
-# production'da mutlaka .env'den gelsin.
-SUI_RISK_PACKAGE_ID = os.getenv(
-    "SUI_RISK_PACKAGE_ID",
-    "0xb41df90acf072d4c7e74f44091ebadbe63758b7b4a20ea1cfe6a7b4456fa5afb",
-)
-SUI_RISK_MODULE = os.getenv("SUI_RISK_MODULE", "risk_identity")
-SUI_RISK_FUNCTION_MINT = os.getenv("SUI_RISK_FUNCTION_MINT", "mint_identity")
+# Diğer endpoint'ler için gzip; CachedPayload kendi sıkıştırdığı (br/gzip) yanıtlara dokunulmaz
+app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_COMPRESS_MIN_BYTES)
+
+# Sadece API servis eden (job işlemeyen) replica'lar için false yapılabilir
+SYNC_JOB_WORKER_ENABLED = os.getenv("SYNC_JOB_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Toplu mint: PTB başına mint_identity çağrısı (Sui limiti 1024 komut) ve istek başına adres sınırı
+MINT_BATCH_GROUP_SIZE = int(os.getenv("MINT_BATCH_GROUP_SIZE", "256"))
+MINT_BATCH_MAX_GROUP_SIZE = 1024
+MINT_BATCH_MAX_ADDRESSES = int(os.getenv("MINT_BATCH_MAX_ADDRESSES", "5000"))
+STORE_BATCH_MAX_ITEMS = int(os.getenv("STORE_BATCH_MAX_ITEMS", "5000"))
+
+IDENTITY_HISTORY_DEFAULT_LIMIT = int(os.getenv("IDENTITY_HISTORY_DEFAULT_LIMIT", "100"))
+IDENTITY_HISTORY_MAX_LIMIT = 500
+
+SLIPPAGE_BATCH_MAX_SIZES = int(os.getenv("SLIPPAGE_BATCH_MAX_SIZES", "500"))
+
+# Yayın endpoint'leri SUI_PUBLISHER_PRIVATE_KEY ile imzalayıp gas ödüyor; token tanımlı değilse kapalı
+PUBLISHER_API_TOKEN = os.getenv("PUBLISHER_API_TOKEN")
+PUBLISHER_TOKEN_HEADER = "x-publisher-token"
+
+
+# Container'da şema `python -m app.migrations` ile uvicorn'dan önce kurulur;
+# lokal geliştirmede worker'ın kendisinin migrate etmesi için true yapılabilir
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+# DB erişilemezken ya da migration beklenirken hazırlık fazı bu aralıklarla (üstel artışla) tekrar dener
+DB_WAIT_DELAY_SECONDS = float(os.getenv("DB_WAIT_DELAY_SECONDS", "3"))
+DB_WAIT_MAX_DELAY_SECONDS = float(os.getenv("DB_WAIT_MAX_DELAY_SECONDS", "60"))
+
+_readiness: Dict[str, Any] = {
+    "ready": False,
+    "db": False,
+    "pending_migrations": None,
+    "error": None,
+    "attempts": 0,
+    "timings_ms": {},
+}
+_readiness_task: Optional[asyncio.Task] = None
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _check_db_and_schema() -> Optional[str]:
+    """Tek hazırlık denemesi; sorun yoksa None, varsa /ready'de gösterilecek sebep."""
+    _readiness["db"] = False
+    try:
+        if not await asyncio.to_thread(ping_db):
+            return "database unreachable"
+    except OperationalError as e:
+        logger.warning(f"DB henüz hazır değil: {e}")
+        return "database unreachable"
+    except Exception as e:
+        logger.warning(f"DB testinde hata: {e}")
+        return f"database check failed: {e}"
+    _readiness["db"] = True
+
+    try:
+        if DB_AUTO_MIGRATE:
+            await asyncio.to_thread(run_migrations)
+        pending = await asyncio.to_thread(pending_migrations)
+    except Exception as e:
+        logger.exception("Schema check failed")
+        return f"schema check failed: {e}"
+
+    _readiness["pending_migrations"] = pending
+    if pending:
+        logger.error(f"❌ Uygulanmamış migration'lar var: {pending}")
+        return "pending migrations; run `python -m app.migrations`"
+    return None
+
+
+async def _readiness_phase():
+    """
+    DB'yi event loop'u bloklamadan bekler, şemanın güncel olduğunu doğrular,
+    sonra arka plan worker'larını başlatır. Bitene kadar /ready 503 döner.
+    DB gelmezse ya da migration'lar uygulanmamışsa vazgeçmez; artan aralıklarla
+    tekrar dener, böylece DB/migration düzelince servis kendiliğinden ready olur.
+    """
+    timings = _readiness["timings_ms"]
+
+    started = time.perf_counter()
+    delay = DB_WAIT_DELAY_SECONDS
+    while True:
+        _readiness["attempts"] += 1
+        error = await _check_db_and_schema()
+        _readiness["error"] = error
+        if error is None:
+            break
+        logger.info(f"⏳ Servis henüz hazır değil ({error}); {delay:g} saniye sonra tekrar denenecek.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, DB_WAIT_MAX_DELAY_SECONDS)
+    timings["db_and_schema"] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    if ALERTS_ENABLED:
+        # Worker'lardan önce: ilk sync'lerin alarmları kuyruğa düşebilsin
+        try:
+            await alert_engine.start()
+        except Exception:
+            logger.exception("Alert dispatcher could not start; alerts disabled")
+
+    if SYNC_JOB_WORKER_ENABLED:
+        start_job_workers()
+
+    from .identity_indexer import IDENTITY_INDEXER_ENABLED, start_identity_indexer
+
+    if IDENTITY_INDEXER_ENABLED:
+        start_identity_indexer()
+    timings["workers"] = _elapsed_ms(started)
+
+    _readiness["ready"] = True
+    logger.info(f"✅ Servis hazır. Startup süreleri (ms): {timings}")
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """
-    Uygulama açılırken DB'nin hazır olmasını bekle,
-    hazır olunca tabloları oluştur.
+    Hazırlık fazını arka planda başlatır; uvicorn istek kabul etmeye hemen
+    başlar (liveness: /health, readiness: /ready).
     """
-    max_attempts = 10
-    delay_seconds = 3
+    global _readiness_task
+    _readiness["timings_ms"]["import"] = _IMPORT_TIME_MS
+    _readiness_task = asyncio.create_task(_readiness_phase())
 
-    for attempt in range(1, max_attempts + 1):
-        try:
-            # Bağlantıyı test et
-            if ping_db():
-                logger.info("✅ DB bağlantısı başarılı, tablolar oluşturuluyor...")
-                Base.metadata.create_all(bind=engine)
-                logger.info("✅ Tablolar oluşturuldu.")
-                return
-        except OperationalError as e:
-            logger.warning(f"DB henüz hazır değil (attempt={attempt}): {e}")
-        except Exception as e:
-            logger.warning(f"DB testinde hata (attempt={attempt}): {e}")
 
-        logger.info(f"⏳ DB bekleniyor... {delay_seconds} saniye sonra tekrar denenecek.")
-        time.sleep(delay_seconds)
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Job worker'larını, indexer'ı ve alarm dispatcher'ını durdur, scoring executor'ındaki worker process'leri kapat."""
+    if _readiness_task is not None and not _readiness_task.done():
+        _readiness_task.cancel()
+        await asyncio.gather(_readiness_task, return_exceptions=True)
 
-    logger.error("❌ DB hala hazır değil, tablolar oluşturulamadı.")
+    from .identity_indexer import stop_identity_indexer
+
+    await stop_job_workers()
+    await stop_identity_indexer()
+    await alert_engine.stop()
+    shutdown_executor()
 
 
 @app.get("/")
@@ -73,10 +243,17 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: DB erişilebilir, şema güncel ve worker'lar başladıysa 200."""
+    status_code = 200 if _readiness["ready"] else 503
+    return JSONResponse(status_code=status_code, content=_readiness)
+
+
 @app.get("/db-health")
 def db_health_check():
     ok = ping_db()
-    return {"db_ok": ok}
+    return {"db_ok": ok, "read_replica": replica_monitor.status()}
 
 
 @app.get("/example")
@@ -89,7 +266,7 @@ def example_endpoint(db: Session = Depends(get_db)):
 
 
 @app.get("/pools")
-def list_pools(db: Session = Depends(get_db)):
+def list_pools(db: Session = Depends(get_read_db)):
     pools = db.query(models.Pool).all()
 
     return [
@@ -105,49 +282,176 @@ def list_pools(db: Session = Depends(get_db)):
     ]
 
 
-@app.get("/pools/summary")
-def list_pools_with_latest_metrics(db: Session = Depends(get_db)):
+# Son üretilen /pools/summary gövdesi; sürüm anahtarı değişmedikçe yeniden serialize edilmez
+_pools_summary_cache: Optional[CachedPayload] = None
+
+
+def _pools_summary_version(db: Session):
     """
-    Returns all pools with their latest risk metrics so the frontend can render a bubble map without multiple round trips.
+    Yeni metric (max id), yeni/silinen pool (count, max id) ya da pool/token
+    güncellemesi (isim, dex_name, sembol; max updated_at) gelince değişir.
     """
-    pools = db.query(models.Pool).all()
-    result = []
-
-    for p in pools:
-        latest_metric = (
-            db.query(models.PoolMetric)
-            .filter(models.PoolMetric.pool_id == p.id)
-            .order_by(models.PoolMetric.captured_at.desc())
-            .first()
+    metric_max_id = db.query(func.max(models.PoolMetric.id)).scalar()
+    pool_count, pool_max_id, pool_updated_at = db.query(
+        func.count(models.Pool.id), func.max(models.Pool.id), func.max(models.Pool.updated_at)
+    ).one()
+    token_updated_at = db.query(func.max(models.Token.updated_at)).scalar()
+    return metric_max_id, pool_count, pool_max_id, pool_updated_at, token_updated_at
+
+
+def _pools_summary_rows(db: Session):
+    """Tüm pool'lar + son metric tek sorguda, doğrudan JSON'a hazır değerlerle."""
+    token0 = aliased(models.Token)
+    token1 = aliased(models.Token)
+    latest = (
+        db.query(
+            models.PoolMetric.pool_id.label("pool_id"),
+            func.max(models.PoolMetric.captured_at).label("captured_at"),
+        )
+        .group_by(models.PoolMetric.pool_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            models.Pool.id,
+            models.Pool.sui_pool_id,
+            models.Pool.pool_name,
+            models.Pool.dex_name,
+            token0.symbol,
+            token1.symbol,
+            models.PoolMetric.tvl_usd,
+            models.PoolMetric.volume_24h,
+            models.PoolMetric.risk_score,
+            models.PoolMetric.captured_at,
         )
+        .outerjoin(token0, token0.id == models.Pool.token0_id)
+        .outerjoin(token1, token1.id == models.Pool.token1_id)
+        .outerjoin(latest, latest.c.pool_id == models.Pool.id)
+        .outerjoin(
+            models.PoolMetric,
+            and_(
+                models.PoolMetric.pool_id == latest.c.pool_id,
+                models.PoolMetric.captured_at == latest.c.captured_at,
+            ),
+        )
+        .order_by(models.Pool.id, models.PoolMetric.id.desc())
+        .all()
+    )
 
+    result = []
+    last_pool_id = None
+    for pool_id, sui_pool_id, pool_name, dex_name, symbol0, symbol1, tvl, volume, risk_score, captured_at in rows:
+        if pool_id == last_pool_id:
+            continue  # aynı captured_at'li ikinci metric; en yeni id kazanır
+        last_pool_id = pool_id
         result.append(
             {
-                "id": p.id,
-                "sui_pool_id": p.sui_pool_id,
-                "pool_name": getattr(p, "pool_name", None),
-                "dex_name": p.dex_name,
-                "token0": p.token0.symbol if p.token0 else None,
-                "token1": p.token1.symbol if p.token1 else None,
-                "metric":
-                    None
-                    if latest_metric is None
-                    else {
-                        "tvl_usd": float(latest_metric.tvl_usd) if latest_metric.tvl_usd is not None else 0.0,
-                        "volume_24h": float(latest_metric.volume_24h)
-                        if latest_metric.volume_24h is not None
-                        else 0.0,
-                        "risk_score": latest_metric.risk_score,
-                        "captured_at": latest_metric.captured_at.isoformat(),
-                    },
+                "id": pool_id,
+                "sui_pool_id": sui_pool_id,
+                "pool_name": pool_name,
+                "dex_name": dex_name,
+                "token0": symbol0,
+                "token1": symbol1,
+                # Decimal / datetime dönüşümünü serializer (orjson default) yapıyor
+                "metric": None
+                if captured_at is None
+                else {
+                    "tvl_usd": tvl if tvl is not None else 0.0,
+                    "volume_24h": volume if volume is not None else 0.0,
+                    "risk_score": risk_score,
+                    "captured_at": captured_at,
+                },
             }
         )
-
     return result
 
 
+@app.get("/pools/summary")
+def list_pools_with_latest_metrics(request: Request, db: Session = Depends(get_read_db)):
+    """
+    Returns all pools with their latest risk metrics so the frontend can render a bubble map without multiple round trips.
+    Değişmemiş özet için If-None-Match ile 304 döner; gövde sürüm başına bir kez serialize / sıkıştırılır.
+    """
+    global _pools_summary_cache
+
+    etag = make_etag("pools-summary", *_pools_summary_version(db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    cached = _pools_summary_cache
+    if cached is None or cached.etag != etag:
+        rows = _pools_summary_rows(db)
+        with span("encode"):
+            cached = CachedPayload(body=dumps(rows), etag=etag)
+        _pools_summary_cache = cached
+    return cached.response(request)
+
+
+@app.get("/pools/rankings")
+def get_pool_rankings(
+    by: str = "risk_score",
+    limit: int = Query(10, ge=1, le=1000),
+    order: str = "desc",
+    db: Session = Depends(get_read_db),
+):
+    """
+    Havuzları son metriklerine göre sıralar (ör. en riskli N havuz).
+    Sıralama sync turlarında önceden hesaplanan index'ten okunur.
+    """
+    if by not in RANKING_METRICS:
+        raise HTTPException(status_code=400, detail=f"by must be one of: {', '.join(RANKING_METRICS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+
+    index = ranking_store.get(db)
+    return {
+        "by": by,
+        "order": order,
+        "total": len(index.ordered.get(by, [])),
+        "built_at": index.built_at,
+        "items": index.top(by, limit, ascending=order == "asc"),
+    }
+
+
+@app.get("/pools/{pool_id}/percentiles")
+def get_pool_percentiles(pool_id: int, db: Session = Depends(get_read_db)):
+    """
+    Havuzun risk_score / tvl_usd / volume_24h değerlerinin tüm havuzlar içindeki
+    sırası ve yüzdelik dilimi (100 = en yüksek değer).
+    """
+    index = ranking_store.get(db)
+    if pool_id not in index.entries:
+        raise HTTPException(status_code=404, detail="No metrics for this pool yet.")
+
+    return {
+        "pool_id": pool_id,
+        "pools_ranked": len(index.entries),
+        "built_at": index.built_at,
+        "metrics": index.percentiles[pool_id],
+    }
+
+
+@app.get("/tokens/{address}/risk")
+def get_token_risk(address: str, db: Session = Depends(get_read_db)):
+    """
+    Token'ın yer aldığı tüm havuzların son metriklerinden toplanan risk özeti:
+    havuz sayısı, toplam TVL / 24s hacim ve TVL ağırlıklı risk skoru.
+    Önceden hesaplanmış token_risk_rollups satırından okunur; satır yoksa
+    yazmadan anlık hesaplanır (satırı ilk metrik sync'i oluşturur).
+    """
+    token = db.query(models.Token).filter(models.Token.address == address).first()
+    if not token:
+        raise HTTPException(status_code=404, detail="Token not found")
+
+    rollup = db.get(models.TokenRiskRollup, token.id)
+    if rollup is None:
+        rollup = compute_token_rollup(db, token.id)
+
+    return serialize_rollup(token, rollup)
+
+
 @app.get("/pools/{pool_id}/metrics/latest")
-def get_latest_pool_metric(pool_id: int, db: Session = Depends(get_db)):
+def get_latest_pool_metric(pool_id: int, db: Session = Depends(get_read_db)):
     """
     Belirli bir havuz için son kaydedilmiş risk metriklerini döner.
     """
@@ -178,79 +482,107 @@ async def sync_deepbook_pools(db: Session = Depends(get_db)):
     """
     Surflux Deepbook 'get_pools' çağrısını yapar,
     gelen datayı tokens + pools tablolarına yazar.
+    Aynı anda sadece bir replica çalıştırabilir (leader lock).
     """
+    with leader_lock("sync_deepbook_pools") as is_leader:
+        if not is_leader:
+            raise HTTPException(status_code=409, detail="Pool sync is already running on another worker")
+        return await _sync_deepbook_pools(db)
+
+
+@app.post("/sync/pools")
+async def sync_all_market_pools(db: Session = Depends(get_db)):
+    """
+    MARKET_ADAPTERS'taki tüm dex adapter'larının havuz listelerini eşzamanlı çeker
+    ve tokens + pools tablolarına yazar. Bir venue'nun hatası diğerlerini durdurmaz;
+    venue bazında sonuç döner.
+    """
+    with leader_lock("sync_pools") as is_leader:
+        if not is_leader:
+            raise HTTPException(status_code=409, detail="Pool sync is already running on another worker")
+
+        listings_by_dex = await ingest_pool_listings()
+        venues = {}
+        for dex_name, listings in listings_by_dex.items():
+            if isinstance(listings, BaseException):
+                venues[dex_name] = {"error": str(listings) or type(listings).__name__}
+                continue
+            venues[dex_name] = {
+                "total_received": len(listings),
+                "new_pools_created": _upsert_pool_listings(db, dex_name, listings),
+            }
+        db.commit()
+
+    return {"message": "Pools synced", "venues": venues}
+
+
+async def _sync_deepbook_pools(db: Session):
+    adapter = get_adapter(DEFAULT_DEX)
     try:
-        pools = await fetch_deepbook_pools()
-    except SurfluxError as e:
+        listings = await adapter.list_pools()
+    except MARKET_DATA_ERRORS as e:
         raise HTTPException(status_code=502, detail=str(e))
 
-    created_pools = 0
+    created_pools = _upsert_pool_listings(db, adapter.dex_name, listings)
+    db.commit()
 
-    for p in pools:
-        # 1) Base token'i bul/oluştur
-        base_token = (
-            db.query(models.Token)
-            .filter(models.Token.address == p["base_asset_id"])
-            .first()
-        )
-        if not base_token:
-            base_token = models.Token(
-                address=p["base_asset_id"],
-                symbol=p["base_asset_symbol"],
-                name=p.get("base_asset_name"),
-                decimals=p.get("base_asset_decimals", 9),
-            )
-            db.add(base_token)
+    return {
+        "message": "Deepbook pools synced",
+        "total_received": len(listings),
+        "new_pools_created": created_pools,
+    }
+
+
+def _upsert_pool_listings(db: Session, dex_name: str, listings: List[PoolListing]) -> int:
+    """Adapter'dan gelen havuzları ve token'larını bulur/oluşturur; yeni havuz sayısını döner."""
+    tokens: Dict[str, models.Token] = {}
+
+    def get_or_create_token(address: str, symbol: str, name: Optional[str], decimals: int) -> models.Token:
+        token = tokens.get(address)
+        if token is None:
+            token = db.query(models.Token).filter(models.Token.address == address).first()
+        if token is None:
+            token = models.Token(address=address, symbol=symbol, name=name, decimals=decimals)
+            db.add(token)
             db.flush()  # id'yi almak için
+        tokens[address] = token
+        return token
 
-        # 2) Quote token'i bul/oluştur
-        quote_token = (
-            db.query(models.Token)
-            .filter(models.Token.address == p["quote_asset_id"])
-            .first()
+    created_pools = 0
+
+    for p in listings:
+        base_token = get_or_create_token(
+            p.base_asset_id, p.base_asset_symbol, p.base_asset_name, p.base_asset_decimals
+        )
+        quote_token = get_or_create_token(
+            p.quote_asset_id, p.quote_asset_symbol, p.quote_asset_name, p.quote_asset_decimals
         )
-        if not quote_token:
-            quote_token = models.Token(
-                address=p["quote_asset_id"],
-                symbol=p["quote_asset_symbol"],
-                name=p.get("quote_asset_name"),
-                decimals=p.get("quote_asset_decimals", 9),
-            )
-            db.add(quote_token)
-            db.flush()
 
-        # 3) Pool'u bul/oluştur
         pool = (
             db.query(models.Pool)
-            .filter(models.Pool.sui_pool_id == p["pool_id"])
+            .filter(models.Pool.sui_pool_id == p.sui_pool_id)
             .first()
         )
 
         if not pool:
             pool = models.Pool(
-                sui_pool_id=p["pool_id"],
-                pool_name=p["pool_name"],  # Surflux get_pools'tan gelen isim (SUI_USDC vb.)
-                dex_name="Deepbook",
+                sui_pool_id=p.sui_pool_id,
+                pool_name=p.pool_name,  # Adapter'ın kullandığı isim (Deepbook'ta SUI_USDC vb.)
+                dex_name=dex_name,
                 token0_id=base_token.id,
                 token1_id=quote_token.id,
             )
             db.add(pool)
             created_pools += 1
         else:
-            # Eski kayıtsa pool_name yoksa/güncellenmesi gerekiyorsa set et
-            if not getattr(pool, "pool_name", None) and "pool_name" in p:
-                pool.pool_name = p["pool_name"]
-            # Dex adını normalize etmek istersen:
-            if pool.dex_name != "Deepbook":
-                pool.dex_name = "Deepbook"
+            # Eski kayıtsa pool_name yoksa set et
+            if not getattr(pool, "pool_name", None) and p.pool_name:
+                pool.pool_name = p.pool_name
+            # Dex adını adapter'ın adına normalize et
+            if pool.dex_name != dex_name:
+                pool.dex_name = dex_name
 
-    db.commit()
-
-    return {
-        "message": "Deepbook pools synced",
-        "total_received": len(pools),
-        "new_pools_created": created_pools,
-    }
+    return created_pools
 
 
 @app.post("/sync/deepbook/metrics/{pool_id}")
@@ -272,6 +604,10 @@ async def sync_deepbook_metrics_for_pool(
     # Surflux için pool_name: SUI_USDC, NS_SUI vb.
     pool_name = pool.pool_name
 
+    # Manuel tek havuz sync'i cooldown'a takılmaz, sadece eşzamanlı çalışmayı engeller
+    if not claim_pool_lease(db, pool.id, respect_cooldown=False):
+        raise HTTPException(status_code=409, detail="Pool is being synced by another worker")
+
     try:
         metric = await calculate_and_store_pool_metrics(
             db=db,
@@ -281,6 +617,8 @@ async def sync_deepbook_metrics_for_pool(
     except Exception as e:
         logger.exception("Risk metric calculation failed")
         raise HTTPException(status_code=500, detail=f"Metric calculation failed: {e}")
+    finally:
+        release_pool_lease(db, pool_id)
 
     return {
         "message": "Metrics synced for pool",
@@ -295,59 +633,44 @@ async def sync_deepbook_metrics_for_pool(
     }
 
 
-@app.post("/sync/deepbook/metrics")
-async def sync_deepbook_metrics_for_all_pools(db: Session = Depends(get_db)):
+@app.post("/sync/deepbook/metrics", status_code=202)
+def sync_deepbook_metrics_for_all_pools(db: Session = Depends(get_db)):
     """
-    Kayıtlı tüm havuzlar için risk metriklerini hesaplar ve PoolMetric oluşturur.
-    Demo / manuel tetikleme için ideal.
+    Kayıtlı tüm havuzlar için metrik sync job'ı kuyruğa ekler ve hemen döner.
+    İş arka plandaki worker'lar tarafından havuz havuz işlenir;
+    ilerleme ve havuz bazlı sonuçlar için /sync/jobs/{job_id}.
+
+    Kuyrukta ya da çalışmakta olan bir job varsa yenisi açılmaz, o job döner.
+    Birden fazla replica varsa item'lar worker'lar arasında paylaşılır;
+    aynı havuz aynı anda iki worker'da işlenmez (pool lease), cooldown'daki
+    havuzlar "skipped" olarak işaretlenir.
     """
-    pools = db.query(models.Pool).all()
-    if not pools:
+    pool_ids = [pool_id for (pool_id,) in db.query(models.Pool.id).order_by(models.Pool.id).all()]
+    if not pool_ids:
         raise HTTPException(status_code=404, detail="No pools found. Run /sync/deepbook/pools first.")
 
-    results = []
-    for pool in pools:
-        if not pool.pool_name:
-            results.append(
-                {
-                    "pool_id": pool.id,
-                    "error": "Pool has no pool_name set",
-                }
-            )
-            continue
-
-        pool_name = pool.pool_name
-
-        try:
-            metric = await calculate_and_store_pool_metrics(
-                db=db,
-                pool=pool,
-                pool_name=pool_name,
-            )
-            results.append(
-                {
-                    "pool_id": pool.id,
-                    "risk_score": metric.risk_score,
-                    "tvl_usd": str(metric.tvl_usd) if metric.tvl_usd is not None else None,
-                    "volume_24h": str(metric.volume_24h) if metric.volume_24h is not None else None,
-                }
-            )
-        except Exception as e:
-            logger.exception(f"Metric calculation failed for pool_id={pool.id}")
-            results.append(
-                {
-                    "pool_id": pool.id,
-                    "error": str(e),
-                }
-            )
+    job, created = enqueue_metrics_sync_job(db, pool_ids)
 
     return {
-        "message": "Metrics sync completed for all pools",
-        "count": len(results),
-        "results": results,
+        "message": "Metrics sync job queued" if created else "A metrics sync job is already queued or running",
+        "job_id": job.id,
+        "status": job.status,
+        "count": job.total_items,
     }
 
 
+@app.get("/sync/jobs/{job_id}")
+def get_sync_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Sync job'ının durumu, ilerlemesi ve havuz bazlı sonuçları.
+    Biten havuzlar eski /sync/deepbook/metrics cevabındaki formatta döner.
+    """
+    status = get_job_status(db, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return status
+
+
 @app.get("/risk/level-from-score")
 def get_level_from_score(score: int):
     """
@@ -365,7 +688,7 @@ def get_level_from_score(score: int):
 
 
 @app.get("/risk/identity/wallet-score/{address}")
-def get_wallet_risk_score(address: str, db: Session = Depends(get_db)):
+def get_wallet_risk_score(address: str, db: Session = Depends(get_read_db)):
     score = compute_wallet_risk_score(address, db)
     level = map_risk_score_to_level(score)
     return {
@@ -395,6 +718,45 @@ def get_mint_risk_identity_payload(body: MintRiskIdentityRequest, db: Session =
     )
     """
 
+    _require_risk_package_id()
+    return _build_mint_payload(body.address, db, int(time.time() * 1000))
+
+
+@app.post("/risk/identity/mint-payload/batch", response_model=MintRiskIdentityBatchPayload)
+def get_mint_risk_identity_payload_batch(body: MintRiskIdentityBatchRequest, db: Session = Depends(get_db)):
+    """
+    Çok sayıda cüzdan için mint payload'larını üretir.
+
+    Payload'lar group_size'lık gruplar halinde döner; her grup tek bir
+    programmable transaction içinde art arda mint_identity çağrılarına
+    dönüştürülebilir. Tüm payload'lar aynı timestamp_ms'i paylaşır,
+    tekrar eden adresler tek payload üretir.
+    """
+    _require_risk_package_id()
+
+    addresses = list(dict.fromkeys(body.addresses))
+    if len(addresses) > MINT_BATCH_MAX_ADDRESSES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"En fazla {MINT_BATCH_MAX_ADDRESSES} adres gönderilebilir.",
+        )
+
+    group_size = min(body.group_size or MINT_BATCH_GROUP_SIZE, MINT_BATCH_MAX_GROUP_SIZE)
+    ts_ms = int(time.time() * 1000)
+    payloads = [_build_mint_payload(address, db, ts_ms) for address in addresses]
+
+    return MintRiskIdentityBatchPayload(
+        total=len(payloads),
+        group_size=group_size,
+        timestamp_ms=ts_ms,
+        groups=[
+            MintRiskIdentityPayloadGroup(payloads=payloads[i:i + group_size])
+            for i in range(0, len(payloads), group_size)
+        ],
+    )
+
+
+def _require_risk_package_id() -> None:
     if not SUI_RISK_PACKAGE_ID:
         # Env yanlışsa net hata verelim
         raise HTTPException(
@@ -402,21 +764,21 @@ def get_mint_risk_identity_payload(body: MintRiskIdentityRequest, db: Session =
             detail="SUI_RISK_PACKAGE_ID env değişkeni tanımlı değil.",
         )
 
-    computed_score = compute_wallet_risk_score(body.address, db)
+
+def _build_mint_payload(address: str, db: Session, ts_ms: int) -> MintRiskIdentityPayload:
+    computed_score = compute_wallet_risk_score(address, db)
     score = clamp_score(computed_score)
     level = map_risk_score_to_level(score)
 
-    ts_ms = int(time.time() * 1000)
-
-    # 3) Move fonksiyonuna gidecek argümanlar
+    # Move fonksiyonuna gidecek argümanlar
     args = [
-        body.address,    # recipient: address
+        address,         # recipient: address
         str(score),      # score: u64
         str(level),      # level: u8
         str(ts_ms),      # ts_ms: u64
     ]
 
-    # 4) Frontend / wallet için payload
+    # Frontend / wallet için payload
     return MintRiskIdentityPayload(
         package_id=SUI_RISK_PACKAGE_ID,
         module=SUI_RISK_MODULE,
@@ -429,37 +791,132 @@ def get_mint_risk_identity_payload(body: MintRiskIdentityRequest, db: Session =
 
 
 @app.post("/risk/identity/store")
-def store_identity(data: dict, db: Session = Depends(get_db)):
+def store_identity(body: StoreRiskIdentityRequest, db: Session = Depends(get_db)):
     """
     Mint edilen Risk Identity NFT bilgilerini veritabanına kaydeder.
     Frontend mint işlemi sonrasında bu endpoint'i çağırır.
     """
-    entry = models.RiskIdentity(
-        address=data["address"],
-        score=data["score"],
-        level=data["level"],
-        timestamp_ms=data["timestamp_ms"],
-        tx_digest=data["tx_digest"],
-    )
+    entry = models.RiskIdentity(**_identity_row(body))
     db.add(entry)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Bu tx_digest ve adres için kayıt zaten var.")
     return {"status": "ok"}
 
 
+@app.post("/risk/identity/store/batch")
+def store_identity_batch(body: StoreRiskIdentityBatchRequest, db: Session = Depends(get_db)):
+    """
+    Toplu mint sonrası Risk Identity kayıtlarını tek bir bulk insert ile yazar.
+
+    Aynı PTB'de mint edilen kimlikler aynı tx_digest'i paylaştığı için
+    tekrar kontrolü (tx_digest, address) çifti üzerinden yapılır; hem istek
+    içindeki tekrarlar hem de DB'de zaten olan kayıtlar reddedilir.
+    """
+    if len(body.items) > STORE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"En fazla {STORE_BATCH_MAX_ITEMS} kayıt gönderilebilir.",
+        )
+
+    digests = {item.tx_digest for item in body.items}
+    existing = set(
+        db.query(models.RiskIdentity.tx_digest, models.RiskIdentity.address)
+        .filter(models.RiskIdentity.tx_digest.in_(digests))
+        .all()
+    )
+
+    rows = []
+    rejected = []
+    seen = set()
+    for item in body.items:
+        key = (item.tx_digest, item.address)
+        if key in existing:
+            rejected.append({"tx_digest": item.tx_digest, "address": item.address, "reason": "already_stored"})
+            continue
+        if key in seen:
+            rejected.append({"tx_digest": item.tx_digest, "address": item.address, "reason": "duplicate_in_batch"})
+            continue
+        seen.add(key)
+        rows.append(_identity_row(item))
+
+    if rows:
+        try:
+            db.execute(insert(models.RiskIdentity), rows)
+            db.commit()
+        except IntegrityError:
+            # Kontrol ile insert arasında başka bir istek aynı kaydı yazdı
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Kayıtlardan biri eşzamanlı olarak eklendi; tekrar deneyin.")
+
+    return {"status": "ok", "inserted": len(rows), "rejected": rejected}
+
+
+def _identity_row(item: StoreRiskIdentityRequest) -> dict:
+    return {
+        "address": item.address,
+        "score": item.score,
+        "level": str(item.level),
+        "timestamp_ms": item.timestamp_ms,
+        "tx_digest": item.tx_digest,
+    }
+
+
 @app.get("/risk/identity/history/{address}")
-def get_identity_history(address: str, db: Session = Depends(get_db)):
+def get_identity_history(
+    address: str,
+    response: Response,
+    before_ts: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(IDENTITY_HISTORY_DEFAULT_LIMIT, ge=1, le=IDENTITY_HISTORY_MAX_LIMIT),
+    latest: bool = False,
+    db: Session = Depends(get_read_db),
+):
     """
-    Verilen cüzdan adresi için kayıtlı tüm Risk Identity geçmişini döner.
-    Timestamp'e göre azalan sırada (en yeni önce).
+    Verilen cüzdan adresi için kayıtlı Risk Identity geçmişini döner.
+    Timestamp'e göre azalan sırada (en yeni önce), sayfa sayfa.
+
+    Keyset pagination: bir sonraki sayfa için X-Next-Before-Ts /
+    X-Next-Before-Id header'larındaki değerler before_ts / before_id olarak
+    gönderilir. Sorgu (address, timestamp_ms) index'inden okunduğu için her
+    sayfanın maliyeti geçmişin uzunluğundan bağımsız. latest=true sadece en
+    son kaydı döner.
     """
+    query = db.query(models.RiskIdentity).filter(models.RiskIdentity.address == address)
+
+    if before_ts is not None:
+        if before_id is not None:
+            # Aynı timestamp'li kayıtlar (toplu mint) id ile ayrışır
+            query = query.filter(
+                or_(
+                    models.RiskIdentity.timestamp_ms < before_ts,
+                    and_(
+                        models.RiskIdentity.timestamp_ms == before_ts,
+                        models.RiskIdentity.id < before_id,
+                    ),
+                )
+            )
+        else:
+            query = query.filter(models.RiskIdentity.timestamp_ms < before_ts)
+
+    if latest:
+        limit = 1
+
     rows = (
-        db.query(models.RiskIdentity)
-        .filter(models.RiskIdentity.address == address)
-        .order_by(models.RiskIdentity.timestamp_ms.desc())
+        query.order_by(models.RiskIdentity.timestamp_ms.desc(), models.RiskIdentity.id.desc())
+        .limit(limit)
         .all()
     )
+
+    if len(rows) == limit and not latest:
+        response.headers["X-Next-Before-Ts"] = str(rows[-1].timestamp_ms)
+        response.headers["X-Next-Before-Id"] = str(rows[-1].id)
+
     return [
         {
+            "id": r.id,
             "score": r.score,
             "level": r.level,
             "timestamp_ms": r.timestamp_ms,
@@ -469,8 +926,82 @@ def get_identity_history(address: str, db: Session = Depends(get_db)):
     ]
 
 
+@app.get("/risk/identity/indexer")
+def get_identity_indexer_status(db: Session = Depends(get_read_db)):
+    """On-chain RiskIdentity indexer'ının cursor'u ve indexlenen kayıt sayısı."""
+    from .identity_indexer import get_indexer_status
+
+    return get_indexer_status(db)
+
+
+async def _pool_order_book(pool_id: int, db: Session):
+    """Havuzun cache'teki order book snapshot'ı (TTL dolduysa dex adapter'ından yenilenir) ve decimals."""
+    pool = db.get(models.Pool, pool_id)
+    if not pool:
+        raise HTTPException(status_code=404, detail="Pool not found")
+    if not pool.pool_name:
+        raise HTTPException(status_code=500, detail="Pool has no pool_name set")
+
+    base_decimals = pool.token0.decimals if pool.token0 else 9
+    quote_decimals = pool.token1.decimals if pool.token1 else 9
+
+    try:
+        snapshot = await order_book_cache.get(pool.pool_name, dex_name=pool.dex_name)
+    except MARKET_DATA_ERRORS as e:
+        logger.exception("Order book fetch failed")
+        raise HTTPException(status_code=502, detail=str(e))
+    return snapshot, base_decimals, quote_decimals
+
+
+def _check_slippage_params(side: Optional[str], unit: str) -> None:
+    if side is not None and side not in SLIPPAGE_SIDES:
+        raise HTTPException(status_code=400, detail="side must be 'buy' or 'sell'")
+    if unit not in SLIPPAGE_UNITS:
+        raise HTTPException(status_code=400, detail="unit must be 'quote' or 'base'")
+
+
+@app.get("/pools/{pool_id}/slippage")
+async def get_pool_slippage(
+    pool_id: int,
+    side: str = "buy",
+    size: float = Query(..., gt=0),
+    unit: str = "quote",
+    db: Session = Depends(get_read_db),
+):
+    """
+    `size` büyüklüğünde bir alım/satımın maliyeti: ortalama ve en kötü dolum fiyatı,
+    mid fiyata göre slippage ve best fiyata göre price impact.
+    Cache'teki snapshot'ın kümülatif derinlik dizileri üzerinde binary search ile hesaplanır.
+    """
+    _check_slippage_params(side, unit)
+    snapshot, base_decimals, quote_decimals = await _pool_order_book(pool_id, db)
+    return {
+        "pool_id": pool_id,
+        "unit": unit,
+        **book_context(snapshot, quote_decimals),
+        **quote_slippage(snapshot, side, size, base_decimals, quote_decimals, unit),
+    }
+
+
+@app.post("/pools/{pool_id}/slippage/batch")
+async def get_pool_slippage_batch(pool_id: int, body: SlippageBatchRequest, db: Session = Depends(get_read_db)):
+    """Aynı snapshot üzerinden çok sayıda boyut (ve iki taraf) için slippage quote'ları."""
+    _check_slippage_params(body.side, body.unit)
+    if len(body.sizes) > SLIPPAGE_BATCH_MAX_SIZES:
+        raise HTTPException(status_code=400, detail=f"At most {SLIPPAGE_BATCH_MAX_SIZES} sizes per request")
+
+    snapshot, base_decimals, quote_decimals = await _pool_order_book(pool_id, db)
+    sides = [body.side] if body.side else list(SLIPPAGE_SIDES)
+    return {
+        "pool_id": pool_id,
+        "unit": body.unit,
+        **book_context(snapshot, quote_decimals),
+        "quotes": quote_slippage_many(snapshot, sides, body.sizes, base_decimals, quote_decimals, body.unit),
+    }
+
+
 @app.get("/pools/{pool_id}/wallet-graph")
-async def get_wallet_graph(pool_id: int, db: Session = Depends(get_db)):
+async def get_wallet_graph(pool_id: int, request: Request, db: Session = Depends(get_read_db)):
     pool = db.get(models.Pool, pool_id)
     if not pool:
         raise HTTPException(status_code=404, detail="Pool not found")
@@ -491,10 +1022,201 @@ async def get_wallet_graph(pool_id: int, db: Session = Depends(get_db)):
             quote_decimals=quote_decimals,
             trades_limit=200,
         )
-        return graph
-    except SurfluxError as e:
-        logger.exception("Surflux trades fetch failed")
+    except MARKET_DATA_ERRORS as e:
+        logger.exception("Trades fetch failed")
         raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         logger.exception("Wallet graph build failed")
         raise HTTPException(status_code=500, detail=f"Wallet graph build failed: {e}")
+
+    # Graph her istekte Surflux'tan yeniden kuruluyor; ETag gövdenin hash'i, 304 sadece transferi kısaltır
+    with span("encode"):
+        body = dumps(graph)
+    return CachedPayload(body=body, etag=body_etag(body)).response(request)
+
+
+def _require_publisher_access(token: Optional[str]) -> None:
+    if not PUBLISHER_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Publishing endpoints are disabled; set PUBLISHER_API_TOKEN")
+    if token is None or not hmac.compare_digest(token.encode("utf-8"), PUBLISHER_API_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail=f"{PUBLISHER_TOKEN_HEADER} header is missing or invalid")
+
+
+@app.post("/publish/pool-risk/registrations")
+def register_pool_risk_object(
+    body: PoolRiskRegistrationRequest,
+    db: Session = Depends(get_db),
+    x_publisher_token: Optional[str] = Header(None),
+):
+    """
+    Havuzu on-chain PoolRisk objesiyle eşleştirir.
+    Obje önce risk_index::init_pool_risk ile yaratılmış olmalı.
+    """
+    _require_publisher_access(x_publisher_token)
+    if not db.get(models.Pool, body.pool_id):
+        raise HTTPException(status_code=404, detail="Pool not found")
+
+    publication = db.get(models.PoolRiskPublication, body.pool_id)
+    if publication is None:
+        publication = models.PoolRiskPublication(pool_id=body.pool_id)
+        db.add(publication)
+
+    if publication.pool_risk_object_id != body.pool_risk_object_id:
+        # Yeni obje henüz hiç güncellenmedi; bir sonraki cycle'da mutlaka yayınlansın
+        publication.pool_risk_object_id = body.pool_risk_object_id
+        publication.last_published_score = None
+        publication.last_published_ts_ms = None
+        publication.last_tx_digest = None
+
+    db.commit()
+    return {"status": "ok", "pool_id": body.pool_id, "pool_risk_object_id": body.pool_risk_object_id}
+
+
+@app.get("/publish/pool-risk")
+def list_pool_risk_publications(db: Session = Depends(get_read_db)):
+    """Kayıtlı havuzlar ve en son on-chain yayınlanan skorları."""
+    return [
+        {
+            "pool_id": p.pool_id,
+            "pool_risk_object_id": p.pool_risk_object_id,
+            "last_published_score": p.last_published_score,
+            "last_published_ts_ms": p.last_published_ts_ms,
+            "last_tx_digest": p.last_tx_digest,
+        }
+        for p in db.query(models.PoolRiskPublication).order_by(models.PoolRiskPublication.pool_id).all()
+    ]
+
+
+@app.post("/publish/pool-risk")
+async def publish_pool_risk_scores(
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    x_publisher_token: Optional[str] = Header(None),
+):
+    """
+    Son risk skorlarını on-chain PoolRisk objelerine yazar.
+    Sadece eşiği aşan değişiklikler gönderilir; update_score çağrıları
+    mümkün olduğunca az programmable transaction'a paketlenir.
+    """
+    _require_publisher_access(x_publisher_token)
+    with leader_lock("publish_pool_risk") as is_leader:
+        if not is_leader:
+            raise HTTPException(status_code=409, detail="Publishing is already running on another worker")
+        from .publisher import publish_pool_scores
+
+        try:
+            return await publish_pool_scores(db, dry_run=dry_run)
+        except SuiRpcError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+
+def _serialize_alert_subscription(sub: models.AlertSubscription) -> Dict[str, Any]:
+    return {
+        "id": sub.id,
+        "url": sub.url,
+        "pool_id": sub.pool_id,
+        "min_score": sub.min_score,
+        "min_delta": sub.min_delta,
+        "on_level_change": sub.on_level_change,
+        "signed": bool(sub.secret),
+        "active": sub.active,
+        "created_at": sub.created_at,
+        "last_delivery_at": sub.last_delivery_at,
+        "consecutive_failures": sub.consecutive_failures,
+        "last_error": sub.last_error,
+    }
+
+
+@app.post("/alerts/subscriptions", status_code=201)
+def create_alert_subscription(body: AlertSubscriptionRequest, db: Session = Depends(get_db)):
+    """
+    Risk alarmı webhook'u kaydeder. Sync sırasında kurallardan biri tetiklenince
+    alarmlar url'e {"alerts": [...]} olarak toplu POST edilir.
+    """
+    # Sunucu bu adrese POST atacak: loopback / private / link-local hedefler reddedilir
+    try:
+        check_webhook_url(body.url)
+    except WebhookTargetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=400, detail="url host could not be resolved")
+    if body.min_score is None and body.min_delta is None and not body.on_level_change:
+        raise HTTPException(status_code=400, detail="At least one rule is required: min_score, min_delta or on_level_change")
+    if body.pool_id is not None and db.get(models.Pool, body.pool_id) is None:
+        raise HTTPException(status_code=404, detail="Pool not found")
+
+    sub = models.AlertSubscription(
+        url=body.url,
+        secret=body.secret,
+        pool_id=body.pool_id,
+        min_score=body.min_score,
+        min_delta=body.min_delta,
+        on_level_change=body.on_level_change,
+    )
+    db.add(sub)
+    db.commit()
+    db.refresh(sub)
+
+    # Bu process'in kural snapshot'ı hemen güncellensin; diğer replica'lar periyodik yeniler
+    alert_engine.reload(db)
+    return _serialize_alert_subscription(sub)
+
+
+@app.get("/alerts/subscriptions")
+def list_alert_subscriptions(db: Session = Depends(get_db)):
+    subs = db.query(models.AlertSubscription).order_by(models.AlertSubscription.id).all()
+    return [_serialize_alert_subscription(sub) for sub in subs]
+
+
+@app.delete("/alerts/subscriptions/{subscription_id}")
+def delete_alert_subscription(subscription_id: int, db: Session = Depends(get_db)):
+    sub = db.get(models.AlertSubscription, subscription_id)
+    if sub is None:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    db.delete(sub)
+    db.commit()
+    alert_engine.reload(db)
+    return {"status": "deleted", "id": subscription_id}
+
+
+@app.get("/alerts/status")
+def get_alert_status():
+    """Alarm kuyruğu ve teslimat sayaçları (bu process için)."""
+    return alert_engine.status()
+
+
+def _require_profile_access(token: Optional[str]) -> None:
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling endpoints are disabled; set PROFILING_TOKEN")
+    if not authorized(token):
+        raise HTTPException(status_code=403, detail=f"{PROFILE_TOKEN_HEADER} header is missing or invalid")
+
+
+@app.get("/debug/profiles")
+def list_request_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    path: Optional[str] = None,
+    x_profile_token: Optional[str] = Header(None),
+):
+    """Son profillenen isteklerin özetleri (en yeni önce), path prefix'i ile filtrelenebilir."""
+    _require_profile_access(x_profile_token)
+    return profile_store.list(limit=limit, path=path)
+
+
+@app.get("/debug/profiles/{profile_id}")
+def get_request_profile(profile_id: int, x_profile_token: Optional[str] = Header(None)):
+    """Tek bir profilin span dökümü, en yavaş SQL'leri ve (istenmişse) sampler çıktısı."""
+    _require_profile_access(x_profile_token)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (may have been evicted)")
+    return profile.detail()
+
+
+@app.delete("/debug/profiles", status_code=204)
+def clear_request_profiles(x_profile_token: Optional[str] = Header(None)):
+    _require_profile_access(x_profile_token)
+    profile_store.clear()
+
+
+_IMPORT_TIME_MS = _elapsed_ms(_IMPORT_STARTED)
@@ -0,0 +1,176 @@
+"""Pluggable per-DEX market data adapters.
+
+Each adapter knows one venue and hands the scoring pipeline the same
+normalized inputs Deepbook / Surflux produce:
+
+* `list_pools()` -> `PoolListing`s (pool object id, name, base/quote assets)
+* `fetch_order_book(pool_name, limit)` -> `{"bids": [...], "asks": [...]}`
+  with levels `{"price", "total_quantity"}` in raw on-chain units, best first
+* `fetch_trades(pool_name, limit)` -> trades with `price`, `quote_quantity`
+  (raw units), `maker_balance_manager_id`, `taker_balance_manager_id`,
+  `timestamp`
+
+AMM venues without a book report their liquidity as synthetic levels.
+Adapters register under their `dex_name`, the value stored in
+`Pool.dex_name`, and the scoring path picks one from that. `ingest_pool_listings`
+lists every enabled adapter (MARKET_ADAPTERS) concurrently; one venue timing
+out or failing comes back as that venue's error without delaying or failing
+the others.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .surflux_client import (
+    SurfluxError,
+    fetch_deepbook_pools,
+    fetch_order_book_depth,
+    fetch_recent_trades,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEX = "Deepbook"
+
+# Pool listesi senkronize edilen venue'lar (virgülle ayrılmış dex adları)
+MARKET_ADAPTERS = [name.strip() for name in os.getenv("MARKET_ADAPTERS", DEFAULT_DEX).split(",") if name.strip()]
+MARKET_ADAPTER_TIMEOUT_SECONDS = float(os.getenv("MARKET_ADAPTER_TIMEOUT_SECONDS", "30"))
+
+
+class MarketDataError(Exception):
+    pass
+
+
+# Adapter'ların fırlatabileceği veri hataları (Surflux kendi hata tipini kullanıyor)
+MARKET_DATA_ERRORS = (MarketDataError, SurfluxError)
+
+
+@dataclass
+class PoolListing:
+    sui_pool_id: str
+    pool_name: str
+    base_asset_id: str
+    base_asset_symbol: str
+    quote_asset_id: str
+    quote_asset_symbol: str
+    base_asset_name: Optional[str] = None
+    quote_asset_name: Optional[str] = None
+    base_asset_decimals: int = 9
+    quote_asset_decimals: int = 9
+
+
+class MarketAdapter(ABC):
+    """
+    Base class; subclasses set `dex_name` and implement the three fetches.
+    An adapter missing one of them cannot be instantiated.
+    """
+
+    dex_name: str = ""
+
+    @abstractmethod
+    async def list_pools(self) -> List[PoolListing]:
+        ...
+
+    @abstractmethod
+    async def fetch_order_book(self, pool_name: str, limit: int = 20) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def fetch_trades(self, pool_name: str, limit: int = 200) -> List[Dict[str, Any]]:
+        ...
+
+
+class DeepbookAdapter(MarketAdapter):
+    """Deepbook via Surflux; its payloads already are the normalized shape."""
+
+    dex_name = DEFAULT_DEX
+
+    async def list_pools(self) -> List[PoolListing]:
+        return [
+            PoolListing(
+                sui_pool_id=p["pool_id"],
+                pool_name=p["pool_name"],
+                base_asset_id=p["base_asset_id"],
+                base_asset_symbol=p["base_asset_symbol"],
+                base_asset_name=p.get("base_asset_name"),
+                base_asset_decimals=p.get("base_asset_decimals", 9),
+                quote_asset_id=p["quote_asset_id"],
+                quote_asset_symbol=p["quote_asset_symbol"],
+                quote_asset_name=p.get("quote_asset_name"),
+                quote_asset_decimals=p.get("quote_asset_decimals", 9),
+            )
+            for p in await fetch_deepbook_pools()
+        ]
+
+    async def fetch_order_book(self, pool_name: str, limit: int = 20) -> Dict[str, Any]:
+        return await fetch_order_book_depth(pool_name, limit=limit)
+
+    async def fetch_trades(self, pool_name: str, limit: int = 200) -> List[Dict[str, Any]]:
+        return await fetch_recent_trades(pool_name, limit=limit)
+
+
+_registry: Dict[str, MarketAdapter] = {}
+
+
+def register_adapter(adapter: MarketAdapter) -> None:
+    if not isinstance(adapter, MarketAdapter):
+        raise TypeError(f"{type(adapter).__name__} is not a MarketAdapter")
+    if not adapter.dex_name:
+        raise ValueError(f"{type(adapter).__name__} has no dex_name")
+    _registry[adapter.dex_name.lower()] = adapter
+
+
+def get_adapter(dex_name: Optional[str]) -> MarketAdapter:
+    adapter = _registry.get((dex_name or DEFAULT_DEX).lower())
+    if adapter is None:
+        raise MarketDataError(f"No market adapter registered for dex '{dex_name}'")
+    return adapter
+
+
+def registered_adapters() -> List[MarketAdapter]:
+    return list(_registry.values())
+
+
+def enabled_adapters() -> List[MarketAdapter]:
+    adapters = []
+    for name in MARKET_ADAPTERS:
+        try:
+            adapters.append(get_adapter(name))
+        except MarketDataError:
+            logger.warning(f"MARKET_ADAPTERS lists unknown dex '{name}'; skipped")
+    return adapters
+
+
+async def _list_with_timeout(adapter: MarketAdapter) -> List[PoolListing]:
+    try:
+        return await asyncio.wait_for(adapter.list_pools(), timeout=MARKET_ADAPTER_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise MarketDataError(f"{adapter.dex_name} pool listing timed out after {MARKET_ADAPTER_TIMEOUT_SECONDS:g}s")
+
+
+async def ingest_pool_listings(
+    adapters: Optional[Iterable[MarketAdapter]] = None,
+) -> Dict[str, Union[List[PoolListing], BaseException]]:
+    """
+    List pools on every adapter concurrently. Returns dex_name -> listings,
+    or the exception that venue raised.
+    """
+    adapters = list(adapters) if adapters is not None else enabled_adapters()
+    results = await asyncio.gather(*(_list_with_timeout(a) for a in adapters), return_exceptions=True)
+
+    by_dex: Dict[str, Union[List[PoolListing], BaseException]] = {}
+    for adapter, result in zip(adapters, results):
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            logger.warning(f"Pool listing failed for {adapter.dex_name}: {result}")
+        by_dex[adapter.dex_name] = result
+    return by_dex
+
+
+register_adapter(DeepbookAdapter())
@@ -0,0 +1,135 @@
+"""Persistence of raw market data (order book snapshots and trades).
+
+Stored rows are the input of the offline replay engine (see `replay.py`);
+live scoring never reads them back.
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .orderbook_cache import CachedOrderBook
+
+TRADES_PERSIST = os.getenv("TRADES_PERSIST", "false").lower() in ("1", "true", "yes")
+
+
+def persist_order_book_snapshot(db: Session, pool_id: int, snapshot: CachedOrderBook) -> bool:
+    """
+    Add the snapshot to the session unless it was already stored by an earlier sync.
+    Returns True when a row was added; the caller marks the snapshot persisted
+    only after its transaction commits, so a rollback leaves it to be stored again.
+    """
+    if snapshot.persisted:
+        return False
+
+    db.add(
+        models.OrderBookSnapshot(
+            pool_id=pool_id,
+            best_bid=snapshot.best_bid,
+            best_ask=snapshot.best_ask,
+            spread_pct=snapshot.spread_pct,
+            depth_bids=snapshot.depth_bids_raw,
+            depth_asks=snapshot.depth_asks_raw,
+            depth_delta=snapshot.depth_delta,
+            bids_json=json.dumps(snapshot.bids),
+            asks_json=json.dumps(snapshot.asks),
+            captured_at=datetime.utcfromtimestamp(snapshot.fetched_at),
+        )
+    )
+    return True
+
+
+def _trade_timestamp_ms(trade: Dict[str, Any]) -> Optional[int]:
+    for key in ("timestamp_ms", "timestamp", "checkpoint_timestamp_ms"):
+        value = trade.get(key)
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _trade_key(trade: Dict[str, Any], timestamp_ms: Optional[int]) -> str:
+    """Stable identifier used to skip trades that were already stored."""
+    for key in ("trade_id", "event_digest", "digest"):
+        value = trade.get(key)
+        if value:
+            return str(value)[:255]
+    return (
+        f"{timestamp_ms}:{trade.get('maker_balance_manager_id')}:"
+        f"{trade.get('taker_balance_manager_id')}:{trade.get('price')}:{trade.get('quote_quantity')}"
+    )[:255]
+
+
+def persist_trades(db: Session, pool_id: int, trades: List[Dict[str, Any]]) -> int:
+    """
+    Bulk-insert trades for a pool, skipping ones already stored (including ones
+    a concurrent sync of the same pool stores first).
+    Trades without a usable timestamp are ignored since replay cannot place them.
+    Returns the number of inserted rows.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for t in trades:
+        timestamp_ms = _trade_timestamp_ms(t)
+        if timestamp_ms is None or t.get("price") is None or t.get("quote_quantity") is None:
+            continue
+
+        key = _trade_key(t, timestamp_ms)
+        rows[key] = {
+            "pool_id": pool_id,
+            "trade_key": key,
+            "price": float(t["price"]),
+            "base_quantity": float(t["base_quantity"]) if t.get("base_quantity") is not None else None,
+            "quote_quantity": float(t["quote_quantity"]),
+            "maker_id": t.get("maker_balance_manager_id"),
+            "taker_id": t.get("taker_balance_manager_id"),
+            "timestamp_ms": timestamp_ms,
+        }
+
+    if not rows:
+        return 0
+
+    table = models.PoolTrade.__table__
+    values = list(rows.values())
+    dialect = db.get_bind().dialect.name
+
+    # Aynı havuzun çakışan iki sync'i aynı trade'leri yazabilir; unique ihlali
+    # metrikle aynı transaction'ı geri almasın diye çakışanlar sessizce atlanır
+    if dialect == "mysql":
+        stmt = insert(table).values(values).prefix_with("IGNORE")
+        return db.execute(stmt).rowcount
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(values).on_conflict_do_nothing(index_elements=["pool_id", "trade_key"])
+        return db.execute(stmt).rowcount
+
+    # Diğer dialect'ler: mevcut anahtarları ele, kalanları savepoint içinde ekle
+    existing = {
+        k
+        for (k,) in db.query(models.PoolTrade.trade_key)
+        .filter(models.PoolTrade.pool_id == pool_id)
+        .filter(models.PoolTrade.trade_key.in_(list(rows.keys())))
+    }
+    new_rows = [row for key, row in rows.items() if key not in existing]
+    if not new_rows:
+        return 0
+    try:
+        with db.begin_nested():
+            db.execute(insert(models.PoolTrade), new_rows)
+    except IntegrityError:
+        # Arada başka bir sync yazdı; o trade'ler zaten kayıtlı
+        return 0
+    return len(new_rows)
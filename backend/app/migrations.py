@@ -0,0 +1,450 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in `schema_migrations`. Migrations run once,
+before the API workers start (the container runs `python -m app.migrations`
+ahead of uvicorn), under a MySQL GET_LOCK so that several containers booting
+together do not race. API workers only check for pending versions.
+
+Migrations carry their own frozen DDL and never read the live models'
+metadata, so a fresh database goes through every version in order: 0001
+creates the tables as they stood when versioning was introduced, later ones
+change them. Each migration is also idempotent (tables created with
+checkfirst, columns and indexes added only when missing), so databases built
+by the old `create_all` startup hook upgrade the same way.
+
+Usage (from backend/):
+    python -m app.migrations            # wait for the DB, apply pending
+    python -m app.migrations --status   # list pending versions
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import (
+    DECIMAL,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_TIMEOUT_SECONDS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "300"))
+MIGRATION_DB_WAIT_ATTEMPTS = int(os.getenv("MIGRATION_DB_WAIT_ATTEMPTS", "30"))
+MIGRATION_DB_WAIT_DELAY_SECONDS = float(os.getenv("MIGRATION_DB_WAIT_DELAY_SECONDS", "2"))
+
+_LOCK_NAME = "schema_migrations"
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(64), primary_key=True),
+    Column("description", String(255), nullable=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    description: str
+    apply: Callable[[Connection], None]
+
+
+# ---------------- 0001: dondurulmuş şema ----------------
+# Versiyonlama başladığındaki tablolar. Modeller değişse de burası değişmez;
+# sonraki şema değişiklikleri yeni migration olarak eklenir.
+
+_v0001 = MetaData()
+
+Table(
+    "tokens",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("address", String(255), unique=True, nullable=False, index=True),
+    Column("symbol", String(64), nullable=False, index=True),
+    Column("name", String(255), nullable=True),
+    Column("decimals", Integer),
+)
+
+Table(
+    "pools",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("sui_pool_id", String(255), unique=True, nullable=False, index=True),
+    Column("pool_name", String(128), nullable=False, index=True),
+    Column("dex_name", String(128), nullable=False, index=True),
+    Column("token0_id", Integer, ForeignKey("tokens.id"), nullable=False),
+    Column("token1_id", Integer, ForeignKey("tokens.id"), nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "pool_metrics",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=False),
+    Column("tvl_usd", DECIMAL(24, 8), nullable=True),
+    Column("volume_24h", DECIMAL(24, 8), nullable=True),
+    Column("price_var_24h", Float, nullable=True),
+    Column("il_risk", Float, nullable=True),
+    Column("utilization", Float, nullable=True),
+    Column("risk_score", Integer, nullable=True),
+    Column("captured_at", DateTime, index=True),
+)
+
+Table(
+    "token_risk_rollups",
+    _v0001,
+    Column("token_id", Integer, ForeignKey("tokens.id"), primary_key=True),
+    Column("pool_count", Integer, nullable=False),
+    Column("tvl_usd_total", DECIMAL(38, 8), nullable=False),
+    Column("volume_24h_total", DECIMAL(38, 8), nullable=False),
+    Column("risk_tvl_sum", DECIMAL(38, 8), nullable=False),
+    Column("risk_score_sum", BigInteger, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "order_book_snapshots",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=False),
+    Column("best_bid", Float, nullable=True),
+    Column("best_ask", Float, nullable=True),
+    Column("spread_pct", Float, nullable=True),
+    Column("depth_bids", Float, nullable=True),
+    Column("depth_asks", Float, nullable=True),
+    Column("depth_delta", Float, nullable=True),
+    Column("bids_json", Text, nullable=True),
+    Column("asks_json", Text, nullable=True),
+    Column("captured_at", DateTime, index=True),
+    Index("ix_order_book_snapshots_pool_captured", "pool_id", "captured_at"),
+)
+
+Table(
+    "pool_trades",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=False),
+    Column("trade_key", String(255), nullable=False),
+    Column("price", Float, nullable=False),
+    Column("base_quantity", Float, nullable=True),
+    Column("quote_quantity", Float, nullable=False),
+    Column("maker_id", String(128), nullable=True),
+    Column("taker_id", String(128), nullable=True),
+    Column("timestamp_ms", BigInteger, nullable=False),
+    UniqueConstraint("pool_id", "trade_key", name="uq_pool_trades_pool_key"),
+    Index("ix_pool_trades_pool_ts", "pool_id", "timestamp_ms"),
+)
+
+Table(
+    "pool_metric_rescores",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("run_id", String(64), nullable=False),
+    Column("label", String(128), nullable=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=False),
+    Column("snapshot_id", Integer, ForeignKey("order_book_snapshots.id"), nullable=True),
+    Column("tvl_usd", DECIMAL(24, 8), nullable=True),
+    Column("volume_24h", DECIMAL(24, 8), nullable=True),
+    Column("price_var_24h", Float, nullable=True),
+    Column("il_risk", Float, nullable=True),
+    Column("utilization", Float, nullable=True),
+    Column("risk_score", Integer, nullable=True),
+    Column("captured_at", DateTime, nullable=False),
+    Column("created_at", DateTime),
+    Index("ix_pool_metric_rescores_run_pool", "run_id", "pool_id", "captured_at"),
+)
+
+Table(
+    "pool_sync_leases",
+    _v0001,
+    Column("pool_id", Integer, ForeignKey("pools.id"), primary_key=True),
+    Column("owner", String(128), nullable=True),
+    Column("expires_at", DateTime, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "sync_jobs",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(64), nullable=False),
+    Column("status", String(16), nullable=False, index=True),
+    Column("total_items", Integer, nullable=False),
+    Column("done_items", Integer, nullable=False),
+    Column("failed_items", Integer, nullable=False),
+    Column("created_at", DateTime),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+Table(
+    "sync_job_items",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("job_id", Integer, ForeignKey("sync_jobs.id"), nullable=False, index=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("worker_id", String(128), nullable=True),
+    Column("available_at", DateTime),
+    Column("heartbeat_at", DateTime, nullable=True),
+    Column("result_json", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Index("ix_sync_job_items_status_available", "status", "available_at"),
+)
+
+Table(
+    "pool_risk_publications",
+    _v0001,
+    Column("pool_id", Integer, ForeignKey("pools.id"), primary_key=True),
+    Column("pool_risk_object_id", String(128), nullable=False, unique=True),
+    Column("last_published_score", Integer, nullable=True),
+    Column("last_published_ts_ms", BigInteger, nullable=True),
+    Column("last_tx_digest", String(255), nullable=True),
+    Column("updated_at", DateTime),
+)
+
+# Versiyonlama öncesindeki hali; object_id ve yeni index'leri 0002 ekler
+Table(
+    "risk_identities",
+    _v0001,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("address", String(128), index=True, nullable=False),
+    Column("score", Integer, nullable=False),
+    Column("level", String(32), nullable=False),
+    Column("timestamp_ms", BigInteger, nullable=False),
+    Column("tx_digest", String(255), nullable=False),
+)
+
+Table(
+    "indexer_cursors",
+    _v0001,
+    Column("name", String(64), primary_key=True),
+    Column("cursor", String(255), nullable=True),
+    Column("last_checkpoint", BigInteger, nullable=True),
+    Column("indexed_total", BigInteger, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+
+def _create_tables(conn: Connection) -> None:
+    _v0001.create_all(bind=conn, checkfirst=True)
+
+
+def _index_names(conn: Connection, table: str) -> set:
+    insp = inspect(conn)
+    names = {ix["name"] for ix in insp.get_indexes(table)}
+    names |= {uc["name"] for uc in insp.get_unique_constraints(table) if uc.get("name")}
+    return names
+
+
+def _has_unique_on(conn: Connection, table: str, columns: List[str]) -> bool:
+    insp = inspect(conn)
+    for ix in insp.get_indexes(table):
+        if ix.get("unique") and ix["column_names"] == columns:
+            return True
+    return any(uc["column_names"] == columns for uc in insp.get_unique_constraints(table))
+
+
+def _delete_duplicate_identities(conn: Connection) -> None:
+    """Keep the first row of every (tx_digest, address) pair so the unique index can be built."""
+    seen = set()
+    duplicate_ids = []
+    rows = conn.execute(text("SELECT id, tx_digest, address FROM risk_identities ORDER BY id"))
+    for row_id, tx_digest, address in rows:
+        if (tx_digest, address) in seen:
+            duplicate_ids.append(row_id)
+        else:
+            seen.add((tx_digest, address))
+
+    for i in range(0, len(duplicate_ids), 1000):
+        chunk = duplicate_ids[i:i + 1000]
+        conn.execute(text(f"DELETE FROM risk_identities WHERE id IN ({', '.join(str(int(x)) for x in chunk)})"))
+    if duplicate_ids:
+        logger.warning(f"Removed {len(duplicate_ids)} duplicate risk_identities rows")
+
+
+def _risk_identity_indexes(conn: Connection) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns("risk_identities")}
+
+    if "object_id" not in columns:
+        conn.execute(text("ALTER TABLE risk_identities ADD COLUMN object_id VARCHAR(128) NULL"))
+    if not _has_unique_on(conn, "risk_identities", ["object_id"]):
+        conn.execute(text("CREATE UNIQUE INDEX uq_risk_identities_object_id ON risk_identities (object_id)"))
+
+    names = _index_names(conn, "risk_identities")
+    if "ix_risk_identities_address_ts" not in names:
+        conn.execute(text("CREATE INDEX ix_risk_identities_address_ts ON risk_identities (address, timestamp_ms)"))
+    if not _has_unique_on(conn, "risk_identities", ["tx_digest", "address"]):
+        _delete_duplicate_identities(conn)
+        conn.execute(
+            text("CREATE UNIQUE INDEX uq_risk_identities_tx_address ON risk_identities (tx_digest, address)")
+        )
+
+    # (address, timestamp_ms) index'i tek kolonluk address index'ini kapsıyor
+    if "ix_risk_identities_address" in names:
+        conn.execute(text("DROP INDEX ix_risk_identities_address ON risk_identities")
+                     if conn.dialect.name == "mysql"
+                     else text("DROP INDEX ix_risk_identities_address"))
+
+
+# ---------------- 0003 ----------------
+
+_v0003 = MetaData()
+Table("pools", _v0003, Column("id", Integer, primary_key=True))
+_alert_subscriptions = Table(
+    "alert_subscriptions",
+    _v0003,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("url", String(1024), nullable=False),
+    Column("secret", String(255), nullable=True),
+    Column("pool_id", Integer, ForeignKey("pools.id"), nullable=True, index=True),
+    Column("min_score", Integer, nullable=True),
+    Column("min_delta", Integer, nullable=True),
+    Column("on_level_change", Boolean, nullable=False),
+    Column("active", Boolean, nullable=False),
+    Column("created_at", DateTime),
+    Column("last_delivery_at", DateTime, nullable=True),
+    Column("consecutive_failures", Integer, nullable=False),
+    Column("last_error", Text, nullable=True),
+)
+
+
+def _create_alert_subscriptions(conn: Connection) -> None:
+    _alert_subscriptions.create(conn, checkfirst=True)
+
+
+def _pool_token_updated_at(conn: Connection) -> None:
+    column_type = {"mysql": "DATETIME(6)", "postgresql": "TIMESTAMP"}.get(conn.dialect.name, "DATETIME")
+    for table in ("pools", "tokens"):
+        columns = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "updated_at" not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at {column_type} NULL"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration("0001", "create tables", _create_tables),
+    Migration("0002", "risk_identities object_id, history and tx/address indexes", _risk_identity_indexes),
+    Migration("0003", "alert_subscriptions", _create_alert_subscriptions),
+    Migration("0004", "pools/tokens updated_at", _pool_token_updated_at),
+]
+
+
+@contextmanager
+def _migration_lock(conn: Connection) -> Iterator[None]:
+    if conn.dialect.name != "mysql":
+        yield
+        return
+
+    acquired = conn.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"),
+        {"name": _LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS},
+    ).scalar()
+    if acquired != 1:
+        raise RuntimeError("Could not acquire the schema migration lock")
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _LOCK_NAME})
+
+
+def _applied_versions(conn: Connection) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    return {version for (version,) in conn.execute(select(schema_migrations.c.version))}
+
+
+def pending_migrations(bind: Engine = engine) -> List[str]:
+    with bind.connect() as conn:
+        applied = _applied_versions(conn)
+    return [m.version for m in MIGRATIONS if m.version not in applied]
+
+
+def run_migrations(bind: Engine = engine) -> List[str]:
+    """Apply pending migrations in order; returns the versions applied now."""
+    applied_now: List[str] = []
+    with bind.connect() as conn:
+        with _migration_lock(conn):
+            schema_migrations.create(conn, checkfirst=True)
+            conn.commit()
+
+            # Kilidi beklerken başka bir container uygulamış olabilir; tekrar oku
+            applied = _applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                started = time.perf_counter()
+                migration.apply(conn)
+                conn.execute(
+                    schema_migrations.insert().values(
+                        version=migration.version,
+                        description=migration.description,
+                        applied_at=datetime.utcnow(),
+                    )
+                )
+                conn.commit()
+                applied_now.append(migration.version)
+                logger.info(
+                    f"Migration {migration.version} ({migration.description}) applied "
+                    f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+                )
+    return applied_now
+
+
+def wait_for_db(bind: Engine = engine) -> None:
+    for attempt in range(1, MIGRATION_DB_WAIT_ATTEMPTS + 1):
+        try:
+            with bind.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except OperationalError as e:
+            logger.warning(f"DB henüz hazır değil (attempt={attempt}): {e}")
+            time.sleep(MIGRATION_DB_WAIT_DELAY_SECONDS)
+    raise RuntimeError("Database did not become reachable; migrations not applied")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations.")
+    parser.add_argument("--status", action="store_true", help="Only list pending migrations")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    wait_for_db()
+
+    if args.status:
+        print(json.dumps({"pending": pending_migrations()}))
+        return
+    print(json.dumps({"applied": run_migrations()}))
+
+
+if __name__ == "__main__":
+    main()
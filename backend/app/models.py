@@ -9,11 +9,19 @@ from sqlalchemy import (
     DECIMAL,
     Float,
     BigInteger,
+    Boolean,
+    Text,
+    Index,
+    UniqueConstraint,
 )
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 
 from .database import Base
 
+# MySQL DATETIME saniye hassasiyetinde; aynı saniyedeki iki güncelleme ayırt edilebilsin
+PreciseDateTime = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
 
 class Token(Base):
     __tablename__ = "tokens"
@@ -24,6 +32,9 @@ class Token(Base):
     name = Column(String(255), nullable=True)
     decimals = Column(Integer, default=9)
 
+    # Özet cache'lerinin (ör. /pools/summary ETag) sürüm anahtarında kullanılır
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+
     # Bu token'ın yer aldığı havuzlar
     pools_token0 = relationship(
         "Pool",
@@ -52,6 +63,7 @@ class Pool(Base):
     token1_id = Column(Integer, ForeignKey("tokens.id"), nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     token0 = relationship(
         "Token",
@@ -93,12 +105,237 @@ class PoolMetric(Base):
     pool = relationship("Pool", back_populates="metrics")
 
 
+class TokenRiskRollup(Base):
+    """
+    Token bazında risk özeti: token'ın yer aldığı havuzların son metriklerinin toplamı.
+    Havuzun son metriği değiştikçe artımlı güncellenir (bkz. token_risk.py).
+    """
+    __tablename__ = "token_risk_rollups"
+
+    token_id = Column(Integer, ForeignKey("tokens.id"), primary_key=True)
+
+    pool_count = Column(Integer, nullable=False, default=0)           # metriği olan havuz sayısı
+    tvl_usd_total = Column(DECIMAL(38, 8), nullable=False, default=0)
+    volume_24h_total = Column(DECIMAL(38, 8), nullable=False, default=0)
+    risk_tvl_sum = Column(DECIMAL(38, 8), nullable=False, default=0)  # sum(risk_score * tvl_usd)
+    risk_score_sum = Column(BigInteger, nullable=False, default=0)    # TVL'siz havuzlar için düz ortalama
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    token = relationship("Token")
+
+
+class OrderBookSnapshot(Base):
+    """
+    Kalıcı order book snapshot'ı (ORDERBOOK_PERSIST_SNAPSHOTS açıksa yazılır).
+    Fiyat/miktarlar Surflux'tan geldiği gibi raw birimlerde saklanır.
+    """
+    __tablename__ = "order_book_snapshots"
+    __table_args__ = (
+        Index("ix_order_book_snapshots_pool_captured", "pool_id", "captured_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    pool_id = Column(Integer, ForeignKey("pools.id"), nullable=False)
+
+    best_bid = Column(Float, nullable=True)
+    best_ask = Column(Float, nullable=True)
+    spread_pct = Column(Float, nullable=True)
+    depth_bids = Column(Float, nullable=True)           # ilk N seviye, raw base miktarı
+    depth_asks = Column(Float, nullable=True)
+    depth_delta = Column(Float, nullable=True)          # önceki snapshot'a göre göreli derinlik değişimi
+
+    bids_json = Column(Text, nullable=True)
+    asks_json = Column(Text, nullable=True)
+
+    captured_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class PoolTrade(Base):
+    """
+    Sync sırasında çekilen Surflux trade'leri (TRADES_PERSIST açıksa).
+    Offline replay bu tabloyu okur; fiyat/miktarlar raw birimlerde.
+    """
+    __tablename__ = "pool_trades"
+    __table_args__ = (
+        UniqueConstraint("pool_id", "trade_key", name="uq_pool_trades_pool_key"),
+        Index("ix_pool_trades_pool_ts", "pool_id", "timestamp_ms"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    pool_id = Column(Integer, ForeignKey("pools.id"), nullable=False)
+    trade_key = Column(String(255), nullable=False)
+
+    price = Column(Float, nullable=False)
+    base_quantity = Column(Float, nullable=True)
+    quote_quantity = Column(Float, nullable=False)
+    maker_id = Column(String(128), nullable=True)
+    taker_id = Column(String(128), nullable=True)
+
+    timestamp_ms = Column(BigInteger, nullable=False)
+
+
+class PoolMetricRescore(Base):
+    """
+    Offline replay sonuçları. Canlı PoolMetric tablosundan ayrı tutulur ki
+    model değişiklikleri geçmiş veriler üzerinde karşılaştırılabilsin.
+    """
+    __tablename__ = "pool_metric_rescores"
+    __table_args__ = (
+        Index("ix_pool_metric_rescores_run_pool", "run_id", "pool_id", "captured_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String(64), nullable=False)
+    label = Column(String(128), nullable=True)
+
+    pool_id = Column(Integer, ForeignKey("pools.id"), nullable=False)
+    snapshot_id = Column(Integer, ForeignKey("order_book_snapshots.id"), nullable=True)
+
+    tvl_usd = Column(DECIMAL(24, 8), nullable=True)
+    volume_24h = Column(DECIMAL(24, 8), nullable=True)
+    price_var_24h = Column(Float, nullable=True)
+    il_risk = Column(Float, nullable=True)
+    utilization = Column(Float, nullable=True)
+    risk_score = Column(Integer, nullable=True)
+
+    captured_at = Column(DateTime, nullable=False)       # snapshot zamanı
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PoolSyncLease(Base):
+    """
+    Havuz başına sync kilidi. Birden fazla replica aynı havuzu aynı anda
+    (ya da cooldown süresi dolmadan tekrar) sync etmesin diye kullanılır.
+    """
+    __tablename__ = "pool_sync_leases"
+
+    pool_id = Column(Integer, ForeignKey("pools.id"), primary_key=True)
+    owner = Column(String(128), nullable=True)           # lease'i tutan worker id
+    expires_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SyncJob(Base):
+    """
+    DB tabanlı sync kuyruğundaki bir iş (ör. tüm havuzların metrik sync'i).
+    İlerleme SyncJobItem satırlarında havuz bazında tutulur.
+    """
+    __tablename__ = "sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued|running|completed|failed
+
+    total_items = Column(Integer, nullable=False, default=0)
+    done_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship(
+        "SyncJobItem",
+        back_populates="job",
+        cascade="all, delete-orphan",
+        order_by="SyncJobItem.id",
+    )
+
+
+class SyncJobItem(Base):
+    """Bir SyncJob içindeki tek havuzluk iş; checkpoint ve retry bilgisi burada."""
+    __tablename__ = "sync_job_items"
+    __table_args__ = (
+        Index("ix_sync_job_items_status_available", "status", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("sync_jobs.id"), nullable=False, index=True)
+    pool_id = Column(Integer, ForeignKey("pools.id"), nullable=False)
+
+    status = Column(String(16), nullable=False, default="pending")  # pending|running|done|failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(128), nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow)        # retry backoff
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    result_json = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    job = relationship("SyncJob", back_populates="items")
+
+
+class PoolRiskPublication(Base):
+    """
+    Havuzun on-chain PoolRisk objesi ve en son yayınlanan skor.
+    Publisher sadece burada kayıtlı havuzlar için update_score çağırır.
+    """
+    __tablename__ = "pool_risk_publications"
+
+    pool_id = Column(Integer, ForeignKey("pools.id"), primary_key=True)
+    pool_risk_object_id = Column(String(128), nullable=False, unique=True)
+
+    last_published_score = Column(Integer, nullable=True)
+    last_published_ts_ms = Column(BigInteger, nullable=True)   # update_score'a giden ts
+    last_tx_digest = Column(String(255), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class RiskIdentity(Base):
     __tablename__ = "risk_identities"
+    __table_args__ = (
+        # Geçmiş sorgusu: address eşitliği + timestamp_ms sıralaması filesort'suz (InnoDB id'yi de taşır)
+        Index("ix_risk_identities_address_ts", "address", "timestamp_ms"),
+        # Aynı PTB'deki mint'ler tx_digest'i paylaşır; tekillik (tx_digest, address) çiftinde
+        UniqueConstraint("tx_digest", "address", name="uq_risk_identities_tx_address"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    address = Column(String(128), index=True, nullable=False)
+    address = Column(String(128), nullable=False)
     score = Column(Integer, nullable=False)
     level = Column(String(32), nullable=False)
     timestamp_ms = Column(BigInteger, nullable=False)
     tx_digest = Column(String(255), nullable=False)
+    # On-chain RiskIdentity objesi; indexer doldurur (frontend kayıtlarında boş olabilir)
+    object_id = Column(String(128), nullable=True, unique=True)
+
+
+class IndexerCursor(Base):
+    """
+    Zincir indexer'larının kaldığı yer. cursor, suix_queryTransactionBlocks'un
+    nextCursor'u (son işlenen tx digest'i); sayfa ile aynı transaction'da yazılır.
+    """
+    __tablename__ = "indexer_cursors"
+
+    name = Column(String(64), primary_key=True)
+    cursor = Column(String(255), nullable=True)
+    last_checkpoint = Column(BigInteger, nullable=True)
+    indexed_total = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AlertSubscription(Base):
+    """
+    Risk alarmı webhook aboneliği. Bir veya daha fazla kural içerir:
+    min_score eşiğinin aşılması, önceki skora göre min_delta'lık sıçrama,
+    seviye (map_risk_score_to_level) değişimi. pool_id boşsa tüm havuzlar.
+    """
+    __tablename__ = "alert_subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(1024), nullable=False)
+    secret = Column(String(255), nullable=True)          # varsa gövde HMAC-SHA256 ile imzalanır
+    pool_id = Column(Integer, ForeignKey("pools.id"), nullable=True, index=True)
+
+    min_score = Column(Integer, nullable=True)
+    min_delta = Column(Integer, nullable=True)
+    on_level_change = Column(Boolean, nullable=False, default=False)
+
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Son teslimat durumu (dispatcher günceller)
+    last_delivery_at = Column(DateTime, nullable=True)
+    consecutive_failures = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
@@ -0,0 +1,260 @@
+"""Per-pool order book snapshot cache.
+
+Metric syncs used to hit Surflux `order-book-depth` on every call. The cache
+keeps the last snapshot per pool together with its derived spread/depth
+figures, so callers can reuse a fresh book instead of refetching, and records
+the depth delta between consecutive snapshots.
+
+Each snapshot also exposes cumulative-depth ladders per side (built on first
+use, then reused for the snapshot's lifetime) that slippage quotes binary
+search instead of walking the book.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .market_adapters import DEFAULT_DEX, get_adapter
+
+logger = logging.getLogger(__name__)
+
+ORDERBOOK_CACHE_TTL_SECONDS = float(os.getenv("ORDERBOOK_CACHE_TTL_SECONDS", "30"))
+ORDERBOOK_FETCH_LIMIT = int(os.getenv("ORDERBOOK_FETCH_LIMIT", "20"))
+ORDERBOOK_DEPTH_LEVELS = int(os.getenv("ORDERBOOK_DEPTH_LEVELS", "10"))
+ORDERBOOK_PERSIST_SNAPSHOTS = os.getenv("ORDERBOOK_PERSIST_SNAPSHOTS", "false").lower() in ("1", "true", "yes")
+
+OrderBookFetcher = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+def summarize_order_book(
+    bids: List[Dict[str, Any]],
+    asks: List[Dict[str, Any]],
+    depth_levels: int = ORDERBOOK_DEPTH_LEVELS,
+) -> Tuple[float, float, float, float, float]:
+    """
+    Return (best_bid, best_ask, spread_pct, depth_bids_raw, depth_asks_raw).
+
+    Prices and quantities stay in raw on-chain units; callers apply token
+    decimals. An empty side yields zeros and a spread of 1.0.
+    """
+    depth_bids_raw = sum(float(level["total_quantity"]) for level in bids[:depth_levels])
+    depth_asks_raw = sum(float(level["total_quantity"]) for level in asks[:depth_levels])
+
+    if not bids or not asks:
+        return 0.0, 0.0, 1.0, depth_bids_raw, depth_asks_raw
+
+    best_bid = float(bids[0]["price"])
+    best_ask = float(asks[0]["price"])
+    mid_raw = (best_bid + best_ask) / 2.0
+    spread_pct = (best_ask - best_bid) / mid_raw if mid_raw else 1.0
+
+    return best_bid, best_ask, spread_pct, depth_bids_raw, depth_asks_raw
+
+
+@dataclass(frozen=True)
+class DepthLadder:
+    """
+    One side of the book as running totals, best price first, raw units.
+
+    cum_base[i] / cum_quote[i] are the base quantity and price * quantity
+    notional available through level i inclusive.
+    """
+
+    prices: Tuple[float, ...] = ()
+    cum_base: Tuple[float, ...] = ()
+    cum_quote: Tuple[float, ...] = ()
+
+    @classmethod
+    def build(cls, levels: List[Dict[str, Any]]) -> "DepthLadder":
+        prices: List[float] = []
+        cum_base: List[float] = []
+        cum_quote: List[float] = []
+        base_total = quote_total = 0.0
+        for level in levels:
+            price = float(level["price"])
+            quantity = float(level["total_quantity"])
+            if price <= 0 or quantity <= 0:
+                continue
+            base_total += quantity
+            quote_total += price * quantity
+            prices.append(price)
+            cum_base.append(base_total)
+            cum_quote.append(quote_total)
+        return cls(tuple(prices), tuple(cum_base), tuple(cum_quote))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def fill(self, target: float, by_quote: bool) -> Tuple[float, float, int, Optional[float]]:
+        """
+        Walk the ladder until `target` base quantity (or quote notional) is
+        filled. Returns (base_filled, quote_filled, levels_used, last_price);
+        when the visible depth is too shallow the whole ladder is consumed.
+        """
+        if not self.prices or target <= 0:
+            return 0.0, 0.0, 0, None
+
+        cumulative = self.cum_quote if by_quote else self.cum_base
+        i = bisect.bisect_left(cumulative, target)
+        if i >= len(cumulative):
+            return self.cum_base[-1], self.cum_quote[-1], len(self.prices), self.prices[-1]
+
+        base_before = self.cum_base[i - 1] if i else 0.0
+        quote_before = self.cum_quote[i - 1] if i else 0.0
+        price = self.prices[i]
+        if by_quote:
+            remaining_quote = target - quote_before
+            return base_before + remaining_quote / price, target, i + 1, price
+        remaining_base = target - base_before
+        return target, quote_before + remaining_base * price, i + 1, price
+
+
+@dataclass
+class CachedOrderBook:
+    """A single order book snapshot plus the figures scoring needs from it."""
+
+    pool_name: str
+    bids: List[Dict[str, Any]]
+    asks: List[Dict[str, Any]]
+    fetched_at: float
+    best_bid: float
+    best_ask: float
+    spread_pct: float
+    depth_bids_raw: float
+    depth_asks_raw: float
+    # Relative change of visible depth vs the previous snapshot (None for the first one)
+    depth_delta: Optional[float] = None
+    persisted: bool = False
+    # side -> ladder; snapshot ilk kez quote edildiğinde kurulur, sonra yeniden kullanılır
+    _ladders: Dict[str, DepthLadder] = field(default_factory=dict, repr=False)
+
+    @property
+    def depth_total_raw(self) -> float:
+        return self.depth_bids_raw + self.depth_asks_raw
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.bids or not self.asks
+
+    def ladder(self, side: str) -> DepthLadder:
+        """Ladder a taker walks: asks for a buy, bids for a sell."""
+        ladder = self._ladders.get(side)
+        if ladder is None:
+            ladder = DepthLadder.build(self.asks if side == "buy" else self.bids)
+            self._ladders[side] = ladder
+        return ladder
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.fetched_at
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.age() <= max_age
+
+
+class OrderBookCache:
+    """
+    In-memory, per-pool order book store.
+
+    `get` returns the cached book while it is younger than the TTL and
+    otherwise fetches a new one; concurrent callers for the same pool share a
+    single upstream request. Books are keyed by (dex, pool name) and fetched
+    through the dex's market adapter unless an explicit `fetcher` is given.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = ORDERBOOK_CACHE_TTL_SECONDS,
+        fetch_limit: int = ORDERBOOK_FETCH_LIMIT,
+        depth_levels: int = ORDERBOOK_DEPTH_LEVELS,
+        fetcher: Optional[OrderBookFetcher] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.fetch_limit = fetch_limit
+        self.depth_levels = depth_levels
+        self._fetcher = fetcher
+        self._snapshots: Dict[str, CachedOrderBook] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _key(pool_name: str, dex_name: Optional[str]) -> str:
+        return f"{(dex_name or DEFAULT_DEX).lower()}:{pool_name}"
+
+    async def get(
+        self,
+        pool_name: str,
+        max_age: Optional[float] = None,
+        dex_name: Optional[str] = None,
+    ) -> CachedOrderBook:
+        max_age = self.ttl_seconds if max_age is None else max_age
+        key = self._key(pool_name, dex_name)
+
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot.is_fresh(max_age):
+            return snapshot
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another coroutine may have refreshed it while we waited
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot.is_fresh(max_age):
+                return snapshot
+
+            fetcher = self._fetcher or get_adapter(dex_name).fetch_order_book
+            order_book = await fetcher(pool_name, limit=self.fetch_limit)
+            return self.put(pool_name, order_book, dex_name=dex_name)
+
+    def put(
+        self,
+        pool_name: str,
+        order_book: Dict[str, Any],
+        fetched_at: Optional[float] = None,
+        dex_name: Optional[str] = None,
+    ) -> CachedOrderBook:
+        """Store a raw Surflux order book payload as the pool's latest snapshot."""
+        bids: List[Dict[str, Any]] = order_book.get("bids") or []
+        asks: List[Dict[str, Any]] = order_book.get("asks") or []
+
+        best_bid, best_ask, spread_pct, depth_bids_raw, depth_asks_raw = summarize_order_book(
+            bids, asks, self.depth_levels
+        )
+
+        snapshot = CachedOrderBook(
+            pool_name=pool_name,
+            bids=bids,
+            asks=asks,
+            fetched_at=fetched_at if fetched_at is not None else time.time(),
+            best_bid=best_bid,
+            best_ask=best_ask,
+            spread_pct=spread_pct,
+            depth_bids_raw=depth_bids_raw,
+            depth_asks_raw=depth_asks_raw,
+        )
+
+        key = self._key(pool_name, dex_name)
+        previous = self._snapshots.get(key)
+        if previous is not None and previous.depth_total_raw > 0:
+            snapshot.depth_delta = (
+                snapshot.depth_total_raw - previous.depth_total_raw
+            ) / previous.depth_total_raw
+
+        self._snapshots[key] = snapshot
+        return snapshot
+
+    def peek(self, pool_name: str, dex_name: Optional[str] = None) -> Optional[CachedOrderBook]:
+        """Return the last snapshot for a pool without fetching, fresh or not."""
+        return self._snapshots.get(self._key(pool_name, dex_name))
+
+    def invalidate(self, pool_name: Optional[str] = None, dex_name: Optional[str] = None) -> None:
+        if pool_name is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(self._key(pool_name, dex_name), None)
+
+
+# Process-wide cache used by the scoring pipeline
+order_book_cache = OrderBookCache()
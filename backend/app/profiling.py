@@ -0,0 +1,322 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries the `X-Profile` header (value `1`, or
+`sampler` to also run a sampling profiler) or is picked by
+PROFILING_SAMPLE_RATE. While a profile is active, code marks its time with
+`span(category, label)`: Surflux calls, DB cursor executions (SQLAlchemy
+engine events), scoring / graph math (`run_cpu_bound`), JSON encoding done
+inside an endpoint ("encode", see http_responses.py) and the route time
+outside the endpoint body (request validation plus response encoding,
+reported as "serialization"). The profile lives in a ContextVar, so
+concurrent requests do not mix and threadpool endpoints inherit it.
+
+Finished profiles are kept in an in-memory ring buffer (PROFILING_BUFFER_SIZE)
+and served by /debug/profiles. Profiling is off unless PROFILING_ENABLED is
+set. The header and the debug endpoints also need PROFILING_TOKEN to be
+configured and sent in `X-Profile-Token`; without a token they are refused,
+since profiles hold SQL text and the sampler runs on the shared event loop.
+PROFILING_SAMPLE_RATE sampling needs no token.
+
+Sampler output uses pyinstrument when installed, else cProfile. cProfile
+only sees the event loop thread, so sync endpoints run in the threadpool
+show up as waiting; pyinstrument's async mode attributes awaited time.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "200"))
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SLOW_QUERY_SAMPLES = int(os.getenv("PROFILING_SLOW_QUERY_SAMPLES", "10"))
+
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN_HEADER = "x-profile-token"
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_ids = itertools.count(1)
+
+
+@dataclass
+class RequestProfile:
+    id: int
+    method: str
+    path: str
+    query: str
+    started_at: datetime
+    reason: str                                   # header | sampled
+    duration_ms: Optional[float] = None
+    status_code: Optional[int] = None
+    spans: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    slow_queries: List[Dict[str, Any]] = field(default_factory=list)
+    sampler: Optional[str] = None
+    sampler_output: Optional[str] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, category: str, elapsed: float, label: Optional[str] = None) -> None:
+        key = f"{category}:{label}" if label else category
+        with self._lock:
+            entry = self.spans.setdefault(key, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += elapsed * 1000
+
+    def add_query(self, statement: str, elapsed: float) -> None:
+        self.add("db", elapsed)
+        with self._lock:
+            self.slow_queries.append({"ms": round(elapsed * 1000, 3), "statement": statement[:500]})
+            self.slow_queries.sort(key=lambda q: -q["ms"])
+            del self.slow_queries[PROFILING_SLOW_QUERY_SAMPLES:]
+
+    def breakdown(self) -> Dict[str, float]:
+        """Total ms per category (labels folded), plus the unattributed rest."""
+        totals: Dict[str, float] = {}
+        for key, entry in self.spans.items():
+            category = key.split(":", 1)[0]
+            totals[category] = totals.get(category, 0.0) + entry["total_ms"]
+        if self.duration_ms is not None:
+            # endpoint, içindeki surflux/db/scoring sürelerini de kapsıyor
+            attributed = totals.get("endpoint", 0.0) + totals.get("serialization", 0.0)
+            totals["other"] = max(0.0, self.duration_ms - attributed)
+        return {k: round(v, 3) for k, v in totals.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "breakdown_ms": self.breakdown(),
+        }
+
+    def detail(self) -> Dict[str, Any]:
+        data = self.summary()
+        data.update(
+            {
+                "query": self.query,
+                "spans": {k: {"count": v["count"], "total_ms": round(v["total_ms"], 3)} for k, v in self.spans.items()},
+                "slow_queries": self.slow_queries,
+                "sampler": self.sampler,
+                "sampler_output": self.sampler_output,
+            }
+        )
+        return data
+
+
+class ProfileStore:
+    """Ring buffer of finished profiles."""
+
+    def __init__(self, size: int = PROFILING_BUFFER_SIZE):
+        self._profiles: Deque[RequestProfile] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self, limit: int = 50, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles)
+        if path:
+            profiles = [p for p in profiles if p.path.startswith(path)]
+        return [p.summary() for p in reversed(profiles[-limit:])]
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+@contextmanager
+def span(category: str, label: Optional[str] = None) -> Iterator[None]:
+    """Attribute the block's wall time to `category` on the active profile (no-op otherwise)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(category, time.perf_counter() - started, label)
+
+
+def install_db_hooks(engine: Engine) -> None:
+    """Time every cursor execution on `engine` into the active profile."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("_profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        stack = conn.info.get("_profile_started")
+        if profile is None or not stack:
+            return
+        profile.add_query(statement, time.perf_counter() - stack.pop())
+
+
+def authorized(token: Optional[str]) -> bool:
+    # Token tanımlı değilse header ve debug endpoint'leri kapalı
+    if not PROFILING_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILING_TOKEN.encode("utf-8"))
+
+
+def _wants_profile(headers) -> Optional[str]:
+    if not PROFILING_ENABLED:
+        return None
+    requested = headers.get(PROFILE_HEADER)
+    if requested and requested.lower() not in ("0", "false") and authorized(headers.get(PROFILE_TOKEN_HEADER)):
+        return "header"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class _Sampler:
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            self.name = "cprofile"
+            self._profiler = cProfile.Profile()
+        else:
+            self.name = "pyinstrument"
+            self._profiler = Profiler(async_mode="enabled")
+
+    def start(self) -> None:
+        if self.name == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        if self.name == "pyinstrument":
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=False, color=False)
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        return out.getvalue()
+
+
+async def profiling_middleware(request, call_next):
+    reason = _wants_profile(request.headers)
+    if reason is None:
+        return await call_next(request)
+
+    profile = RequestProfile(
+        id=next(_ids),
+        method=request.method,
+        path=request.url.path,
+        query=request.url.query,
+        started_at=datetime.utcnow(),
+        reason=reason,
+    )
+    sampler = None
+    if reason == "header" and request.headers.get(PROFILE_HEADER, "").lower() == "sampler":
+        sampler = _Sampler()
+        profile.sampler = sampler.name
+
+    token = _current.set(profile)
+    started = time.perf_counter()
+    if sampler:
+        try:
+            sampler.start()
+        except Exception as e:  # sampler hatası isteği bozmasın
+            profile.sampler_output = f"sampler failed to start: {e}"
+            sampler = None
+    try:
+        response = await call_next(request)
+    finally:
+        profile.duration_ms = (time.perf_counter() - started) * 1000
+        if sampler:
+            try:
+                profile.sampler_output = sampler.stop()
+            except Exception as e:
+                profile.sampler_output = f"sampler failed: {e}"
+        _current.reset(token)
+        profile_store.add(profile)
+
+    profile.status_code = response.status_code
+    response.headers["X-Profile-Id"] = str(profile.id)
+    return response
+
+
+def _timed(fn: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span("endpoint"):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span("endpoint"):
+                return fn(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute that splits route time into the endpoint body and the rest
+    (parameter validation, response validation and JSON encoding).
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request):
+            profile = _current.get()
+            if profile is None:
+                return await handler(request)
+
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                elapsed = time.perf_counter() - started
+                endpoint_ms = sum(
+                    entry["total_ms"] for key, entry in profile.spans.items() if key == "endpoint"
+                )
+                profile.add("serialization", max(0.0, elapsed - endpoint_ms / 1000))
+
+        return profiled_handler
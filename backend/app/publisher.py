@@ -0,0 +1,187 @@
+"""Batched on-chain publishing of pool risk scores.
+
+Takes the latest PoolMetric.risk_score of every pool registered in
+`pool_risk_publications`, keeps only pools whose score moved by at least
+PUBLISH_SCORE_THRESHOLD since the last publish, and packs the
+`risk_index::update_score` calls into as few programmable transactions as
+possible (PUBLISH_MAX_CALLS_PER_TX calls each). Publication state is
+checkpointed per transaction.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from . import models
+from .sui_client import (
+    SUI_RISK_INDEX_FUNCTION_UPDATE,
+    SUI_RISK_INDEX_MODULE,
+    SUI_RISK_PACKAGE_ID,
+    Ed25519Signer,
+    SuiRpcClient,
+    SuiRpcError,
+    gas_used_total,
+)
+
+logger = logging.getLogger(__name__)
+
+SUI_PUBLISHER_PRIVATE_KEY = os.getenv("SUI_PUBLISHER_PRIVATE_KEY")
+PUBLISH_SCORE_THRESHOLD = int(os.getenv("PUBLISH_SCORE_THRESHOLD", "5"))
+# Sui bir PTB'de 1024 komuta izin veriyor; gas bütçesi için daha düşük tutuyoruz
+PUBLISH_MAX_CALLS_PER_TX = int(os.getenv("PUBLISH_MAX_CALLS_PER_TX", "256"))
+PUBLISH_GAS_BUDGET_BASE = int(os.getenv("PUBLISH_GAS_BUDGET_BASE", "5000000"))          # MIST
+PUBLISH_GAS_BUDGET_PER_CALL = int(os.getenv("PUBLISH_GAS_BUDGET_PER_CALL", "3000000"))  # MIST
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_ms(dt: datetime) -> int:
+    return int((dt - _EPOCH).total_seconds() * 1000)
+
+
+@dataclass
+class PendingScoreUpdate:
+    pool_id: int
+    pool_risk_object_id: str
+    score: int
+    ts_ms: int
+    previous_score: Optional[int]
+
+
+def select_pending_updates(db: Session, threshold: int = PUBLISH_SCORE_THRESHOLD) -> List[PendingScoreUpdate]:
+    """Latest score per registered pool, filtered to changes >= threshold (one query)."""
+    latest = (
+        db.query(
+            models.PoolMetric.pool_id.label("pool_id"),
+            func.max(models.PoolMetric.captured_at).label("captured_at"),
+        )
+        .group_by(models.PoolMetric.pool_id)
+        .subquery()
+    )
+
+    rows = (
+        db.query(models.PoolRiskPublication, models.PoolMetric.risk_score, models.PoolMetric.captured_at)
+        .join(latest, latest.c.pool_id == models.PoolRiskPublication.pool_id)
+        .join(
+            models.PoolMetric,
+            and_(
+                models.PoolMetric.pool_id == latest.c.pool_id,
+                models.PoolMetric.captured_at == latest.c.captured_at,
+            ),
+        )
+        .order_by(models.PoolRiskPublication.pool_id)
+        .all()
+    )
+
+    updates: Dict[int, PendingScoreUpdate] = {}
+    for publication, score, captured_at in rows:
+        if score is None or publication.pool_id in updates:
+            continue
+
+        previous = publication.last_published_score
+        if previous is not None and abs(score - previous) < threshold:
+            continue
+
+        updates[publication.pool_id] = PendingScoreUpdate(
+            pool_id=publication.pool_id,
+            pool_risk_object_id=publication.pool_risk_object_id,
+            score=int(score),
+            ts_ms=_to_ms(captured_at),
+            previous_score=previous,
+        )
+
+    return list(updates.values())
+
+
+def _batches(updates: List[PendingScoreUpdate], size: int) -> List[List[PendingScoreUpdate]]:
+    return [updates[i:i + size] for i in range(0, len(updates), size)]
+
+
+def _move_calls(batch: List[PendingScoreUpdate]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "package": SUI_RISK_PACKAGE_ID,
+            "module": SUI_RISK_INDEX_MODULE,
+            "function": SUI_RISK_INDEX_FUNCTION_UPDATE,
+            # update_score(pool: &mut PoolRisk, new_score: u64, ts: u64)
+            "arguments": [u.pool_risk_object_id, str(u.score), str(u.ts_ms)],
+        }
+        for u in batch
+    ]
+
+
+async def publish_pool_scores(
+    db: Session,
+    rpc: Optional[SuiRpcClient] = None,
+    signer: Optional[Ed25519Signer] = None,
+    threshold: int = PUBLISH_SCORE_THRESHOLD,
+    max_calls_per_tx: int = PUBLISH_MAX_CALLS_PER_TX,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run one publish cycle. With `dry_run` only the planned batches are
+    returned. A failed transaction is reported and the remaining batches are
+    still attempted; its pools stay pending for the next cycle.
+    """
+    started = time.perf_counter()
+    updates = select_pending_updates(db, threshold)
+    batches = _batches(updates, max(1, max_calls_per_tx))
+
+    summary: Dict[str, Any] = {
+        "candidates": len(updates),
+        "published": 0,
+        "transactions": [],
+        "errors": [],
+        "gas_used_total": 0,
+    }
+
+    if dry_run or not updates:
+        summary["planned_batches"] = [[u.pool_id for u in batch] for batch in batches]
+        summary["elapsed_seconds"] = time.perf_counter() - started
+        return summary
+
+    if signer is None:
+        if not SUI_PUBLISHER_PRIVATE_KEY:
+            raise SuiRpcError("SUI_PUBLISHER_PRIVATE_KEY env değişkeni tanımlı değil.")
+        signer = Ed25519Signer.from_encoded(SUI_PUBLISHER_PRIVATE_KEY)
+
+    owns_rpc = rpc is None
+    rpc = rpc or SuiRpcClient()
+    try:
+        for batch in batches:
+            gas_budget = PUBLISH_GAS_BUDGET_BASE + PUBLISH_GAS_BUDGET_PER_CALL * len(batch)
+            try:
+                tx_bytes = await rpc.build_move_call_batch(signer.address, _move_calls(batch), gas_budget)
+                result = await rpc.execute_transaction(tx_bytes, signer.sign_transaction(tx_bytes))
+            except (SuiRpcError, KeyError) as e:
+                logger.warning(f"Pool risk publish batch failed ({len(batch)} pools): {e}")
+                summary["errors"].append({"pools": [u.pool_id for u in batch], "error": str(e)})
+                continue
+
+            digest = result.get("digest")
+            gas_used = gas_used_total(result.get("effects") or {})
+
+            # Checkpoint: bu transaction'daki havuzlar artık yayınlanmış sayılır
+            for u in batch:
+                publication = db.get(models.PoolRiskPublication, u.pool_id)
+                publication.last_published_score = u.score
+                publication.last_published_ts_ms = u.ts_ms
+                publication.last_tx_digest = digest
+            db.commit()
+
+            summary["published"] += len(batch)
+            summary["gas_used_total"] += gas_used
+            summary["transactions"].append({"digest": digest, "pools": len(batch), "gas_used": gas_used})
+    finally:
+        if owns_rpc:
+            await rpc.close()
+
+    summary["elapsed_seconds"] = time.perf_counter() - started
+    return summary
@@ -0,0 +1,201 @@
+"""Precomputed cross-pool rankings and percentile ranks.
+
+The latest PoolMetric of every pool is loaded once into an in-memory
+RankingIndex: per metric, pool ids sorted by value plus every pool's rank
+and percentile. Top-K reads are a slice of the sorted list and percentile
+reads a dict lookup, so neither touches the metrics table.
+
+The index is rebuilt when a sync job completes. Reads always serve the
+current index; at most once per RANKINGS_MIN_REFRESH_SECONDS a read checks
+whether the index is older than RANKINGS_MAX_AGE_SECONDS or a newer
+PoolMetric exists (a sync on another replica, one primary-key MAX() query)
+and, if so, starts a single background rebuild. Only the very first read
+builds inline, and concurrent first reads wait for that one build.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, joinedload
+
+from . import models
+from .database import ReadSessionLocal, SessionLocal, replica_monitor
+
+logger = logging.getLogger(__name__)
+
+RANKINGS_MAX_AGE_SECONDS = float(os.getenv("RANKINGS_MAX_AGE_SECONDS", "300"))
+RANKINGS_MIN_REFRESH_SECONDS = float(os.getenv("RANKINGS_MIN_REFRESH_SECONDS", "15"))
+
+RANKING_METRICS = ("risk_score", "tvl_usd", "volume_24h")
+
+
+@dataclass
+class RankingIndex:
+    version: Optional[int]                       # index kurulurken max(PoolMetric.id)
+    built_at: float
+    entries: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    # metrik -> değere göre azalan sıralı pool id'leri
+    ordered: Dict[str, List[int]] = field(default_factory=dict)
+    # pool id -> metrik -> {value, rank, percentile}
+    percentiles: Dict[int, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def top(self, by: str, limit: int, ascending: bool = False) -> List[Dict[str, Any]]:
+        ordered = self.ordered.get(by, [])
+        if ascending:
+            pool_ids = ordered[-limit:][::-1]
+        else:
+            pool_ids = ordered[:limit]
+        return [
+            {"rank": self.percentiles[pool_id][by]["rank"], **self.entries[pool_id]}
+            for pool_id in pool_ids
+        ]
+
+
+def _metric_version(db: Session) -> Optional[int]:
+    return db.query(func.max(models.PoolMetric.id)).scalar()
+
+
+def _as_float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def build_ranking_index(db: Session) -> RankingIndex:
+    version = _metric_version(db)
+
+    latest = (
+        db.query(
+            models.PoolMetric.pool_id.label("pool_id"),
+            func.max(models.PoolMetric.captured_at).label("captured_at"),
+        )
+        .group_by(models.PoolMetric.pool_id)
+        .subquery()
+    )
+    rows = (
+        db.query(models.Pool, models.PoolMetric)
+        .options(joinedload(models.Pool.token0), joinedload(models.Pool.token1))
+        .join(latest, latest.c.pool_id == models.Pool.id)
+        .join(
+            models.PoolMetric,
+            and_(
+                models.PoolMetric.pool_id == latest.c.pool_id,
+                models.PoolMetric.captured_at == latest.c.captured_at,
+            ),
+        )
+        .order_by(models.PoolMetric.id.desc())
+        .all()
+    )
+
+    index = RankingIndex(version=version, built_at=time.time())
+    for pool, metric in rows:
+        if pool.id in index.entries:
+            continue  # aynı captured_at'li ikinci satır; en yeni id kazanır
+        index.entries[pool.id] = {
+            "pool_id": pool.id,
+            "sui_pool_id": pool.sui_pool_id,
+            "pool_name": pool.pool_name,
+            "dex_name": pool.dex_name,
+            "token0": pool.token0.symbol if pool.token0 else None,
+            "token1": pool.token1.symbol if pool.token1 else None,
+            "risk_score": metric.risk_score,
+            "tvl_usd": _as_float(metric.tvl_usd),
+            "volume_24h": _as_float(metric.volume_24h),
+            "captured_at": metric.captured_at.isoformat() if metric.captured_at else None,
+        }
+        index.percentiles[pool.id] = {}
+
+    for by in RANKING_METRICS:
+        valued = [(entry[by], pool_id) for pool_id, entry in index.entries.items() if entry[by] is not None]
+        # Azalan değer, eşitlikte küçük pool id önce (stabil sıralama)
+        valued.sort(key=lambda item: (-item[0], item[1]))
+        index.ordered[by] = [pool_id for _, pool_id in valued]
+
+        ascending = sorted(value for value, _ in valued)
+        n = len(ascending)
+        for value, pool_id in valued:
+            below = bisect.bisect_left(ascending, value)
+            equal = bisect.bisect_right(ascending, value) - below
+            index.percentiles[pool_id][by] = {
+                "value": value,
+                "rank": n - below - equal + 1,          # 1 = en yüksek değer
+                "percentile": round(100.0 * (below + 0.5 * equal) / n, 2),
+            }
+
+    return index
+
+
+class RankingStore:
+    """Process-wide holder of the current RankingIndex."""
+
+    def __init__(
+        self,
+        max_age: float = RANKINGS_MAX_AGE_SECONDS,
+        min_refresh: float = RANKINGS_MIN_REFRESH_SECONDS,
+    ):
+        self.max_age = max_age
+        self.min_refresh = min_refresh
+        self._index: Optional[RankingIndex] = None
+        # Aynı anda tek bir index kurulur
+        self._build_lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def rebuild(self, db: Session) -> RankingIndex:
+        with self._build_lock:
+            self._index = build_ranking_index(db)
+            self._checked_at = time.time()
+            return self._index
+
+    def _refresh_in_background(self) -> None:
+        if not self._build_lock.acquire(blocking=False):
+            return  # zaten biri kuruyor
+
+        def run():
+            db = ReadSessionLocal() if replica_monitor.usable() else SessionLocal()
+            try:
+                self._index = build_ranking_index(db)
+            except Exception:
+                logger.exception("Ranking index refresh failed")
+            finally:
+                db.close()
+                self._build_lock.release()
+
+        try:
+            threading.Thread(target=run, name="ranking-refresh", daemon=True).start()
+        except Exception:
+            self._build_lock.release()
+            raise
+
+    def _is_stale(self, db: Session, index: RankingIndex) -> bool:
+        if index.age() > self.max_age:
+            return True
+        # Replica ile primary arasında geri giden sürüm yeniden kurulum tetiklemesin
+        version = _metric_version(db)
+        return version is not None and (index.version is None or version > index.version)
+
+    def get(self, db: Session) -> RankingIndex:
+        index = self._index
+        if index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self._index = build_ranking_index(db)
+                    self._checked_at = time.time()
+                return self._index
+
+        now = time.time()
+        if now - self._checked_at >= self.min_refresh and not self._build_lock.locked():
+            self._checked_at = now
+            if self._is_stale(db, index):
+                self._refresh_in_background()
+        return index
+
+
+ranking_store = RankingStore()
@@ -0,0 +1,284 @@
+"""Offline replay and rescoring over stored market data.
+
+Re-runs the live scoring math (`score_pool_metrics`) against the order book
+snapshots and trades persisted by metric syncs, for any time range, and writes
+the results to `pool_metric_rescores` under a run id. Pools are scored in
+parallel on a process pool; the parent process only loads rows and inserts
+results.
+
+Usage:
+    python -m app.replay --from 2025-01-01T00:00:00 --to 2025-02-01T00:00:00 \
+        --label new-weights --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from bisect import bisect_right
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .orderbook_cache import ORDERBOOK_DEPTH_LEVELS, summarize_order_book
+from .risk_scoring import score_pool_metrics
+
+logger = logging.getLogger(__name__)
+
+REPLAY_WORKERS = int(os.getenv("REPLAY_WORKERS", str(os.cpu_count() or 2)))
+REPLAY_TRADES_LIMIT = int(os.getenv("REPLAY_TRADES_LIMIT", "100"))
+# İlk snapshot'tan önceki trade'leri de pencereye almak için geriye bakış süresi
+REPLAY_TRADE_LOOKBACK_HOURS = float(os.getenv("REPLAY_TRADE_LOOKBACK_HOURS", "24"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_ms(dt: datetime) -> int:
+    return int((dt - _EPOCH).total_seconds() * 1000)
+
+
+def rescore_pool_history(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Score every stored snapshot of one pool. Runs inside a worker process, so
+    it only touches the plain-data payload built by `_load_pool_payload`.
+
+    Each snapshot is scored with the last `trades_limit` trades at or before
+    its timestamp, mirroring what a live sync would have seen.
+    """
+    trade_ts: List[int] = payload["trade_ts"]
+    trade_prices: List[float] = payload["trade_prices"]
+    trade_quantities: List[float] = payload["trade_quote_quantities"]
+    trades_limit: int = payload["trades_limit"]
+
+    results: List[Dict[str, Any]] = []
+    previous_depth: Optional[float] = None
+
+    for snapshot_id, captured_ms, columns, bids_json, asks_json in payload["snapshots"]:
+        if bids_json is not None and asks_json is not None:
+            # Ham book varsa yeniden özetle ki derinlik parametresi değişiklikleri de test edilebilsin
+            best_bid, best_ask, spread_pct, depth_bids_raw, depth_asks_raw = summarize_order_book(
+                json.loads(bids_json), json.loads(asks_json), payload["depth_levels"]
+            )
+        else:
+            best_bid, best_ask, spread_pct, depth_bids_raw, depth_asks_raw = columns
+
+        depth_total = depth_bids_raw + depth_asks_raw
+        depth_delta = (
+            (depth_total - previous_depth) / previous_depth if previous_depth else None
+        )
+        previous_depth = depth_total
+
+        end = bisect_right(trade_ts, captured_ms)
+        start = max(0, end - trades_limit)
+
+        metrics = score_pool_metrics(
+            best_bid=best_bid,
+            best_ask=best_ask,
+            spread_pct=spread_pct,
+            depth_bids_raw=depth_bids_raw,
+            depth_asks_raw=depth_asks_raw,
+            depth_delta=depth_delta,
+            trade_prices_raw=trade_prices[start:end],
+            trade_quote_quantities_raw=trade_quantities[start:end],
+            base_decimals=payload["base_decimals"],
+            quote_decimals=payload["quote_decimals"],
+        )
+
+        results.append(
+            {
+                "pool_id": payload["pool_id"],
+                "snapshot_id": snapshot_id,
+                "captured_ms": captured_ms,
+                "tvl_usd": metrics["tvl_usd"],
+                "volume_24h": metrics["volume_24h"],
+                "price_var_24h": metrics["price_var_24h"],
+                "il_risk": metrics["il_risk"],
+                "utilization": metrics["utilization"],
+                "risk_score": metrics["risk_score"],
+            }
+        )
+
+    return results
+
+
+def _load_pool_payload(
+    db: Session,
+    pool: models.Pool,
+    start: datetime,
+    end: datetime,
+    trades_limit: int,
+    depth_levels: int,
+) -> Optional[Dict[str, Any]]:
+    snapshots = (
+        db.query(models.OrderBookSnapshot)
+        .filter(models.OrderBookSnapshot.pool_id == pool.id)
+        .filter(models.OrderBookSnapshot.captured_at >= start)
+        .filter(models.OrderBookSnapshot.captured_at <= end)
+        .order_by(models.OrderBookSnapshot.captured_at.asc())
+        .all()
+    )
+    if not snapshots:
+        return None
+
+    lookback_start = start - timedelta(hours=REPLAY_TRADE_LOOKBACK_HOURS)
+    trades = (
+        db.query(
+            models.PoolTrade.timestamp_ms,
+            models.PoolTrade.price,
+            models.PoolTrade.quote_quantity,
+        )
+        .filter(models.PoolTrade.pool_id == pool.id)
+        .filter(models.PoolTrade.timestamp_ms >= _to_ms(lookback_start))
+        .filter(models.PoolTrade.timestamp_ms <= _to_ms(end))
+        .order_by(models.PoolTrade.timestamp_ms.asc())
+        .all()
+    )
+
+    return {
+        "pool_id": pool.id,
+        "base_decimals": pool.token0.decimals if pool.token0 else 9,
+        "quote_decimals": pool.token1.decimals if pool.token1 else 9,
+        "trades_limit": trades_limit,
+        "depth_levels": depth_levels,
+        "snapshots": [
+            (
+                s.id,
+                _to_ms(s.captured_at),
+                (s.best_bid or 0.0, s.best_ask or 0.0, s.spread_pct or 1.0, s.depth_bids or 0.0, s.depth_asks or 0.0),
+                s.bids_json,
+                s.asks_json,
+            )
+            for s in snapshots
+        ],
+        "trade_ts": [t.timestamp_ms for t in trades],
+        "trade_prices": [t.price for t in trades],
+        "trade_quote_quantities": [t.quote_quantity for t in trades],
+    }
+
+
+def _store_results(db: Session, run_id: str, label: Optional[str], rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    db.execute(
+        insert(models.PoolMetricRescore),
+        [
+            {
+                "run_id": run_id,
+                "label": label,
+                "pool_id": r["pool_id"],
+                "snapshot_id": r["snapshot_id"],
+                "tvl_usd": r["tvl_usd"],
+                "volume_24h": r["volume_24h"],
+                "price_var_24h": r["price_var_24h"],
+                "il_risk": r["il_risk"],
+                "utilization": r["utilization"],
+                "risk_score": r["risk_score"],
+                "captured_at": _EPOCH + timedelta(milliseconds=r["captured_ms"]),
+            }
+            for r in rows
+        ],
+    )
+    db.commit()
+
+
+def run_replay(
+    start: datetime,
+    end: datetime,
+    pool_ids: Optional[Iterable[int]] = None,
+    workers: int = REPLAY_WORKERS,
+    label: Optional[str] = None,
+    trades_limit: int = REPLAY_TRADES_LIMIT,
+    depth_levels: int = ORDERBOOK_DEPTH_LEVELS,
+) -> Dict[str, Any]:
+    """
+    Rescore all (or the given) pools between `start` and `end` (naive UTC).
+    With workers <= 1 everything runs in-process, which is handy for SQLite
+    and debugging.
+    """
+    run_id = uuid.uuid4().hex
+    started = time.perf_counter()
+    total_rows = 0
+    scored_pools = 0
+
+    db = SessionLocal()
+    try:
+        query = db.query(models.Pool)
+        if pool_ids:
+            query = query.filter(models.Pool.id.in_(list(pool_ids)))
+        pools = query.all()
+
+        payloads = (
+            _load_pool_payload(db, pool, start, end, trades_limit, depth_levels)
+            for pool in pools
+        )
+
+        if workers <= 1:
+            for payload in payloads:
+                if payload is None:
+                    continue
+                rows = rescore_pool_history(payload)
+                _store_results(db, run_id, label, rows)
+                total_rows += len(rows)
+                scored_pools += 1
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool_executor:
+                futures: List[Future] = [
+                    pool_executor.submit(rescore_pool_history, payload)
+                    for payload in payloads
+                    if payload is not None
+                ]
+                for future in as_completed(futures):
+                    rows = future.result()
+                    _store_results(db, run_id, label, rows)
+                    total_rows += len(rows)
+                    scored_pools += 1
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Replay {run_id} finished: pools={scored_pools} rows={total_rows} elapsed={elapsed:.2f}s"
+    )
+    return {
+        "run_id": run_id,
+        "label": label,
+        "pools": scored_pools,
+        "rows": total_rows,
+        "elapsed_seconds": elapsed,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rescore stored market data into pool_metric_rescores.")
+    parser.add_argument("--from", dest="start", required=True, type=datetime.fromisoformat, help="UTC start (ISO 8601)")
+    parser.add_argument("--to", dest="end", required=True, type=datetime.fromisoformat, help="UTC end (ISO 8601)")
+    parser.add_argument("--pool-id", dest="pool_ids", type=int, action="append", help="Limit to pool id (repeatable)")
+    parser.add_argument("--workers", type=int, default=REPLAY_WORKERS)
+    parser.add_argument("--label", default=None, help="Free-form tag stored with every row, e.g. model version")
+    parser.add_argument("--trades-limit", type=int, default=REPLAY_TRADES_LIMIT)
+    parser.add_argument("--depth-levels", type=int, default=ORDERBOOK_DEPTH_LEVELS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_replay(
+        start=args.start,
+        end=args.end,
+        pool_ids=args.pool_ids,
+        workers=args.workers,
+        label=args.label,
+        trades_limit=args.trades_limit,
+        depth_levels=args.depth_levels,
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
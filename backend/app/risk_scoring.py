@@ -1,14 +1,19 @@
+import logging
 import math
-from typing import Any, Dict, List, Optional
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy.orm import Session
 
 from . import models
-from .surflux_client import (
-    fetch_order_book_depth,
-    fetch_recent_trades,
-    SurfluxError,
-)
+from .market_adapters import MARKET_DATA_ERRORS, MarketAdapter, get_adapter
+from .orderbook_cache import order_book_cache, CachedOrderBook, ORDERBOOK_PERSIST_SNAPSHOTS
+from .executor import run_cpu_bound
+from .market_history import persist_order_book_snapshot, persist_trades, TRADES_PERSIST
+from .token_risk import apply_pool_metric_change, latest_pool_metric
+from .alerts import alert_engine
+
+logger = logging.getLogger(__name__)
 
 
 def _safe_div(numerator: float, denominator: float, default: float = 0.0) -> float:
@@ -21,76 +26,54 @@ def _clamp01(value: float) -> float:
     return max(0.0, min(1.0, value))
 
 
-async def compute_pool_risk_metrics(
-    pool_name: str,
+def _dead_pool_metrics(risk_score: int, error: str) -> Dict[str, Any]:
+    """Order book okunamayan / boş havuzlar için sabit yüksek riskli metrikler."""
+    return {
+        "tvl_usd": 0.0,
+        "volume_24h": 0.0,
+        "price_var_24h": 0.0,
+        "il_risk": 1.0,
+        "utilization": 0.0,
+        "risk_score": risk_score,
+        "error": error,
+    }
+
+
+def score_pool_metrics(
+    best_bid: float,
+    best_ask: float,
+    spread_pct: float,
+    depth_bids_raw: float,
+    depth_asks_raw: float,
+    depth_delta: Optional[float],
+    trade_prices_raw: Sequence[float],
+    trade_quote_quantities_raw: Sequence[float],
     base_decimals: int,
     quote_decimals: int,
-    trades_limit: int = 100,
 ) -> Dict[str, Any]:
     """
-    Surflux Deepbook verilerini kullanarak bir pool için risk metrikleri hesaplar.
+    compute_pool_risk_metrics'in saf hesap kısmı: I/O yok, sadece sayılar.
 
-    Dönüş:
-        {
-          "tvl_usd": float,
-          "volume_24h": float,
-          "price_var_24h": float,
-          "il_risk": float,
-          "utilization": float,
-          "risk_score": int,
-        }
+    Order book özeti (raw birimler) ve trade fiyat / quote miktar dizileri
+    üzerinden metrikleri hesaplar. Canlı sync ve offline replay aynı fonksiyonu
+    kullanır.
     """
 
-    # 1) Order book depth verisi
-    try:
-        order_book = await fetch_order_book_depth(pool_name, limit=20)
-    except SurfluxError as e:
-        # Order book çekilemezse aşırı riskli kabul ediyoruz
-        return {
-            "tvl_usd": 0.0,
-            "volume_24h": 0.0,
-            "price_var_24h": 0.0,
-            "il_risk": 1.0,
-            "utilization": 0.0,
-            "risk_score": 95,
-            "error": f"order_book_error: {e}",
-        }
-
-    bids: List[Dict[str, Any]] = order_book.get("bids") or []
-    asks: List[Dict[str, Any]] = order_book.get("asks") or []
-
     # Eğer hiç bid/ask yoksa havuz fiilen ölü
-    if not bids or not asks:
-        return {
-            "tvl_usd": 0.0,
-            "volume_24h": 0.0,
-            "price_var_24h": 0.0,
-            "il_risk": 1.0,
-            "utilization": 0.0,
-            "risk_score": 98,
-            "error": "empty_orderbook",
-        }
+    if best_bid <= 0 or best_ask <= 0:
+        return _dead_pool_metrics(98, "empty_orderbook")
 
     # ------------- Order book metrikleri -------------
-    best_bid = float(bids[0]["price"])
-    best_ask = float(asks[0]["price"])
     mid_raw = (best_bid + best_ask) / 2.0
 
-    # Spread (yüzde)
-    spread_pct = _safe_div(best_ask - best_bid, mid_raw, default=1.0)
-
     # Fiyatı insan okuyabilir forma çevir (USDC tarzı quote varsayımı)
     # Docs: price / 10^quote_decimals  ≈ quote asset cinsinden fiyat
     # (base_decimals dahil daha kompleks formül var ama burada yaklaşık kullanıyoruz)
     mid_price_human = mid_raw / (10**quote_decimals)
 
     # Derinlik: ilk 10 seviye bid/ask toplamı (base asset miktarı)
-    def _sum_depth(levels: List[Dict[str, Any]], depth_levels: int = 10) -> float:
-        total_raw = sum(float(l["total_quantity"]) for l in levels[:depth_levels])
-        return total_raw / (10**base_decimals)
-
-    depth_bids = _sum_depth(bids)
-    depth_asks = _sum_depth(asks)
+    depth_bids = depth_bids_raw / (10**base_decimals)
+    depth_asks = depth_asks_raw / (10**base_decimals)
     depth_total = depth_bids + depth_asks
 
     # TVL tahmini: görünen derinliği kullanıyoruz (tam TVL değil ama proxy)
@@ -103,24 +86,15 @@ async def compute_pool_risk_metrics(
     else:
         imbalance = 0.5
 
-    # ------------- Trade metrikleri -------------
-    try:
-        trades = await fetch_recent_trades(pool_name, limit=trades_limit)
-    except SurfluxError:
-        trades = []
+    # Önceki snapshot'a göre derinlik değişimi (ilk snapshot'ta 0)
+    depth_change = depth_delta if depth_delta is not None else 0.0
 
-    prices: List[float] = []
-    quote_volumes: List[float] = []
-
-    for t in trades:
-        price_human = float(t["price"]) / (10**quote_decimals)
-        quote_qty_human = float(t["quote_quantity"]) / (10**quote_decimals)
-
-        prices.append(price_human)
-        quote_volumes.append(quote_qty_human)
+    # ------------- Trade metrikleri -------------
+    quote_scale = 10**quote_decimals
+    prices: List[float] = [float(p) / quote_scale for p in trade_prices_raw]
 
     # 24h hacim (approx)
-    volume_24h = sum(quote_volumes) if quote_volumes else 0.0
+    volume_24h = sum(float(q) for q in trade_quote_quantities_raw) / quote_scale
 
     # Volatilite (relatif std/mean)
     if len(prices) >= 2:
@@ -188,16 +162,94 @@ async def compute_pool_risk_metrics(
         "spread_pct": float(spread_pct),
         "imbalance": float(imbalance),
         "depth_total": float(depth_total),
+        "depth_change": float(depth_change),
     }
 
 
+async def fetch_pool_market_data(
+    pool_name: str,
+    trades_limit: int = 100,
+    adapter: Optional[MarketAdapter] = None,
+) -> Tuple[CachedOrderBook, List[Dict[str, Any]]]:
+    """
+    Skorlama girdilerini toplar: order book snapshot'ı (cache'ten ya da havuzun
+    dex adapter'ından) ve son trade'ler. Order book alınamazsa adapter'ın veri
+    hatasını (MARKET_DATA_ERRORS) fırlatır; trade hatası boş listeye düşer.
+    """
+    adapter = adapter or get_adapter(None)
+    snapshot = await order_book_cache.get(pool_name, dex_name=adapter.dex_name)
+    if snapshot.is_empty:
+        # Ölü havuz için trade çekmeye gerek yok, skor zaten sabit
+        return snapshot, []
+
+    try:
+        trades = await adapter.fetch_trades(pool_name, limit=trades_limit)
+    except MARKET_DATA_ERRORS:
+        trades = []
+
+    return snapshot, trades
+
+
+async def _score_market_data(
+    snapshot: CachedOrderBook,
+    trades: List[Dict[str, Any]],
+    base_decimals: int,
+    quote_decimals: int,
+) -> Dict[str, Any]:
+    # Executor'a dict listesi yerine düz float dizileri gönderiyoruz (pickle maliyeti düşük)
+    return await run_cpu_bound(
+        score_pool_metrics,
+        best_bid=snapshot.best_bid,
+        best_ask=snapshot.best_ask,
+        spread_pct=snapshot.spread_pct,
+        depth_bids_raw=snapshot.depth_bids_raw,
+        depth_asks_raw=snapshot.depth_asks_raw,
+        depth_delta=snapshot.depth_delta,
+        trade_prices_raw=array("d", (float(t["price"]) for t in trades)),
+        trade_quote_quantities_raw=array("d", (float(t["quote_quantity"]) for t in trades)),
+        base_decimals=base_decimals,
+        quote_decimals=quote_decimals,
+    )
+
+
+async def compute_pool_risk_metrics(
+    pool_name: str,
+    base_decimals: int,
+    quote_decimals: int,
+    trades_limit: int = 100,
+    dex_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Havuzun dex adapter'ından (varsayılan Deepbook / Surflux) gelen verilerle
+    bir pool için risk metrikleri hesaplar.
+
+    Dönüş:
+        {
+          "tvl_usd": float,
+          "volume_24h": float,
+          "price_var_24h": float,
+          "il_risk": float,
+          "utilization": float,
+          "risk_score": int,
+        }
+    """
+    adapter = get_adapter(dex_name)
+    try:
+        snapshot, trades = await fetch_pool_market_data(pool_name, trades_limit=trades_limit, adapter=adapter)
+    except MARKET_DATA_ERRORS as e:
+        # Order book çekilemezse aşırı riskli kabul ediyoruz
+        return _dead_pool_metrics(95, f"order_book_error: {e}")
+
+    return await _score_market_data(snapshot, trades, base_decimals, quote_decimals)
+
+
 async def calculate_and_store_pool_metrics(
     db: Session,
     pool: models.Pool,
     pool_name: str,
 ) -> models.PoolMetric:
     """
-    Verilen Pool için Surflux verisine dayanarak risk metriklerini hesaplar
+    Verilen Pool için dex adapter'ının verisine dayanarak risk metriklerini hesaplar
     ve yeni bir PoolMetric kaydı oluşturur.
     """
 
@@ -208,11 +260,19 @@ async def calculate_and_store_pool_metrics(
     base_decimals = pool.token0.decimals
     quote_decimals = pool.token1.decimals
 
-    metrics = await compute_pool_risk_metrics(
-        pool_name=pool_name,
-        base_decimals=base_decimals,
-        quote_decimals=quote_decimals,
-    )
+    # Kayıtlı adapter'ı olmayan dex'te sahte "ölü havuz" metriği yazmak yerine hata ver
+    adapter = get_adapter(pool.dex_name)
+
+    try:
+        snapshot, trades = await fetch_pool_market_data(pool_name, adapter=adapter)
+    except MARKET_DATA_ERRORS as e:
+        # Order book çekilemezse aşırı riskli kabul ediyoruz
+        snapshot, trades = None, []
+        metrics = _dead_pool_metrics(95, f"order_book_error: {e}")
+    else:
+        metrics = await _score_market_data(snapshot, trades, base_decimals, quote_decimals)
+
+    previous_metric = latest_pool_metric(db, pool.id)
 
     pool_metric = models.PoolMetric(
         pool_id=pool.id,
@@ -225,7 +285,28 @@ async def calculate_and_store_pool_metrics(
     )
 
     db.add(pool_metric)
+    db.flush()
+
+    # Token risk özetlerinde havuzun katkısını eski metrikten yenisine taşı
+    apply_pool_metric_change(db, pool, previous_metric, pool_metric)
+
+    # Replay için ham piyasa verisini sakla (env ile açılır)
+    snapshot_added = False
+    if ORDERBOOK_PERSIST_SNAPSHOTS and snapshot is not None:
+        snapshot_added = persist_order_book_snapshot(db, pool.id, snapshot)
+    if TRADES_PERSIST and trades:
+        persist_trades(db, pool.id, trades)
+
     db.commit()
+    # Rollback olursa snapshot işaretlenmez; sonraki sync tekrar yazar
+    if snapshot_added:
+        snapshot.persisted = True
     db.refresh(pool_metric)
 
+    # Alarm kuralları bellekte değerlendirilir; teslimat kuyruktan yapılır, sync'i bekletmez
+    try:
+        alert_engine.observe(pool, previous_metric, pool_metric)
+    except Exception:
+        logger.exception(f"Alert evaluation failed for pool_id={pool.id}")
+
     return pool_metric
@@ -1,8 +1,8 @@
 # app/schemas.py
 
-from typing import Optional
+from typing import Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PositiveFloat
 
 
 class MintRiskIdentityRequest(BaseModel):
@@ -31,3 +31,73 @@ class MintRiskIdentityPayload(BaseModel):
     score: int               # normalize edilmiş risk skoru
     level: int               # risk seviye (1-3)
     timestamp_ms: int        # backend timestamp (mint_identity ts_ms parametresine gider)
+
+
+class MintRiskIdentityBatchRequest(BaseModel):
+    """
+    Çok sayıda cüzdan için toplu mint payload isteği.
+    Payload'lar group_size'lık gruplara bölünür; her grup tek bir
+    programmable transaction'da (PTB) art arda mint_identity çağrısı olarak kullanılabilir.
+    """
+    addresses: list[str] = Field(..., min_length=1, description="Sui cüzdan adresleri (tekrarlar tek sayılır)")
+    group_size: Optional[int] = Field(None, ge=1, description="PTB başına mint çağrısı; boşsa MINT_BATCH_GROUP_SIZE")
+
+
+class MintRiskIdentityPayloadGroup(BaseModel):
+    """Tek bir PTB'de birleştirilecek mint payload'ları (hepsi aynı timestamp_ms ile)."""
+    payloads: list[MintRiskIdentityPayload]
+
+
+class MintRiskIdentityBatchPayload(BaseModel):
+    total: int               # üretilen payload sayısı
+    group_size: int
+    timestamp_ms: int        # tüm payload'larda ortak ts_ms
+    groups: list[MintRiskIdentityPayloadGroup]
+
+
+class StoreRiskIdentityRequest(BaseModel):
+    """
+    Mint edilmiş bir Risk Identity NFT kaydı (frontend mint sonrası gönderir).
+    level payload'da int, eski client'larda string gelebiliyor; DB'de string tutuluyor.
+    """
+    address: str = Field(..., min_length=1)
+    score: int = Field(..., ge=0, le=100)
+    level: Union[int, str]
+    timestamp_ms: int = Field(..., ge=0)
+    tx_digest: str = Field(..., min_length=1, max_length=255)
+
+
+class StoreRiskIdentityBatchRequest(BaseModel):
+    items: list[StoreRiskIdentityRequest] = Field(..., min_length=1)
+
+
+class PoolRiskRegistrationRequest(BaseModel):
+    """
+    Bir havuzu on-chain PoolRisk objesiyle eşleştirir (risk_index::init_pool_risk ile yaratılmış obje).
+    Publisher sadece kayıtlı havuzların skorlarını yayınlar.
+    """
+    pool_id: int = Field(..., description="Backend'deki Pool.id")
+    pool_risk_object_id: str = Field(..., description="On-chain PoolRisk object ID (0x...)")
+
+
+class SlippageBatchRequest(BaseModel):
+    """
+    Aynı order book snapshot'ı üzerinden çok sayıda boyut için slippage quote'u.
+    side boşsa hem buy hem sell hesaplanır.
+    """
+    sizes: list[PositiveFloat] = Field(..., min_length=1, description="Quote notional (unit=quote) veya base miktarı (unit=base)")
+    side: Optional[str] = Field(None, description="buy | sell; boşsa ikisi de")
+    unit: str = Field("quote", description="quote | base")
+
+
+class AlertSubscriptionRequest(BaseModel):
+    """
+    Risk alarmı webhook aboneliği. En az bir kural verilmeli:
+    min_score (eşik aşımı), min_delta (önceki skora göre sıçrama) veya on_level_change.
+    """
+    url: str = Field(..., max_length=1024, description="Alarmların POST edileceği http(s) URL")
+    pool_id: Optional[int] = Field(None, description="Boşsa tüm havuzlar")
+    min_score: Optional[int] = Field(None, ge=0, le=100, description="Skor bu eşiği yukarı/aşağı geçince")
+    min_delta: Optional[int] = Field(None, ge=1, le=100, description="Önceki skora göre en az bu kadar değişince")
+    on_level_change: bool = Field(False, description="Risk seviyesi (1/2/3) değişince")
+    secret: Optional[str] = Field(None, max_length=255, description="X-Risk-Alert-Signature HMAC anahtarı")
@@ -0,0 +1,103 @@
+"""Price impact / slippage quotes from cached order book depth.
+
+A quote answers "what does filling `size` on `side` cost in this pool right
+now": the average and worst fill price, slippage of the average price vs the
+mid price and the impact of the worst price vs the best one. Quotes binary
+search the snapshot's cumulative-depth ladders (`CachedOrderBook.ladder`),
+so once a snapshot is cached any number of quotes costs no upstream call.
+
+Units follow the scoring pipeline: price = raw / 10^quote_decimals, base
+quantity = raw / 10^base_decimals. `size` is quote notional (e.g. USD) or
+base quantity, per `unit`. Only the fetched levels (ORDERBOOK_FETCH_LIMIT)
+are visible; larger sizes come back with `fully_filled: false`.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from .orderbook_cache import CachedOrderBook
+
+SLIPPAGE_SIDES = ("buy", "sell")
+SLIPPAGE_UNITS = ("quote", "base")
+
+
+def _pct(value: Optional[float]) -> Optional[float]:
+    return round(value * 100.0, 6) if value is not None else None
+
+
+def quote_slippage(
+    snapshot: CachedOrderBook,
+    side: str,
+    size: float,
+    base_decimals: int,
+    quote_decimals: int,
+    unit: str = "quote",
+) -> Dict[str, Any]:
+    ladder = snapshot.ladder(side)
+    base_scale = 10**base_decimals
+    quote_scale = 10**quote_decimals
+
+    # Ladder raw birimlerde: notional = raw fiyat * raw miktar
+    by_quote = unit == "quote"
+    target = size * base_scale * quote_scale if by_quote else size * base_scale
+    base_raw, quote_raw, levels_used, last_price_raw = ladder.fill(target, by_quote)
+
+    filled_base = base_raw / base_scale
+    filled_quote = quote_raw / (base_scale * quote_scale)
+    avg_price = filled_quote / filled_base if filled_base > 0 else None
+    best_price = ladder.prices[0] / quote_scale if len(ladder) else None
+    worst_price = last_price_raw / quote_scale if last_price_raw is not None else None
+
+    mid_price = None
+    if not snapshot.is_empty:
+        mid_price = (snapshot.best_bid + snapshot.best_ask) / 2.0 / quote_scale
+
+    # Alıcı için pahalı, satıcı için ucuz dolum pozitif slippage
+    direction = 1.0 if side == "buy" else -1.0
+    slippage = None
+    if avg_price is not None and mid_price:
+        slippage = direction * (avg_price - mid_price) / mid_price
+    impact = None
+    if worst_price is not None and best_price:
+        impact = direction * (worst_price - best_price) / best_price
+
+    return {
+        "side": side,
+        "size": size,
+        "avg_price": avg_price,
+        "worst_price": worst_price,
+        "filled_base": filled_base,
+        "filled_quote": filled_quote,
+        "slippage_pct": _pct(slippage),
+        "price_impact_pct": _pct(impact),
+        "levels_consumed": levels_used,
+        "fully_filled": levels_used > 0 and (filled_quote if by_quote else filled_base) >= size * (1 - 1e-12),
+    }
+
+
+def quote_slippage_many(
+    snapshot: CachedOrderBook,
+    sides: Iterable[str],
+    sizes: Iterable[float],
+    base_decimals: int,
+    quote_decimals: int,
+    unit: str = "quote",
+) -> Dict[str, List[Dict[str, Any]]]:
+    sizes = list(sizes)
+    return {
+        side: [quote_slippage(snapshot, side, size, base_decimals, quote_decimals, unit) for size in sizes]
+        for side in sides
+    }
+
+
+def book_context(snapshot: CachedOrderBook, quote_decimals: int) -> Dict[str, Any]:
+    """Snapshot-level fields shared by single and batch responses."""
+    quote_scale = 10**quote_decimals
+    return {
+        "best_bid": snapshot.best_bid / quote_scale if snapshot.bids else None,
+        "best_ask": snapshot.best_ask / quote_scale if snapshot.asks else None,
+        "mid_price": None if snapshot.is_empty else (snapshot.best_bid + snapshot.best_ask) / 2.0 / quote_scale,
+        "spread_pct": _pct(snapshot.spread_pct) if not snapshot.is_empty else None,
+        "levels": {"bids": len(snapshot.ladder("sell")), "asks": len(snapshot.ladder("buy"))},
+        "snapshot_age_seconds": round(snapshot.age(), 3),
+    }
@@ -0,0 +1,181 @@
+"""Minimal Sui JSON-RPC client and Ed25519 signer.
+
+Only what the backend needs: build a batched programmable transaction
+through `unsafe_batchTransaction`, sign it locally and execute it, plus the
+read methods the RiskIdentity indexer pages through. SUI_RPC_URL can point at a fullnode or a local stand-in
+(see benchmarks/fake_sui_rpc.py).
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import itertools
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+# Sui Risk Identity / Risk Index konfigürasyonu (env'den okunur)
+SUI_RPC_URL = os.getenv("SUI_RPC_URL", "https://fullnode.testnet.sui.io:443")
+
+# Default olarak en son deploy ettiğin package ID'yi bırakıyorum;
+# production'da mutlaka .env'den gelsin.
+SUI_RISK_PACKAGE_ID = os.getenv(
+    "SUI_RISK_PACKAGE_ID",
+    "0xb41df90acf072d4c7e74f44091ebadbe63758b7b4a20ea1cfe6a7b4456fa5afb",
+)
+SUI_RISK_MODULE = os.getenv("SUI_RISK_MODULE", "risk_identity")
+SUI_RISK_FUNCTION_MINT = os.getenv("SUI_RISK_FUNCTION_MINT", "mint_identity")
+SUI_RISK_INDEX_MODULE = os.getenv("SUI_RISK_INDEX_MODULE", "risk_index")
+SUI_RISK_INDEX_FUNCTION_UPDATE = os.getenv("SUI_RISK_INDEX_FUNCTION_UPDATE", "update_score")
+
+# Sui imza şeması bayrağı ve TransactionData intent'i (scope=0, version=0, app_id=0)
+_ED25519_FLAG = 0x00
+_TRANSACTION_INTENT = bytes([0, 0, 0])
+
+
+class SuiRpcError(Exception):
+    pass
+
+
+class Ed25519Signer:
+    """Signs Sui transaction bytes with a local Ed25519 key."""
+
+    def __init__(self, private_key: "Ed25519PrivateKey"):
+        # cryptography sadece imza gerektiğinde yüklensin (API cold start'ı için)
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+        self._private_key = private_key
+        self.public_key = private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+        self.address = "0x" + hashlib.blake2b(bytes([_ED25519_FLAG]) + self.public_key, digest_size=32).hexdigest()
+
+    @classmethod
+    def from_encoded(cls, encoded: str) -> "Ed25519Signer":
+        """
+        Accepts the `sui.keystore` format (base64 of flag || 32-byte seed),
+        a bare base64 seed, or a 0x-prefixed hex seed.
+        """
+        encoded = encoded.strip()
+        if encoded.startswith("0x"):
+            raw = bytes.fromhex(encoded[2:])
+        else:
+            raw = base64.b64decode(encoded)
+
+        if len(raw) == 33:
+            if raw[0] != _ED25519_FLAG:
+                raise SuiRpcError("Only Ed25519 keys are supported for publishing.")
+            raw = raw[1:]
+        if len(raw) != 32:
+            raise SuiRpcError("Private key must be 32 bytes (optionally prefixed with the scheme flag).")
+
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+        return cls(Ed25519PrivateKey.from_private_bytes(raw))
+
+    def sign_transaction(self, tx_bytes_b64: str) -> str:
+        """Return the serialized signature (flag || sig || pubkey, base64) for the tx bytes."""
+        tx_bytes = base64.b64decode(tx_bytes_b64)
+        digest = hashlib.blake2b(_TRANSACTION_INTENT + tx_bytes, digest_size=32).digest()
+        signature = self._private_key.sign(digest)
+        return base64.b64encode(bytes([_ED25519_FLAG]) + signature + self.public_key).decode()
+
+
+class SuiRpcClient:
+    def __init__(self, url: str = SUI_RPC_URL, timeout: float = 30.0):
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+        self._ids = itertools.count(1)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def call(self, method: str, params: List[Any]) -> Any:
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        # Bağlantı / timeout hataları ve JSON olmayan gövdeler de SuiRpcError olarak yükselsin
+        try:
+            resp = await self._client.post(self.url, json=payload)
+        except httpx.HTTPError as e:
+            raise SuiRpcError(f"{method} failed: {type(e).__name__}: {e}") from e
+        if resp.status_code != 200:
+            raise SuiRpcError(f"{method} failed: {resp.status_code} - {resp.text[:200]}")
+
+        try:
+            body = resp.json()
+        except ValueError as e:
+            raise SuiRpcError(f"{method} failed: invalid JSON response - {resp.text[:200]}") from e
+        if not isinstance(body, dict):
+            raise SuiRpcError(f"{method} failed: unexpected response {str(body)[:200]}")
+        if body.get("error"):
+            raise SuiRpcError(f"{method} failed: {body['error']}")
+        return body.get("result")
+
+    async def build_move_call_batch(
+        self,
+        signer_address: str,
+        calls: List[Dict[str, Any]],
+        gas_budget: int,
+        gas_object: Optional[str] = None,
+    ) -> str:
+        """
+        Build one programmable transaction containing every Move call in
+        `calls` (each: package, module, function, arguments). Returns txBytes.
+        """
+        requests = [
+            {
+                "moveCallRequestParams": {
+                    "packageObjectId": c["package"],
+                    "module": c["module"],
+                    "function": c["function"],
+                    "typeArguments": c.get("type_arguments", []),
+                    "arguments": c["arguments"],
+                }
+            }
+            for c in calls
+        ]
+        result = await self.call(
+            "unsafe_batchTransaction",
+            [signer_address, requests, gas_object, str(gas_budget), None],
+        )
+        return result["txBytes"]
+
+    async def execute_transaction(self, tx_bytes: str, signature: str) -> Dict[str, Any]:
+        result = await self.call(
+            "sui_executeTransactionBlock",
+            [tx_bytes, [signature], {"showEffects": True}, "WaitForLocalExecution"],
+        )
+        status = (((result or {}).get("effects") or {}).get("status") or {}).get("status")
+        if status != "success":
+            raise SuiRpcError(f"Transaction {result.get('digest')} failed: {result.get('effects', {}).get('status')}")
+        return result
+
+    async def query_transaction_blocks(
+        self,
+        tx_filter: Dict[str, Any],
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        descending: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """One page of `suix_queryTransactionBlocks` (data, nextCursor, hasNextPage)."""
+        query = {"filter": tx_filter, "options": options or {}}
+        return await self.call("suix_queryTransactionBlocks", [query, cursor, limit, descending])
+
+    async def multi_get_objects(
+        self,
+        object_ids: List[str],
+        options: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self.call("sui_multiGetObjects", [object_ids, options or {"showContent": True}])
+
+
+def gas_used_total(effects: Dict[str, Any]) -> int:
+    """computation + storage - rebate, as reported in transaction effects."""
+    gas = effects.get("gasUsed") or {}
+    return (
+        int(gas.get("computationCost", 0))
+        + int(gas.get("storageCost", 0))
+        - int(gas.get("storageRebate", 0))
+    )
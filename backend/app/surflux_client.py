@@ -3,7 +3,9 @@ from typing import Any, Dict, List, Optional
 
 import httpx
 
-SURFLUX_BASE_URL = "https://api.surflux.dev"
+from .profiling import span
+
+SURFLUX_BASE_URL = os.getenv("SURFLUX_BASE_URL", "https://api.surflux.dev")
 SURFLUX_API_KEY = os.getenv("SURFLUX_API_KEY")
 
 
@@ -25,13 +27,14 @@ async def fetch_deepbook_pools() -> List[Dict[str, Any]]:
     api_key = _get_api_key()
     url = f"{SURFLUX_BASE_URL}/deepbook/get_pools"
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.get(url, params={"api-key": api_key})
-        if resp.status_code != 200:
-            raise SurfluxError(
-                f"Get Pools failed: {resp.status_code} - {resp.text[:200]}"
-            )
-        return resp.json()
+    with span("surflux", "get_pools"):
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            resp = await client.get(url, params={"api-key": api_key})
+            if resp.status_code != 200:
+                raise SurfluxError(
+                    f"Get Pools failed: {resp.status_code} - {resp.text[:200]}"
+                )
+            return resp.json()
 
 
 async def fetch_order_book_depth(pool_name: str, limit: int = 20) -> Dict[str, Any]:
@@ -41,19 +44,20 @@ async def fetch_order_book_depth(pool_name: str, limit: int = 20) -> Dict[str, A
     api_key = _get_api_key()
     url = f"{SURFLUX_BASE_URL}/deepbook/{pool_name}/order-book-depth"
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.get(
-            url,
-            params={
-                "limit": limit,
-                "api-key": api_key,
-            },
-        )
-        if resp.status_code != 200:
-            raise SurfluxError(
-                f"Order book depth failed: {resp.status_code} - {resp.text[:200]}"
+    with span("surflux", "order_book_depth"):
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            resp = await client.get(
+                url,
+                params={
+                    "limit": limit,
+                    "api-key": api_key,
+                },
             )
-        return resp.json()
+            if resp.status_code != 200:
+                raise SurfluxError(
+                    f"Order book depth failed: {resp.status_code} - {resp.text[:200]}"
+                )
+            return resp.json()
 
 
 async def fetch_recent_trades(
@@ -78,10 +82,11 @@ async def fetch_recent_trades(
     if to_ts is not None:
         params["to"] = to_ts
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(url, params=params)
-        if resp.status_code != 200:
-            raise SurfluxError(
-                f"Recent trades failed: {resp.status_code} - {resp.text[:200]}"
-            )
-        return resp.json()
+    with span("surflux", "trades"):
+        async with httpx.AsyncClient(timeout=20.0) as client:
+            resp = await client.get(url, params=params)
+            if resp.status_code != 200:
+                raise SurfluxError(
+                    f"Recent trades failed: {resp.status_code} - {resp.text[:200]}"
+                )
+            return resp.json()
@@ -0,0 +1,213 @@
+"""Token-level risk rollups.
+
+`token_risk_rollups` keeps, per token, the sums over the latest PoolMetric
+of every pool the token trades in: pool count, TVL, 24h volume and
+risk_score * TVL. When a pool gets a new metric the previous metric's
+contribution is subtracted and the new one added with a single UPDATE per
+token, so concurrent syncs of different pools sharing a token do not lose
+updates. A token without a rollup row is computed from scratch once, by
+the first sync that touches it; reads never write and compute a missing
+rollup on the fly.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+_ZERO = Decimal("0")
+
+
+def _dec(value) -> Decimal:
+    if value is None:
+        return _ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+@dataclass
+class PoolContribution:
+    pool_count: int = 0
+    tvl_usd: Decimal = _ZERO
+    volume_24h: Decimal = _ZERO
+    risk_tvl: Decimal = _ZERO
+    risk_score: int = 0
+
+    @classmethod
+    def of(cls, metric: Optional[models.PoolMetric]) -> "PoolContribution":
+        if metric is None:
+            return cls()
+        tvl = _dec(metric.tvl_usd)
+        risk = int(metric.risk_score or 0)
+        return cls(
+            pool_count=1,
+            tvl_usd=tvl,
+            volume_24h=_dec(metric.volume_24h),
+            risk_tvl=tvl * risk,
+            risk_score=risk,
+        )
+
+    def plus(self, other: "PoolContribution", sign: int = 1) -> "PoolContribution":
+        return PoolContribution(
+            pool_count=self.pool_count + sign * other.pool_count,
+            tvl_usd=self.tvl_usd + sign * other.tvl_usd,
+            volume_24h=self.volume_24h + sign * other.volume_24h,
+            risk_tvl=self.risk_tvl + sign * other.risk_tvl,
+            risk_score=self.risk_score + sign * other.risk_score,
+        )
+
+    def minus(self, other: "PoolContribution") -> "PoolContribution":
+        return self.plus(other, sign=-1)
+
+    def is_zero(self) -> bool:
+        return (
+            self.pool_count == 0
+            and self.tvl_usd == 0
+            and self.volume_24h == 0
+            and self.risk_tvl == 0
+            and self.risk_score == 0
+        )
+
+
+def latest_pool_metric(db: Session, pool_id: int) -> Optional[models.PoolMetric]:
+    return (
+        db.query(models.PoolMetric)
+        .filter(models.PoolMetric.pool_id == pool_id)
+        .order_by(models.PoolMetric.captured_at.desc(), models.PoolMetric.id.desc())
+        .first()
+    )
+
+
+def _token_contribution(db: Session, token_id: int) -> PoolContribution:
+    """Sum of the latest metric of each pool the token trades in."""
+    pool_ids = [
+        pool_id
+        for (pool_id,) in db.query(models.Pool.id)
+        .filter(or_(models.Pool.token0_id == token_id, models.Pool.token1_id == token_id))
+        .all()
+    ]
+
+    total = PoolContribution()
+    if pool_ids:
+        latest = (
+            db.query(
+                models.PoolMetric.pool_id.label("pool_id"),
+                func.max(models.PoolMetric.captured_at).label("captured_at"),
+            )
+            .filter(models.PoolMetric.pool_id.in_(pool_ids))
+            .group_by(models.PoolMetric.pool_id)
+            .subquery()
+        )
+        metrics = (
+            db.query(models.PoolMetric)
+            .join(
+                latest,
+                and_(
+                    models.PoolMetric.pool_id == latest.c.pool_id,
+                    models.PoolMetric.captured_at == latest.c.captured_at,
+                ),
+            )
+            .order_by(models.PoolMetric.id.desc())
+            .all()
+        )
+        seen = set()
+        for metric in metrics:
+            if metric.pool_id in seen:
+                continue
+            seen.add(metric.pool_id)
+            total = total.plus(PoolContribution.of(metric))
+    return total
+
+
+def compute_token_rollup(db: Session, token_id: int) -> models.TokenRiskRollup:
+    """Rollup computed on the fly and not added to the session (read-only callers)."""
+    total = _token_contribution(db, token_id)
+    return models.TokenRiskRollup(
+        token_id=token_id,
+        pool_count=total.pool_count,
+        tvl_usd_total=total.tvl_usd,
+        volume_24h_total=total.volume_24h,
+        risk_tvl_sum=total.risk_tvl,
+        risk_score_sum=total.risk_score,
+    )
+
+
+def rebuild_token_rollup(db: Session, token_id: int) -> Optional[models.TokenRiskRollup]:
+    """
+    Create a missing rollup row from scratch. Returns None when another
+    transaction created the row first; that row is kept, since later changes
+    reach it as deltas and overwriting it with values computed from an older
+    snapshot would drift for good.
+    """
+    rollup = compute_token_rollup(db, token_id)
+    try:
+        with db.begin_nested():
+            db.add(rollup)
+        return rollup
+    except IntegrityError:
+        return None
+
+
+def apply_pool_metric_change(
+    db: Session,
+    pool: models.Pool,
+    previous: Optional[models.PoolMetric],
+    current: models.PoolMetric,
+) -> None:
+    """
+    Move the pool's contribution in its tokens' rollups from `previous` to
+    `current`. `current` must already be flushed. Caller commits.
+    """
+    delta = PoolContribution.of(current).minus(PoolContribution.of(previous))
+
+    for token_id in {pool.token0_id, pool.token1_id}:
+        # Baştan hesaplanan satır `current`'ı zaten içeriyor. Yarışı kaybedersek
+        # diğer transaction'ın satırında `current` yok: deltayı ona uygula
+        if db.get(models.TokenRiskRollup, token_id) is None and rebuild_token_rollup(db, token_id) is not None:
+            continue
+        if delta.is_zero():
+            continue
+
+        rollup = models.TokenRiskRollup
+        db.execute(
+            update(rollup)
+            .where(rollup.token_id == token_id)
+            .values(
+                pool_count=rollup.pool_count + delta.pool_count,
+                tvl_usd_total=rollup.tvl_usd_total + delta.tvl_usd,
+                volume_24h_total=rollup.volume_24h_total + delta.volume_24h,
+                risk_tvl_sum=rollup.risk_tvl_sum + delta.risk_tvl,
+                risk_score_sum=rollup.risk_score_sum + delta.risk_score,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def serialize_rollup(token: models.Token, rollup: models.TokenRiskRollup) -> Dict[str, Any]:
+    tvl = _dec(rollup.tvl_usd_total)
+    pool_count = rollup.pool_count or 0
+
+    if tvl > 0:
+        weighted = float(_dec(rollup.risk_tvl_sum) / tvl)
+    elif pool_count:
+        weighted = rollup.risk_score_sum / pool_count
+    else:
+        weighted = None
+
+    return {
+        "token_id": token.id,
+        "address": token.address,
+        "symbol": token.symbol,
+        "name": token.name,
+        "pool_count": pool_count,
+        "tvl_usd_total": float(tvl),
+        "volume_24h_total": float(_dec(rollup.volume_24h_total)),
+        "risk_score_tvl_weighted": round(weighted, 2) if weighted is not None else None,
+        "risk_score_mean": round(rollup.risk_score_sum / pool_count, 2) if pool_count else None,
+        "updated_at": rollup.updated_at,
+    }
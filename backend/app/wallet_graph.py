@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Tuple
+from array import array
+from typing import Any, Dict, List, Sequence, Tuple
 
 from . import models
-from .surflux_client import fetch_recent_trades
+from .executor import run_cpu_bound
+from .market_adapters import get_adapter
+from .wash_trading import WASH_RISK_WEIGHT, WashTradingDetector
 
 logger = logging.getLogger(__name__)
 
@@ -14,24 +17,23 @@ def _clamp01(value: float) -> float:
     return max(0.0, min(1.0, value))
 
 
-async def build_trade_graph_for_pool(
-    pool: models.Pool,
-    base_decimals: int,
+def pack_trades(
+    trades: List[Dict[str, Any]],
     quote_decimals: int,
-    trades_limit: int = 200,
-) -> Dict[str, Any]:
+) -> Tuple[List[str], array, array, array]:
     """
-    Build a wallet interaction graph for a Deepbook pool using recent trades.
+    Convert Surflux trades into a compact, pickle-friendly form.
 
-    Nodes represent balance manager IDs (traders); edges represent trades between maker and taker.
-    Node risk is a heuristic favoring active/low-volume traders as less risky.
+    Returns (ids, maker_idx, taker_idx, quote_qty) where ids holds each
+    balance manager once and the arrays reference it by index. Trades missing
+    a counterparty or quantity are dropped.
     """
-    trades: List[Dict[str, Any]] = await fetch_recent_trades(pool.pool_name, limit=trades_limit)
+    ids: List[str] = []
+    index: Dict[str, int] = {}
+    maker_idx = array("i")
+    taker_idx = array("i")
+    quote_qty = array("d")
 
-    nodes: Dict[str, Dict[str, Any]] = {}
-    edges: Dict[Tuple[str, str], Dict[str, Any]] = {}
-
-    total_trades = 0
     for trade in trades:
         maker = trade.get("maker_balance_manager_id")
         taker = trade.get("taker_balance_manager_id")
@@ -45,54 +47,123 @@ async def build_trade_graph_for_pool(
         except Exception:
             quote_qty_human = 0.0
 
-        total_trades += 1
-
         for addr in (maker, taker):
-            if addr not in nodes:
-                nodes[addr] = {"id": addr, "volume": 0.0, "trades": 0}
-            nodes[addr]["volume"] += quote_qty_human
-            nodes[addr]["trades"] += 1
+            if addr not in index:
+                index[addr] = len(ids)
+                ids.append(addr)
+
+        maker_idx.append(index[maker])
+        taker_idx.append(index[taker])
+        quote_qty.append(quote_qty_human)
+
+    return ids, maker_idx, taker_idx, quote_qty
+
+
+def compute_trade_graph(
+    ids: Sequence[str],
+    maker_idx: Sequence[int],
+    taker_idx: Sequence[int],
+    quote_qty: Sequence[float],
+) -> Dict[str, Any]:
+    """
+    Pure graph computation over packed trades (see `pack_trades`).
+    Returns nodes, edges and meta; safe to run in a worker process.
+
+    Node risk combines the activity heuristic with the wash-trading
+    detector's structural score; flagged clusters are listed in meta.
+    """
+    node_volume = [0.0] * len(ids)
+    node_trades = [0] * len(ids)
+    edges: Dict[Tuple[int, int], List[float]] = {}
+
+    for m, t, qty in zip(maker_idx, taker_idx, quote_qty):
+        node_volume[m] += qty
+        node_trades[m] += 1
+        node_volume[t] += qty
+        node_trades[t] += 1
 
         # undirected edge key
-        key = tuple(sorted((maker, taker)))
-        if key not in edges:
-            edges[key] = {
-                "source": key[0],
-                "target": key[1],
-                "volume": 0.0,
-                "trades": 0,
-            }
-        edges[key]["volume"] += quote_qty_human
-        edges[key]["trades"] += 1
+        key = (m, t) if ids[m] <= ids[t] else (t, m)
+        edge = edges.get(key)
+        if edge is None:
+            edges[key] = [qty, 1]
+        else:
+            edge[0] += qty
+            edge[1] += 1
+
+    total_trades = len(quote_qty)
 
-    if not nodes:
+    if total_trades == 0:
         return {
-            "pool_id": pool.id,
-            "pool_name": pool.pool_name,
             "nodes": [],
             "edges": [],
-            "meta": {"total_volume": 0.0, "total_trades": 0},
+            "meta": {"total_volume": 0.0, "total_trades": 0, "clusters": [], "wash": None},
         }
 
-    max_volume = max((n["volume"] for n in nodes.values()), default=1.0) or 1.0
-    max_trades = max((n["trades"] for n in nodes.values()), default=1) or 1
+    detector = WashTradingDetector(len(ids))
+    detector.add_trades(maker_idx, taker_idx, quote_qty)
+    clusters, node_cluster, structural, wash_summary = detector.analyze(ids)
 
-    # compute risk heuristic
-    for node in nodes.values():
-        volume_norm = node["volume"] / max_volume if max_volume else 0.0
-        trade_freq_norm = node["trades"] / max_trades if max_trades else 0.0
-        risk_score = _clamp01(volume_norm * 0.7 + (1 - trade_freq_norm) * 0.3)
-        node["risk"] = risk_score
+    max_volume = max(node_volume, default=1.0) or 1.0
+    max_trades = max(node_trades, default=1) or 1
 
-    total_volume = sum(n["volume"] for n in nodes.values())
+    # compute risk heuristic
+    nodes = []
+    for i, addr in enumerate(ids):
+        volume_norm = node_volume[i] / max_volume if max_volume else 0.0
+        trade_freq_norm = node_trades[i] / max_trades if max_trades else 0.0
+        activity_risk = _clamp01(volume_norm * 0.7 + (1 - trade_freq_norm) * 0.3)
+        nodes.append(
+            {
+                "id": addr,
+                "volume": node_volume[i],
+                "trades": node_trades[i],
+                "risk": _clamp01(activity_risk + (1 - activity_risk) * structural[i] * WASH_RISK_WEIGHT),
+                "structural_risk": round(structural[i], 6),
+                "cluster": node_cluster[i] if node_cluster[i] >= 0 else None,
+            }
+        )
 
     return {
-        "pool_id": pool.id,
-        "pool_name": pool.pool_name,
-        "nodes": list(nodes.values()),
-        "edges": list(edges.values()),
+        "nodes": nodes,
+        "edges": [
+            {
+                "source": ids[a],
+                "target": ids[b],
+                "volume": volume,
+                "trades": int(count),
+            }
+            for (a, b), (volume, count) in edges.items()
+        ],
         "meta": {
-            "total_volume": total_volume,
+            "total_volume": sum(node_volume),
             "total_trades": total_trades,
+            "clusters": clusters,
+            "wash": wash_summary,
         },
     }
+
+
+async def build_trade_graph_for_pool(
+    pool: models.Pool,
+    base_decimals: int,
+    quote_decimals: int,
+    trades_limit: int = 200,
+) -> Dict[str, Any]:
+    """
+    Build a wallet interaction graph for a pool using recent trades from its dex adapter.
+
+    Nodes represent balance manager IDs (traders); edges represent trades between maker and taker.
+    Node risk is a heuristic favoring active/low-volume traders as less risky,
+    raised for wallets in reciprocal (wash-trading) clusters.
+    """
+    adapter = get_adapter(pool.dex_name)
+    trades: List[Dict[str, Any]] = await adapter.fetch_trades(pool.pool_name, limit=trades_limit)
+
+    graph = await run_cpu_bound(compute_trade_graph, *pack_trades(trades, quote_decimals))
+
+    return {
+        "pool_id": pool.id,
+        "pool_name": pool.pool_name,
+        **graph,
+    }
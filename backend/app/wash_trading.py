@@ -0,0 +1,224 @@
+"""Streaming wash-trading / self-dealing detection over maker-taker trades.
+
+Trades are fed one at a time (`add_trade`) or as packed arrays
+(`add_trades`, the `pack_trades` layout). Per unordered wallet pair the
+detector keeps the volume traded in each direction. A pair becomes
+*reciprocal* once both wallets have been maker against the other. Reciprocal
+pairs are unioned (union-find, union by size, path halving), so the
+components are the groups of wallets that pass volume back and forth.
+Ordinary takers of a market maker never trade back and stay singletons.
+Self-trades (maker == taker) mark the wallet on its own.
+
+Each component keeps its round-trip volume: per pair, twice the smaller
+direction, and self-trades in full. It also keeps its total volume and its
+count of reciprocal pairs, so these give the cycle count (pairs - wallets + 1).
+Every update is O(α(n)). `analyze` scores the components once at the end:
+
+    score = size_factor * (0.6 * reciprocity + 0.2 * closure + 0.2 * volume_share)
+
+A cluster is flagged at WASH_FLAG_SCORE or above once it holds at least
+WASH_MIN_VOLUME_SHARE of the pool's volume. size_factor falls off above
+WASH_CLUSTER_MAX_SIZE wallets: self-dealing takes a small set of balance
+managers, while a market maker's two-way flow joins large groups. A
+wallet's structural score averages its own round-trip share and its
+cluster's score.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+WASH_CLUSTER_MAX_SIZE = int(os.getenv("WASH_CLUSTER_MAX_SIZE", "10"))
+WASH_FLAG_SCORE = float(os.getenv("WASH_FLAG_SCORE", "0.5"))
+WASH_MIN_VOLUME_SHARE = float(os.getenv("WASH_MIN_VOLUME_SHARE", "0.01"))
+WASH_CLUSTER_MEMBER_LIMIT = int(os.getenv("WASH_CLUSTER_MEMBER_LIMIT", "50"))
+# Node risk'ine yapısal skorun katkısı: risk + (1 - risk) * structural * weight
+WASH_RISK_WEIGHT = float(os.getenv("WASH_RISK_WEIGHT", "0.5"))
+
+
+def _clamp01(value: float) -> float:
+    return max(0.0, min(1.0, value))
+
+
+class WashTradingDetector:
+    def __init__(self, n_nodes: int = 0):
+        self.parent: List[int] = []
+        self.size: List[int] = []
+        # Bileşen toplamları; sadece kök indekslerinde geçerli
+        self.comp_volume: List[float] = []
+        self.comp_round_trip: List[float] = []
+        self.comp_pairs: List[int] = []
+        self.comp_self_trades: List[int] = []
+        # Cüzdan bazında (kendi tüm trade'leri üzerinden) hacim ve round-trip
+        self.node_volume: List[float] = []
+        self.node_round_trip: List[float] = []
+        # (küçük, büyük) indeks -> [küçük->büyük hacim, büyük->küçük hacim]
+        self.pairs: Dict[Tuple[int, int], List[float]] = {}
+        self.total_volume = 0.0
+        self.total_trades = 0
+        self.reciprocal_pairs = 0
+        self._ensure(n_nodes)
+
+    def _ensure(self, n: int) -> None:
+        start = len(self.parent)
+        if n <= start:
+            return
+        grow = n - start
+        self.parent.extend(range(start, n))
+        self.size.extend([1] * grow)
+        self.comp_volume.extend([0.0] * grow)
+        self.comp_round_trip.extend([0.0] * grow)
+        self.comp_pairs.extend([0] * grow)
+        self.comp_self_trades.extend([0] * grow)
+        self.node_volume.extend([0.0] * grow)
+        self.node_round_trip.extend([0.0] * grow)
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def _union(self, a: int, b: int) -> int:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        self.comp_volume[ra] += self.comp_volume[rb]
+        self.comp_round_trip[ra] += self.comp_round_trip[rb]
+        self.comp_pairs[ra] += self.comp_pairs[rb]
+        self.comp_self_trades[ra] += self.comp_self_trades[rb]
+        return ra
+
+    def add_trade(self, maker: int, taker: int, qty: float) -> None:
+        self._ensure(max(maker, taker) + 1)
+        self._add(maker, taker, qty)
+
+    def add_trades(self, maker_idx: Sequence[int], taker_idx: Sequence[int], quote_qty: Sequence[float]) -> None:
+        if not quote_qty:
+            return
+        self._ensure(max(max(maker_idx), max(taker_idx)) + 1)
+        add = self._add
+        for m, t, qty in zip(maker_idx, taker_idx, quote_qty):
+            add(m, t, qty)
+
+    def _add(self, maker: int, taker: int, qty: float) -> None:
+        self.total_volume += qty
+        self.total_trades += 1
+
+        if maker == taker:
+            root = self.find(maker)
+            self.comp_volume[root] += qty
+            self.comp_round_trip[root] += qty
+            self.comp_self_trades[root] += 1
+            self.node_volume[maker] += qty
+            self.node_round_trip[maker] += qty
+            return
+
+        if maker < taker:
+            key, direction = (maker, taker), 0
+        else:
+            key, direction = (taker, maker), 1
+        pair = self.pairs.get(key)
+        if pair is None:
+            pair = self.pairs[key] = [0.0, 0.0]
+
+        old_min = pair[0] if pair[0] < pair[1] else pair[1]
+        pair[direction] += qty
+        new_min = pair[0] if pair[0] < pair[1] else pair[1]
+        round_trip_delta = 2.0 * (new_min - old_min)
+
+        self.node_volume[maker] += qty
+        self.node_volume[taker] += qty
+        self.node_round_trip[maker] += round_trip_delta
+        self.node_round_trip[taker] += round_trip_delta
+
+        if old_min > 0:
+            # Zaten karşılıklı: çift bileşenin içinde, sadece toplamları güncelle
+            root = self.find(maker)
+            self.comp_volume[root] += qty
+            self.comp_round_trip[root] += round_trip_delta
+        elif new_min > 0:
+            # Çift bu trade ile karşılıklı oldu: birleştir, çiftin tüm geçmişini ekle
+            root = self._union(maker, taker)
+            self.comp_volume[root] += pair[0] + pair[1]
+            self.comp_round_trip[root] += 2.0 * new_min
+            self.comp_pairs[root] += 1
+            self.reciprocal_pairs += 1
+
+    def node_reciprocity(self, node: int) -> float:
+        volume = self.node_volume[node]
+        return _clamp01(self.node_round_trip[node] / volume) if volume > 0 else 0.0
+
+    def analyze(self, ids: Sequence[str]) -> Tuple[List[Dict[str, Any]], List[int], List[float], Dict[str, Any]]:
+        """
+        Score the components.
+
+        Returns (flagged clusters sorted by score, each wallet's flagged
+        cluster id or -1, each wallet's structural score in 0..1, summary).
+        """
+        n_nodes = len(ids)
+        self._ensure(n_nodes)
+        total_volume = self.total_volume
+
+        members: Dict[int, List[int]] = {}
+        for node in range(n_nodes):
+            root = self.find(node)
+            if self.comp_pairs[root] or self.comp_self_trades[root]:
+                members.setdefault(root, []).append(node)
+
+        scores: Dict[int, float] = {}
+        clusters: List[Dict[str, Any]] = []
+        for root, nodes in members.items():
+            size = len(nodes)
+            volume = self.comp_volume[root]
+            pairs = self.comp_pairs[root]
+            reciprocity = _clamp01(self.comp_round_trip[root] / volume) if volume > 0 else 0.0
+            cycles = max(0, pairs - size + 1)
+            closure = cycles / pairs if pairs else 0.0
+            share = volume / total_volume if total_volume > 0 else 0.0
+            size_factor = 1.0 if size <= WASH_CLUSTER_MAX_SIZE else WASH_CLUSTER_MAX_SIZE / size
+
+            score = _clamp01(size_factor * (0.6 * reciprocity + 0.2 * closure + 0.2 * share))
+            scores[root] = score
+            if score >= WASH_FLAG_SCORE and share >= WASH_MIN_VOLUME_SHARE:
+                clusters.append(
+                    {
+                        "root": root,
+                        "size": size,
+                        "volume": volume,
+                        "volume_share": round(share, 6),
+                        "reciprocity": round(reciprocity, 6),
+                        "reciprocal_pairs": pairs,
+                        "cycles": cycles,
+                        "self_trades": self.comp_self_trades[root],
+                        "score": round(score, 6),
+                        "members": [ids[i] for i in nodes[:WASH_CLUSTER_MEMBER_LIMIT]],
+                    }
+                )
+
+        clusters.sort(key=lambda c: -c["score"])
+        cluster_of_root = {}
+        for cluster_id, cluster in enumerate(clusters):
+            cluster_of_root[cluster.pop("root")] = cluster_id
+            cluster["id"] = cluster_id
+
+        node_cluster = [-1] * n_nodes
+        structural = [0.0] * n_nodes
+        for node in range(n_nodes):
+            root = self.find(node)
+            node_cluster[node] = cluster_of_root.get(root, -1)
+            structural[node] = _clamp01(0.5 * self.node_reciprocity(node) + 0.5 * scores.get(root, 0.0))
+
+        total_round_trip = sum(self.comp_round_trip[root] for root in members)
+        summary = {
+            "reciprocal_pairs": self.reciprocal_pairs,
+            "clusters": len(members),
+            "flagged_clusters": len(clusters),
+            "round_trip_volume_share": round(total_round_trip / total_volume, 6) if total_volume > 0 else 0.0,
+        }
+        return clusters, node_cluster, structural, summary
@@ -0,0 +1,227 @@
+"""Local stand-in for the Sui JSON-RPC methods the publisher and indexer use.
+
+`unsafe_batchTransaction` returns opaque tx bytes (JSON, not BCS) describing
+the batched Move calls; `sui_executeTransactionBlock` verifies the Ed25519
+signature against the sender, applies `update_score` and `mint_identity`
+calls to an in-memory object table and reports gas with a simple
+fixed-plus-per-call model. Every executed transaction gets its own
+checkpoint, and `suix_queryTransactionBlocks` (MoveFunction filter, digest
+cursor) / `sui_multiGetObjects` read them back.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from fastapi import FastAPI, Request
+
+
+@dataclass
+class FakeSuiState:
+    # object_id -> (last_score, last_update_ts)
+    pool_risk: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    transactions: int = 0
+    # Gas modeli: tx başına sabit hesaplama + çağrı başına storage yeniden yazımı
+    computation_per_tx: int = 1_000_000
+    computation_per_call: int = 20_000
+    storage_per_call: int = 1_500_000
+    rebate_per_call: int = 1_485_000
+    # object_id -> RiskIdentity alanları
+    identities: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # checkpoint sırasıyla: digest, checkpoint, çağrılan fonksiyonlar, yaratılan objeler
+    tx_log: List[Dict[str, Any]] = field(default_factory=list)
+    checkpoint: int = 0
+
+
+def record_transaction(state: FakeSuiState, digest: str, calls: List[Dict[str, Any]]) -> None:
+    """Apply Move calls as one transaction in a new checkpoint."""
+    state.checkpoint += 1
+    created = []
+    for call in calls:
+        if call["function"] == "mint_identity":
+            recipient, score, level, ts = call["arguments"]
+            object_id = "0x" + hashlib.blake2b(f"{digest}:{len(created)}".encode(), digest_size=32).hexdigest()
+            state.identities[object_id] = {
+                "owner": recipient,
+                "score": str(int(score)),
+                "level": int(level),
+                "created_at": str(int(ts)),
+                "last_update_at": str(int(ts)),
+            }
+            created.append((object_id, f"{call['packageObjectId']}::{call['module']}::RiskIdentity"))
+        elif call["function"] == "update_score":
+            object_id, score, ts = call["arguments"]
+            state.pool_risk[object_id] = (int(score), int(ts))
+
+    state.tx_log.append(
+        {
+            "digest": digest,
+            "checkpoint": state.checkpoint,
+            "functions": {(c["packageObjectId"], c["module"], c["function"]) for c in calls},
+            "created": created,
+        }
+    )
+    state.transactions += 1
+
+
+def seed_identity_mints(
+    state: FakeSuiState,
+    package: str,
+    recipients: List[str],
+    per_tx: int = 50,
+    module: str = "risk_identity",
+) -> None:
+    """Record already-executed mint PTBs (per_tx mints each) without signing."""
+    for start in range(0, len(recipients), per_tx):
+        calls = [
+            {
+                "packageObjectId": package,
+                "module": module,
+                "function": "mint_identity",
+                "arguments": [recipient, str(30 + i % 71), str(1 + i % 3), str(1_700_000_000_000 + start + i)],
+            }
+            for i, recipient in enumerate(recipients[start:start + per_tx])
+        ]
+        digest = hashlib.blake2b(f"seed:{len(state.tx_log)}".encode(), digest_size=32).hexdigest()
+        record_transaction(state, digest, calls)
+
+
+def _query_transaction_blocks(state: FakeSuiState, query: Dict[str, Any], cursor: Optional[str], limit: int, descending: bool):
+    move_fn = (query.get("filter") or {}).get("MoveFunction") or {}
+    key = (move_fn.get("package"), move_fn.get("module"), move_fn.get("function"))
+    matching = [tx for tx in state.tx_log if key in tx["functions"]]
+    if descending:
+        matching.reverse()
+
+    start = 0
+    if cursor is not None:
+        digests = [tx["digest"] for tx in matching]
+        start = digests.index(cursor) + 1 if cursor in digests else len(matching)
+
+    page = matching[start:start + limit]
+    show_changes = (query.get("options") or {}).get("showObjectChanges")
+    data = []
+    for tx in page:
+        entry: Dict[str, Any] = {"digest": tx["digest"], "checkpoint": str(tx["checkpoint"])}
+        if show_changes:
+            entry["objectChanges"] = [
+                {"type": "created", "objectId": object_id, "objectType": object_type, "version": "1"}
+                for object_id, object_type in tx["created"]
+            ]
+        data.append(entry)
+
+    return {
+        "data": data,
+        "nextCursor": page[-1]["digest"] if page else cursor,
+        "hasNextPage": start + limit < len(matching),
+    }
+
+
+def _multi_get_objects(state: FakeSuiState, object_ids: List[str]) -> List[Dict[str, Any]]:
+    result = []
+    for object_id in object_ids:
+        fields = state.identities.get(object_id)
+        if fields is None:
+            result.append({"error": {"code": "notExists", "object_id": object_id}})
+            continue
+        result.append(
+            {
+                "data": {
+                    "objectId": object_id,
+                    "version": "1",
+                    "content": {
+                        "dataType": "moveObject",
+                        "type": "risk_identity::RiskIdentity",
+                        "fields": {"id": {"id": object_id}, **fields},
+                    },
+                }
+            }
+        )
+    return result
+
+
+def _error(request_id: Any, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": message}}
+
+
+def _verify(tx_bytes: bytes, signature_b64: str, sender: str) -> bool:
+    raw = base64.b64decode(signature_b64)
+    if len(raw) != 97 or raw[0] != 0x00:
+        return False
+    signature, public_key = raw[1:65], raw[65:]
+    if "0x" + hashlib.blake2b(b"\x00" + public_key, digest_size=32).hexdigest() != sender:
+        return False
+    digest = hashlib.blake2b(bytes([0, 0, 0]) + tx_bytes, digest_size=32).digest()
+    try:
+        Ed25519PublicKey.from_public_bytes(public_key).verify(signature, digest)
+    except InvalidSignature:
+        return False
+    return True
+
+
+def create_app(state: FakeSuiState) -> FastAPI:
+    app = FastAPI(title="Fake Sui RPC")
+    app.state.sui = state
+
+    @app.post("/")
+    async def rpc(request: Request):
+        body = await request.json()
+        request_id = body.get("id")
+        method = body.get("method")
+        params = body.get("params") or []
+
+        if method == "unsafe_batchTransaction":
+            sender, requests, gas_budget = params[0], params[1], params[3]
+            calls = [r["moveCallRequestParams"] for r in requests]
+            tx = {"sender": sender, "calls": calls, "gas_budget": int(gas_budget)}
+            tx_bytes = base64.b64encode(json.dumps(tx, sort_keys=True).encode()).decode()
+            return {"jsonrpc": "2.0", "id": request_id, "result": {"txBytes": tx_bytes, "gas": [], "inputObjects": []}}
+
+        if method == "sui_executeTransactionBlock":
+            tx_bytes = base64.b64decode(params[0])
+            tx = json.loads(tx_bytes)
+            if not _verify(tx_bytes, params[1][0], tx["sender"]):
+                return _error(request_id, "Invalid user signature")
+
+            calls = tx["calls"]
+            computation = state.computation_per_tx + state.computation_per_call * len(calls)
+            if computation + state.storage_per_call * len(calls) > tx["gas_budget"]:
+                return _error(request_id, "InsufficientGas")
+
+            # Gerçek zincirde gas objesinin versiyonu digest'i tekil kılar; burada checkpoint
+            digest = hashlib.blake2b(tx_bytes + str(state.checkpoint + 1).encode(), digest_size=32).hexdigest()
+            record_transaction(state, digest, calls)
+
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "digest": digest,
+                    "effects": {
+                        "status": {"status": "success"},
+                        "gasUsed": {
+                            "computationCost": str(computation),
+                            "storageCost": str(state.storage_per_call * len(calls)),
+                            "storageRebate": str(state.rebate_per_call * len(calls)),
+                        },
+                    },
+                },
+            }
+
+        if method == "suix_queryTransactionBlocks":
+            query, cursor, limit = params[0], params[1], int(params[2] or 50)
+            descending = bool(params[3]) if len(params) > 3 else False
+            result = _query_transaction_blocks(state, query, cursor, min(limit, 50), descending)
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+        if method == "sui_multiGetObjects":
+            return {"jsonrpc": "2.0", "id": request_id, "result": _multi_get_objects(state, params[0][:50])}
+
+        return _error(request_id, f"Method not found: {method}")
+
+    return app
@@ -0,0 +1,111 @@
+"""Local stand-in for the Surflux Deepbook API.
+
+Serves deterministic synthetic `get_pools`, `order-book-depth` and `trades`
+payloads shaped like the real responses, sized by `FakeSurfluxConfig`.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException
+
+
+@dataclass
+class FakeSurfluxConfig:
+    pools: int = 50
+    levels: int = 20
+    trades: int = 200
+    wallets: int = 40
+    seed: int = 42
+
+
+def _pool_name(i: int) -> str:
+    return f"TKN{i}_USDC"
+
+
+def make_pools(config: FakeSurfluxConfig) -> List[Dict[str, Any]]:
+    quote = {
+        "quote_asset_id": "0xusdc::usdc::USDC",
+        "quote_asset_symbol": "USDC",
+        "quote_asset_name": "USD Coin",
+        "quote_asset_decimals": 6,
+    }
+    return [
+        {
+            "pool_id": f"0xpool{i:064x}",
+            "pool_name": _pool_name(i),
+            "base_asset_id": f"0xtoken{i}::tkn::TKN{i}",
+            "base_asset_symbol": f"TKN{i}",
+            "base_asset_name": f"Token {i}",
+            "base_asset_decimals": 9,
+            **quote,
+        }
+        for i in range(config.pools)
+    ]
+
+
+def make_order_book(config: FakeSurfluxConfig, pool_name: str, limit: int) -> Dict[str, Any]:
+    rng = random.Random(f"{config.seed}:{pool_name}:book")
+    levels = min(limit, config.levels)
+    mid = rng.uniform(0.5, 5.0) * 10**6
+    tick = mid * 0.0005
+
+    def side(direction: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "price": str(int(mid + direction * tick * (i + 1))),
+                "total_quantity": str(rng.randint(1, 5_000) * 10**9),
+            }
+            for i in range(levels)
+        ]
+
+    return {"bids": side(-1), "asks": side(1)}
+
+
+def make_trades(config: FakeSurfluxConfig, pool_name: str, limit: int) -> List[Dict[str, Any]]:
+    rng = random.Random(f"{config.seed}:{pool_name}:trades")
+    count = min(limit, config.trades)
+    mid = rng.uniform(0.5, 5.0) * 10**6
+    base_ts = 1_700_000_000_000
+
+    trades = []
+    for i in range(count):
+        price = mid * rng.uniform(0.98, 1.02)
+        quote_qty = rng.randint(1, 50_000) * 10**6
+        trades.append(
+            {
+                "trade_id": f"{pool_name}-{i}",
+                "price": str(int(price)),
+                "base_quantity": str(int(quote_qty / price * 10**9)),
+                "quote_quantity": str(quote_qty),
+                "maker_balance_manager_id": f"0xbm{rng.randrange(config.wallets):04x}",
+                "taker_balance_manager_id": f"0xbm{rng.randrange(config.wallets):04x}",
+                "timestamp": base_ts + i * 1_000,
+            }
+        )
+    return trades
+
+
+def create_app(config: FakeSurfluxConfig) -> FastAPI:
+    app = FastAPI(title="Fake Surflux")
+    known_pools = {_pool_name(i) for i in range(config.pools)}
+
+    @app.get("/deepbook/get_pools")
+    def get_pools():
+        return make_pools(config)
+
+    @app.get("/deepbook/{pool_name}/order-book-depth")
+    def order_book_depth(pool_name: str, limit: int = 20):
+        if pool_name not in known_pools:
+            raise HTTPException(status_code=404, detail="unknown pool")
+        return make_order_book(config, pool_name, limit)
+
+    @app.get("/deepbook/{pool_name}/trades")
+    def trades(pool_name: str, limit: int = 200):
+        if pool_name not in known_pools:
+            raise HTTPException(status_code=404, detail="unknown pool")
+        return make_trades(config, pool_name, limit)
+
+    return app
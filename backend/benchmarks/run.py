@@ -0,0 +1,413 @@
+"""Reproducible backend benchmarks against a local Surflux stand-in.
+
+Starts `fake_surflux` on a free local port, points the backend at it and at a
+seeded SQLite database, then times the scoring, graph and sync paths plus the
+hot HTTP endpoints. Results are written as JSON; with `--baseline` the run
+fails (exit code 1) when any case's p50 regresses by more than `--threshold`.
+
+Usage (from backend/):
+    python -m benchmarks.run --pools 50 --trades 500 --output bench.json
+    python -m benchmarks.run --baseline bench.json --threshold 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .fake_sui_rpc import FakeSuiState, create_app as create_sui_rpc_app, seed_identity_mints
+from .fake_surflux import FakeSurfluxConfig, create_app as create_surflux_app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", type=int, default=50, help="Pools served by get_pools")
+    parser.add_argument("--levels", type=int, default=20, help="Order book levels per side")
+    parser.add_argument("--trades", type=int, default=200, help="Trades served per pool")
+    parser.add_argument("--wallets", type=int, default=40, help="Distinct balance managers in trades")
+    parser.add_argument("--metrics-per-pool", type=int, default=24, help="Seeded PoolMetric history rows per pool")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed iterations per case")
+    parser.add_argument("--sync-iterations", type=int, default=3, help="Timed iterations for all-pools sync")
+    parser.add_argument("--publish-calls-per-tx", type=int, default=256, help="update_score calls per publish transaction")
+    parser.add_argument("--identity-mints", type=int, default=2000, help="RiskIdentity mints on the fake chain")
+    parser.add_argument("--mints-per-tx", type=int, default=50, help="mint_identity calls per seeded transaction")
+    parser.add_argument("--graph-trades", type=int, default=100_000, help="Synthetic trades for the large trade-graph case")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh SQLite file in a temp dir")
+    parser.add_argument("--output", default=None, help="Write JSON results here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="Previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative p50 slowdown vs baseline")
+    return parser.parse_args(argv)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(app):
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Local stand-in server {app.title!r} did not start")
+        time.sleep(0.05)
+
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    p95_index = max(0, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        "iterations": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[p95_index] * 1000,
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def time_case(
+    fn: Callable[[], Awaitable[Any]],
+    iterations: int,
+    before_each: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    # Bir tur ısınma: import / bağlantı / executor başlatma maliyeti ölçüme girmesin
+    if before_each:
+        before_each()
+    await fn()
+
+    samples = []
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def seed_metrics(db, pool_ids: List[int], per_pool: int, seed: int) -> None:
+    from sqlalchemy import insert
+
+    from app import models
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "pool_id": pool_id,
+            "tvl_usd": rng.uniform(1_000, 5_000_000),
+            "volume_24h": rng.uniform(100, 1_000_000),
+            "price_var_24h": rng.random() * 0.2,
+            "il_risk": rng.random(),
+            "utilization": rng.random(),
+            "risk_score": rng.randint(0, 100),
+            "captured_at": now - timedelta(hours=h),
+        }
+        for pool_id in pool_ids
+        for h in range(per_pool)
+    ]
+    if rows:
+        db.execute(insert(models.PoolMetric), rows)
+    db.commit()
+
+
+async def run_benchmarks(args: argparse.Namespace, sui_state: FakeSuiState) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    from app import models
+    from app.database import SessionLocal
+    from app.jobs import process_available_items
+    from app.main import app
+    from app.orderbook_cache import order_book_cache
+    from app.risk_scoring import compute_pool_risk_metrics
+    from app.wallet_graph import build_trade_graph_for_pool, compute_trade_graph
+
+    from app.migrations import run_migrations
+
+    run_migrations()
+
+    transport = httpx.ASGITransport(app=app)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def sync_pools():
+            resp = await client.post("/sync/deepbook/pools")
+            resp.raise_for_status()
+
+        results["sync_deepbook_pools"] = await time_case(sync_pools, args.iterations)
+
+        db = SessionLocal()
+        try:
+            pools = db.query(models.Pool).order_by(models.Pool.id).all()
+            pool_ids = [p.id for p in pools]
+            seed_metrics(db, pool_ids, args.metrics_per_pool, args.seed)
+            pool = pools[0]
+            base_decimals = pool.token0.decimals
+            quote_decimals = pool.token1.decimals
+        finally:
+            db.close()
+
+        async def score_pool():
+            await compute_pool_risk_metrics(pool.pool_name, base_decimals, quote_decimals)
+
+        results["compute_pool_risk_metrics"] = await time_case(
+            score_pool, args.iterations, before_each=order_book_cache.invalidate
+        )
+        results["compute_pool_risk_metrics_cached_book"] = await time_case(score_pool, args.iterations)
+
+        async def trade_graph():
+            await build_trade_graph_for_pool(pool, base_decimals, quote_decimals, trades_limit=args.trades)
+
+        results["build_trade_graph_for_pool"] = await time_case(trade_graph, args.iterations)
+
+        # Wash-trading detector'lı graph hesabı, Surflux sayfa limitinin çok üstünde bir trade setiyle
+        rng = random.Random(args.seed)
+        graph_wallets = max(2, args.graph_trades // 10)
+        graph_ids = [f"0xbm{i:06x}" for i in range(graph_wallets)]
+        graph_makers = array("i", (rng.randrange(graph_wallets) for _ in range(args.graph_trades)))
+        graph_takers = array("i", (rng.randrange(graph_wallets) for _ in range(args.graph_trades)))
+        graph_qty = array("d", (rng.uniform(1.0, 1000.0) for _ in range(args.graph_trades)))
+
+        async def large_trade_graph():
+            compute_trade_graph(graph_ids, graph_makers, graph_takers, graph_qty)
+
+        results["compute_trade_graph_large"] = await time_case(large_trade_graph, args.iterations)
+
+        async def pools_summary():
+            resp = await client.get("/pools/summary")
+            resp.raise_for_status()
+
+        results["pools_summary"] = await time_case(pools_summary, args.iterations)
+
+        async def pool_rankings():
+            resp = await client.get("/pools/rankings", params={"by": "risk_score", "limit": 10})
+            resp.raise_for_status()
+
+        results["pool_rankings_top10"] = await time_case(pool_rankings, args.iterations)
+
+        async def slippage_batch():
+            # Book score_pool'dan cache'te; 100 boyut x 2 taraf tek snapshot üzerinden
+            resp = await client.post(
+                f"/pools/{pool.id}/slippage/batch",
+                json={"sizes": [10.0 * (i + 1) for i in range(100)]},
+            )
+            resp.raise_for_status()
+
+        results["pool_slippage_batch_100_sizes"] = await time_case(slippage_batch, args.iterations)
+
+        async def sync_all_metrics():
+            # Job kuyruğa girer; ASGITransport startup çalıştırmadığı için worker'ı burada sürüyoruz
+            resp = await client.post("/sync/deepbook/metrics")
+            resp.raise_for_status()
+            await process_available_items()
+            job = (await client.get(f"/sync/jobs/{resp.json()['job_id']}")).json()
+            if job["status"] != "completed":
+                raise RuntimeError(f"Sync job did not complete: {job['status']}")
+
+        results["sync_deepbook_metrics_all_pools"] = await time_case(
+            sync_all_metrics, args.sync_iterations, before_each=order_book_cache.invalidate
+        )
+
+        results["publish_pool_scores"] = await bench_publish(args, pool_ids)
+        results["index_risk_identities"] = await bench_identity_indexer(args, sui_state)
+
+    return results
+
+
+async def bench_publish(args: argparse.Namespace, pool_ids: List[int]) -> Dict[str, Any]:
+    """Full publish cycle for every pool against the fake RPC, plus gas/tx counts."""
+    from sqlalchemy import update
+
+    from app import models
+    from app.database import SessionLocal
+    from app.publisher import publish_pool_scores
+
+    db = SessionLocal()
+    try:
+        for pool_id in pool_ids:
+            db.merge(models.PoolRiskPublication(pool_id=pool_id, pool_risk_object_id=f"0x{pool_id:064x}"))
+        db.commit()
+
+        def reset_published():
+            # Her iterasyonda bütün havuzlar yayınlanacak duruma dönsün
+            db.execute(update(models.PoolRiskPublication).values(last_published_score=None))
+            db.commit()
+
+        summaries: List[Dict[str, Any]] = []
+
+        async def publish():
+            summary = await publish_pool_scores(db, max_calls_per_tx=args.publish_calls_per_tx)
+            if summary["errors"]:
+                raise RuntimeError(f"Publish failed: {summary['errors'][0]}")
+            summaries.append(summary)
+
+        case = await time_case(publish, args.iterations, before_each=reset_published)
+    finally:
+        db.close()
+
+    last = summaries[-1]
+    case.update(
+        {
+            "pools": last["published"],
+            "transactions_per_cycle": len(last["transactions"]),
+            "gas_used_per_cycle": last["gas_used_total"],
+        }
+    )
+    return case
+
+
+async def bench_identity_indexer(args: argparse.Namespace, sui_state: FakeSuiState) -> Dict[str, Any]:
+    """Full catch-up of the RiskIdentity indexer from an empty cursor."""
+    from app import models
+    from app.database import SessionLocal
+    from app.identity_indexer import CURSOR_NAME, run_catch_up
+    from app.sui_client import SUI_RISK_PACKAGE_ID
+
+    recipients = [f"0x{i:064x}" for i in range(args.identity_mints)]
+    seed_identity_mints(sui_state, SUI_RISK_PACKAGE_ID, recipients, per_tx=args.mints_per_tx)
+
+    db = SessionLocal()
+    try:
+        def reset_index():
+            db.query(models.RiskIdentity).delete()
+            db.query(models.IndexerCursor).filter(models.IndexerCursor.name == CURSOR_NAME).delete()
+            db.commit()
+
+        summaries: List[Dict[str, Any]] = []
+
+        async def catch_up():
+            summaries.append(await run_catch_up(db))
+
+        case = await time_case(catch_up, args.iterations, before_each=reset_index)
+    finally:
+        db.close()
+
+    last = summaries[-1]
+    if last["identities"] != args.identity_mints:
+        raise RuntimeError(f"Indexer stored {last['identities']} of {args.identity_mints} identities")
+    case.update({"identities": last["identities"], "pages": last["pages"]})
+    return case
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    regressions = []
+    for name, case in results.items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = case["p50_ms"] / previous["p50_ms"]
+        if ratio > 1.0 + threshold:
+            regressions.append(
+                {
+                    "case": name,
+                    "baseline_p50_ms": previous["p50_ms"],
+                    "p50_ms": case["p50_ms"],
+                    "ratio": ratio,
+                }
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    config = FakeSurfluxConfig(
+        pools=args.pools,
+        levels=args.levels,
+        trades=args.trades,
+        wallets=args.wallets,
+        seed=args.seed,
+    )
+
+    sui_state = FakeSuiState()
+    servers = [
+        start_local_server(create_surflux_app(config)),
+        start_local_server(create_sui_rpc_app(sui_state)),
+    ]
+    (_, _, surflux_url), (_, _, sui_rpc_url) = servers
+    tmp_dir = tempfile.mkdtemp(prefix="sui-bench-")
+
+    # app modülleri import edilmeden önce ortamı ayarla
+    os.environ["SURFLUX_BASE_URL"] = surflux_url
+    os.environ["SUI_RPC_URL"] = sui_rpc_url
+    os.environ["SUI_PUBLISHER_PRIVATE_KEY"] = base64.b64encode(bytes([0]) + os.urandom(32)).decode()
+    os.environ.setdefault("SURFLUX_API_KEY", "bench")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ.setdefault("DB_ECHO", "false")
+    # Her iterasyon tüm havuzları gerçekten sync etsin (lease cooldown'ı kapalı)
+    os.environ.setdefault("SYNC_MIN_INTERVAL_SECONDS", "0")
+
+    try:
+        cases = asyncio.run(run_benchmarks(args, sui_state))
+    finally:
+        for server, thread, _ in servers:
+            server.should_exit = True
+            thread.join(timeout=5)
+
+    output: Dict[str, Any] = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scoring_executor": os.getenv("SCORING_EXECUTOR", "process"),
+        "params": {
+            "pools": args.pools,
+            "levels": args.levels,
+            "trades": args.trades,
+            "graph_trades": args.graph_trades,
+            "wallets": args.wallets,
+            "metrics_per_pool": args.metrics_per_pool,
+            "publish_calls_per_tx": args.publish_calls_per_tx,
+            "identity_mints": args.identity_mints,
+            "mints_per_tx": args.mints_per_tx,
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "cases": cases,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(cases, json.load(f), args.threshold)
+        output["regressions"] = regressions
+        if regressions:
+            exit_code = 1
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
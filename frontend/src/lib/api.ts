@@ -7,6 +7,8 @@ import type {
   MintPayloadResponse,
   SyncPoolsResponse,
   SyncMetricsResponse,
+  SyncJobQueuedResponse,
+  SyncJobStatus,
   StoreIdentityRequest,
   IdentityHistoryEntry,
   WalletRiskScoreResponse,
@@ -77,10 +79,30 @@ class ApiClient {
     });
   }
 
-  async syncAllMetrics(): Promise<SyncMetricsResponse> {
-    return this.request('/sync/deepbook/metrics', {
+  // Enqueues the all-pools sync job and polls it until it finishes
+  async syncAllMetrics(pollIntervalMs = 2000): Promise<SyncMetricsResponse> {
+    const queued = await this.request<SyncJobQueuedResponse>('/sync/deepbook/metrics', {
       method: 'POST',
     });
+
+    let job = await this.getSyncJob(queued.job_id);
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+      job = await this.getSyncJob(queued.job_id);
+    }
+
+    if (job.status === 'failed') {
+      throw new Error(`Sync job ${job.job_id} failed for all ${job.total} pools`);
+    }
+
+    return {
+      message: `Metrics synced for ${job.done}/${job.total} pools`,
+      updated_count: job.done,
+    };
+  }
+
+  async getSyncJob(jobId: number): Promise<SyncJobStatus> {
+    return this.request(`/sync/jobs/${jobId}`);
   }
 
   async syncPoolMetrics(poolId: number): Promise<SyncMetricsResponse> {
@@ -112,8 +134,17 @@ class ApiClient {
     });
   }
 
-  async getIdentityHistory(address: string): Promise<IdentityHistoryEntry[]> {
-    return this.request(`/risk/identity/history/${address}`);
+  async getIdentityHistory(
+    address: string,
+    options: { beforeTs?: number; beforeId?: number; limit?: number; latest?: boolean } = {}
+  ): Promise<IdentityHistoryEntry[]> {
+    const params = new URLSearchParams();
+    if (options.beforeTs !== undefined) params.set('before_ts', String(options.beforeTs));
+    if (options.beforeId !== undefined) params.set('before_id', String(options.beforeId));
+    if (options.limit !== undefined) params.set('limit', String(options.limit));
+    if (options.latest) params.set('latest', 'true');
+    const query = params.toString();
+    return this.request(`/risk/identity/history/${address}${query ? `?${query}` : ''}`);
   }
 }
 
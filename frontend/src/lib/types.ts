@@ -41,6 +41,21 @@ export interface WalletGraphNode {
   volume: number;
   trades: number;
   risk: number; // 0-1
+  structural_risk: number; // 0-1, wash-trading cluster / reciprocity score
+  cluster: number | null; // id of a flagged cluster in meta.clusters
+}
+
+export interface WashTradingCluster {
+  id: number;
+  size: number;
+  volume: number;
+  volume_share: number;
+  reciprocity: number;
+  reciprocal_pairs: number;
+  cycles: number;
+  self_trades: number;
+  score: number;
+  members: string[];
 }
 
 export interface WalletGraphEdge {
@@ -58,6 +73,13 @@ export interface WalletGraphResponse {
   meta: {
     total_volume: number;
     total_trades: number;
+    clusters: WashTradingCluster[];
+    wash: {
+      reciprocal_pairs: number;
+      clusters: number;
+      flagged_clusters: number;
+      round_trip_volume_share: number;
+    } | null;
   };
 }
 
@@ -83,6 +105,7 @@ export interface WalletRiskScoreResponse {
 }
 
 export interface IdentityHistoryEntry {
+  id: number;
   score: number;
   level: string;
   timestamp_ms: number;
@@ -108,6 +131,27 @@ export interface SyncMetricsResponse {
   updated_count?: number;
 }
 
+export interface SyncJobQueuedResponse {
+  message: string;
+  job_id: number;
+  status: string;
+  count: number;
+}
+
+export interface SyncJobStatus {
+  job_id: number;
+  kind: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  total: number;
+  done: number;
+  failed: number;
+  pending: number;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+  results: Array<Record<string, unknown>>;
+}
+
 // Risk level enum
 export enum RiskLevel {
   LOW = 'Low Risk',